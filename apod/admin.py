@@ -1,6 +1,7 @@
 # apod/admin.py
-from django.contrib import admin
-from .models import APODImage, CelestialCoordinate, SystemLog
+from django.contrib import admin, messages
+from .models import APODImage, CelestialCoordinate, SystemLog, MirrorCheckpoint, ImageMirror
+from .duplicates import near_duplicates, hash_images
 
 @admin.register(APODImage)
 class APODImageAdmin(admin.ModelAdmin):
@@ -9,6 +10,7 @@ class APODImageAdmin(admin.ModelAdmin):
     search_fields = ('title', 'explanation', 'copyright')
     date_hierarchy = 'date'
     readonly_fields = ('created_at', 'updated_at')
+    actions = ['find_near_duplicates']
     
     fieldsets = (
         ('Basic Information', {
@@ -25,6 +27,25 @@ class APODImageAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+    
+    @admin.action(description='Find near duplicates')
+    def find_near_duplicates(self, request, queryset):
+        unhashed = list(queryset.filter(phash=None).values_list('id', flat=True))
+        if unhashed:
+            hash_images(unhashed)
+        
+        for image in queryset:
+            matches = near_duplicates(image.id)
+            if matches is None:
+                self.message_user(request, f'{image}: could not be hashed', messages.WARNING)
+            elif not matches:
+                self.message_user(request, f'{image}: no near duplicates')
+            else:
+                others = APODImage.objects.in_bulk([match[0] for match in matches])
+                found = ', '.join(
+                    f'{others[other_id]} ({distance} bits)' for other_id, distance, _ in matches if other_id in others
+                )
+                self.message_user(request, f'{image}: {found}', messages.WARNING)
 
 @admin.register(CelestialCoordinate)
 class CelestialCoordinateAdmin(admin.ModelAdmin):
@@ -35,7 +56,7 @@ class CelestialCoordinateAdmin(admin.ModelAdmin):
     
     fieldsets = (
         ('Object Information', {
-            'fields': ('name', 'type', 'body')
+            'fields': ('name', 'aliases', 'type', 'body', 'popularity')
         }),
         ('Coordinates', {
             'fields': ('latitude', 'longitude')
@@ -68,4 +89,16 @@ class SystemLogAdmin(admin.ModelAdmin):
     def has_change_permission(self, request, obj=None):
         return False
     
-    actions = ['delete_selected']
\ No newline at end of file
+    actions = ['delete_selected']
+
+@admin.register(MirrorCheckpoint)
+class MirrorCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'cursor', 'dates_done', 'dates_missing', 'chunks_done', 'updated_at')
+    list_filter = ('status',)
+    readonly_fields = ('started_at', 'updated_at')
+@admin.register(ImageMirror)
+class ImageMirrorAdmin(admin.ModelAdmin):
+    list_display = ('image', 'status', 'width', 'height', 'total_bytes', 'last_accessed')
+    list_filter = ('status',)
+    readonly_fields = ('created_at', 'updated_at')
+    raw_id_fields = ('image',)
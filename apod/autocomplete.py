@@ -0,0 +1,160 @@
+# apod/autocomplete.py
+"""
+In-memory autocomplete over CelestialCoordinate names and aliases.
+
+Every name, alias and word inside them is a key in one sorted array, so a
+prefix lookup is two bisects. Typos are handled SymSpell-style: the first
+HEAD_LENGTH characters of each key and their single-character deletions map
+back to the key heads, which gives a small candidate set to check with a
+bounded edit distance. The index is a VersionedIndex, so each worker builds
+it on start and rebuilds it after any write to the table.
+"""
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from functools import lru_cache
+
+from .coordinate_index import VersionedIndex
+from .models import CelestialCoordinate
+
+HEAD_LENGTH = 4
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.lower().replace('-', ' ').split())
+
+
+def index_keys(name, aliases):
+    """Full names, aliases and every word-start suffix of them"""
+    keys = set()
+    for label in [name] + list(aliases or []):
+        label = normalize(label)
+        words = label.split(' ')
+        for i in range(len(words)):
+            keys.add(' '.join(words[i:]))
+    keys.discard('')
+    return keys
+
+
+def deletes(text):
+    return {text[:i] + text[i + 1:] for i in range(len(text))}
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance, returning limit + 1 as soon as it is exceeded"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def prefix_distance(query, key, limit):
+    """Smallest edit distance between query and a prefix of key of similar length"""
+    n = len(query)
+    return min(edit_distance(query, key[:length], limit) for length in (n - 1, n, n + 1) if length > 0)
+
+
+class PrefixIndex:
+
+    def __init__(self, entries):
+        self.entries = entries
+
+        pairs = sorted(
+            (key, i)
+            for i, entry in enumerate(entries)
+            for key in index_keys(entry['name'], entry['aliases'])
+        )
+        self.keys = [key for key, _ in pairs]
+        self.entry_ids = [i for _, i in pairs]
+
+        # head -> (first, last + 1) position in keys; variant -> heads within one deletion
+        self.head_ranges = {}
+        self.variants = defaultdict(set)
+        for position, key in enumerate(self.keys):
+            head = key[:HEAD_LENGTH]
+            first, _ = self.head_ranges.get(head, (position, position))
+            self.head_ranges[head] = (first, position + 1)
+        for head in self.head_ranges:
+            self.variants[head].add(head)
+            for variant in deletes(head):
+                self.variants[variant].add(head)
+
+        # Per-index memo; a rebuilt index starts with an empty one
+        self.search = lru_cache(maxsize=4096)(self._search)
+
+    def prefix_range(self, query):
+        return bisect_left(self.keys, query), bisect_left(self.keys, query + '\uffff')
+
+    def rank(self, matches, limit):
+        """matches maps entry index -> edits; best first by edits, popularity, name length"""
+        ordered = sorted(
+            matches.items(),
+            key=lambda item: (item[1], -self.entries[item[0]]['popularity'], len(self.entries[item[0]]['name']))
+        )
+        return [self.entries[i] for i, _ in ordered[:limit]]
+
+    def _search(self, query, limit=10):
+        query = normalize(query)
+        if not query:
+            return []
+
+        lo, hi = self.prefix_range(query)
+        matches = {entry: 0 for entry in self.entry_ids[lo:hi]}
+
+        if len(matches) < limit and len(query) >= 3:
+            max_edits = 1 if len(query) < 7 else 2
+            head = query[:HEAD_LENGTH]
+            heads = set()
+            for variant in {head} | deletes(head):
+                heads |= self.variants.get(variant, set())
+            for candidate in heads:
+                first, last = self.head_ranges[candidate]
+                for position in range(first, last):
+                    entry = self.entry_ids[position]
+                    if entry in matches:
+                        continue
+                    edits = prefix_distance(query, self.keys[position], max_edits)
+                    if edits <= max_edits:
+                        matches[entry] = edits
+
+        return self.rank(matches, limit)
+
+
+def build_index():
+    rows = CelestialCoordinate.objects.values(
+        'name', 'aliases', 'type', 'longitude', 'latitude', 'body', 'description', 'popularity'
+    )
+    entries = [
+        {
+            'name': row['name'],
+            'aliases': row['aliases'] or [],
+            'type': row['type'],
+            'ra': row['longitude'],  # Using longitude as RA (0-360 degrees)
+            'dec': row['latitude'],  # Using latitude as Dec (-90 to +90 degrees)
+            'body': row['body'],
+            'description': row['description'],
+            'popularity': row['popularity'],
+        }
+        for row in rows
+    ]
+    return PrefixIndex(entries)
+
+
+_index = VersionedIndex(build_index)
+
+
+def warm_index():
+    _index.warm()
+
+
+def autocomplete(query, limit=10):
+    return _index.get().search(query, limit)
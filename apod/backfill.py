@@ -0,0 +1,155 @@
+# apod/backfill.py
+from datetime import date, datetime, timedelta
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from emiigen.nasa_client import get_client
+
+from .calendar_index import refresh_years
+from .crosslinks import link_dates
+from .logsink import log_event
+from .response_cache import invalidate_dates
+from .search import index_dates
+from .models import APODImage
+
+# First day published in the APOD archive
+APOD_FIRST_DATE = date(1995, 6, 16)
+
+# Number of days requested per start_date/end_date call
+BACKFILL_WINDOW_DAYS = 100
+
+# Fields refreshed when an existing date is upserted
+APOD_UPDATE_FIELDS = [
+    'title', 'explanation', 'url', 'hdurl', 'media_type',
+    'copyright', 'thumbnail_url', 'updated_at',
+]
+
+
+def iter_date_windows(start_date, end_date, window_days=BACKFILL_WINDOW_DAYS):
+    """Yield (window_start, window_end) pairs from newest to oldest"""
+    window_end = end_date
+    while window_end >= start_date:
+        window_start = max(start_date, window_end - timedelta(days=window_days - 1))
+        yield window_start, window_end
+        window_end = window_start - timedelta(days=1)
+
+
+def fetch_apod_window(start_date, end_date):
+    """Fetch every APOD between start_date and end_date in one API call"""
+    response = get_client().get(
+        settings.NASA_APOD_URL,
+        params={
+            'start_date': start_date.strftime('%Y-%m-%d'),
+            'end_date': end_date.strftime('%Y-%m-%d'),
+            'thumbs': True,
+        },
+        timeout=60
+    )
+    response.raise_for_status()
+    data = response.json()
+
+    # A single-day window comes back as an object instead of a list
+    if isinstance(data, dict):
+        data = [data]
+    return data
+
+
+def fetch_apod_window_safe(window):
+    """Fetch a (start, end) window, returning (entries, error) instead of raising"""
+    try:
+        return fetch_apod_window(*window), None
+    except (requests.exceptions.RequestException, ValueError) as e:
+        return [], str(e)
+
+
+def build_apod_image(data):
+    """Build an unsaved APODImage from an API entry"""
+    return APODImage(
+        date=datetime.strptime(data['date'], '%Y-%m-%d').date(),
+        title=data.get('title', ''),
+        explanation=data.get('explanation', ''),
+        url=data.get('url', ''),
+        hdurl=data.get('hdurl', ''),
+        media_type=data.get('media_type', 'image'),
+        copyright=data.get('copyright', ''),
+        thumbnail_url=data.get('thumbnail_url', '')
+    )
+
+
+def save_apod_window(entries):
+    """Upsert a window of API entries with one bulk statement in one transaction"""
+    images = [build_apod_image(entry) for entry in entries if entry.get('date')]
+    if not images:
+        return []
+
+    with transaction.atomic():
+        APODImage.objects.bulk_create(
+            images,
+            update_conflicts=True,
+            unique_fields=['date'],
+            update_fields=APOD_UPDATE_FIELDS,
+        )
+        # bulk_create sends no post_save signals
+        refresh_years(image.date.year for image in images)
+        invalidate_dates(image.date for image in images)
+        index_dates(image.date for image in images)
+        link_dates(image.date for image in images)
+    return images
+
+
+def backfill_apod_range(start_date, end_date, window_days=BACKFILL_WINDOW_DAYS, on_window=None):
+    """
+    Backfill APOD images between start_date and end_date (inclusive).
+
+    Dates are requested in windows of window_days using the API's
+    start_date/end_date parameters. Windows are fetched in parallel on the
+    shared NASA client's worker pool and each one is written from this
+    thread with a single bulk upsert. on_window(window_start, window_end,
+    images, error) is called after every window so callers can report
+    progress.
+    """
+    start_date = max(start_date, APOD_FIRST_DATE)
+    end_date = min(end_date, timezone.now().date())
+
+    saved = {}
+    failed_windows = []
+
+    windows = list(iter_date_windows(start_date, end_date, window_days))
+    fetched = get_client().map(fetch_apod_window_safe, windows)
+
+    for (window_start, window_end), (entries, error) in zip(windows, fetched):
+        images = save_apod_window(entries) if not error else []
+        if error:
+            failed_windows.append({
+                'start_date': window_start.strftime('%Y-%m-%d'),
+                'end_date': window_end.strftime('%Y-%m-%d'),
+                'error': error
+            })
+            log_event(
+                level='error',
+                message=f'Failed to backfill APOD for {window_start} to {window_end}',
+                details={'error': error}
+            )
+
+        for image in images:
+            saved[image.date] = image.title
+
+        if on_window:
+            on_window(window_start, window_end, images, error)
+
+    if end_date >= start_date:
+        log_event(
+            level='success' if not failed_windows else 'warning',
+            message=f'Backfilled {len(saved)} APOD images from {start_date} to {end_date}',
+            details={'failed_windows': failed_windows} if failed_windows else None
+        )
+
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'saved': saved,
+        'failed_windows': failed_windows,
+    }
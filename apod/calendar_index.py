@@ -0,0 +1,71 @@
+# apod/calendar_index.py
+import base64
+from datetime import date
+
+from .models import APODImage, CalendarYearIndex
+
+BITMAP_BYTES = 46  # 366 days
+
+
+def build_year_bitmap(day_ids):
+    """Pack (day_of_year, id) pairs into a bitmap and the ids of its set bits"""
+    bitmap = bytearray(BITMAP_BYTES)
+    ids = []
+    for day, image_id in sorted(day_ids):
+        bitmap[day // 8] |= 1 << (day % 8)
+        ids.append(image_id)
+    return bytes(bitmap), ids
+
+
+def rebuild_year(year):
+    """Recompute the index row for one year from a single query"""
+    rows = APODImage.objects.filter(date__year=year).values_list('date', 'id')
+    bitmap, ids = build_year_bitmap(
+        ((image_date - date(year, 1, 1)).days, image_id) for image_date, image_id in rows
+    )
+    index, _ = CalendarYearIndex.objects.update_or_create(
+        year=year,
+        defaults={'bitmap': bitmap, 'ids': ids, 'count': len(ids)}
+    )
+    return index
+
+
+def refresh_years(years):
+    """Rebuild the index rows for every year in years"""
+    for year in sorted(set(years)):
+        rebuild_year(year)
+
+
+def rebuild_all():
+    """Rebuild the index for every year present in the archive"""
+    years = [d.year for d in APODImage.objects.dates('date', 'year')]
+    CalendarYearIndex.objects.exclude(year__in=years).delete()
+    refresh_years(years)
+    return years
+
+
+def get_year_index(year):
+    """
+    Return the index row for year, building it on first request, or None
+    when the year has no APODs (nothing is stored for those)
+    """
+    index = CalendarYearIndex.objects.filter(year=year).first()
+    if index is None and APODImage.objects.filter(date__year=year).exists():
+        index = rebuild_year(year)
+    return index
+
+
+def year_index_payload(year, index=None):
+    if index is None:
+        return {
+            'year': year,
+            'count': 0,
+            'bitmap': base64.b64encode(bytes(BITMAP_BYTES)).decode('ascii'),
+            'ids': [],
+        }
+    return {
+        'year': index.year,
+        'count': index.count,
+        'bitmap': base64.b64encode(bytes(index.bitmap)).decode('ascii'),
+        'ids': index.ids,
+    }
@@ -0,0 +1,236 @@
+# apod/catalog_import.py
+"""
+Streaming importer for star and deep-sky catalogs.
+
+CSV and JSONL rows are read lazily and mapped onto CelestialCoordinate fields
+by common column names (Messier, NGC and HYG-style exports). Positions may be
+decimal degrees, decimal hours or sexagesimal strings. Rows are upserted in
+batches on (name, body), and the derived indexes are refreshed once at the
+end, because bulk_create sends no model signals.
+"""
+import csv
+import json
+import re
+import time
+
+from django.db import transaction
+
+from .coordinate_index import invalidate_coordinate_indexes
+from .logsink import log_event
+from .models import CelestialCoordinate
+from .response_cache import invalidate_status
+from .sky_clusters import rebuild_all as rebuild_sky_clusters
+
+IMPORT_BATCH_SIZE = 2000
+COORDINATE_UPDATE_FIELDS = ['type', 'latitude', 'longitude', 'description', 'aliases', 'popularity']
+
+# First matching column wins; names are compared lowercased
+NAME_COLUMNS = ('name', 'proper', 'common_name', 'messier', 'object')
+# Catalog numbers used as a fallback name and kept as aliases (HYG-style). A
+# bare row id is left out: it names nothing outside the file.
+CATALOG_ID_COLUMNS = (('hip', 'HIP'), ('hd', 'HD'), ('hr', 'HR'), ('gl', 'Gl'))
+RA_COLUMNS = ('ra', 'ra_deg', 'raj2000', 'ra_j2000', 'longitude')
+DEC_COLUMNS = ('dec', 'dec_deg', 'dej2000', 'decj2000', 'dec_j2000', 'latitude')
+TYPE_COLUMNS = ('type', 'object_type', 'class')
+ALIAS_COLUMNS = ('aliases', 'alias', 'other_names', 'identifiers')
+DESCRIPTION_COLUMNS = ('description', 'notes', 'common_names')
+MAGNITUDE_COLUMNS = ('mag', 'magnitude', 'v-mag', 'vmag')
+
+# Catalog type codes mapped onto CelestialCoordinate.TYPE_CHOICES
+TYPE_ALIASES = {
+    'g': 'galaxy', 'gx': 'galaxy', 'gal': 'galaxy', 'galaxy': 'galaxy',
+    'pn': 'nebula', 'neb': 'nebula', 'en': 'nebula', 'rn': 'nebula', 'snr': 'nebula', 'hii': 'nebula',
+    'nebula': 'nebula', 'planetary nebula': 'nebula', 'supernova remnant': 'nebula',
+    '*': 'star', 'star': 'star', 'oc': 'star', 'gc': 'star', 'ocl': 'star', 'gcl': 'star',
+    'open cluster': 'star', 'globular cluster': 'star', 'double star': 'star',
+    'planet': 'planet', 'crater': 'crater', 'mountain': 'mountain',
+}
+
+SEXAGESIMAL_RE = re.compile(
+    r'^\s*([+-]?)\s*(\d+(?:\.\d+)?)\s*([hd°:\s])\s*'
+    r'(?:(\d+(?:\.\d+)?)\s*[m′\':\s]?\s*)?'
+    r'(?:(\d+(?:\.\d+)?)\s*(?:s|″|"|\'\')?\s*)?$',
+    re.IGNORECASE
+)
+ALIAS_SPLIT_RE = re.compile(r'\s*[;|,]\s*')
+
+
+def parse_sexagesimal(value, hours=False):
+    """
+    Degrees from a decimal or sexagesimal value.
+
+    "10h42m44s" is always hours and "41°16′09″"/"41d16m9s" always degrees;
+    bare decimals and "10:42:44"/"10 42 44" are hours when hours is True.
+    """
+    if isinstance(value, (int, float)):
+        return float(value) * (15.0 if hours else 1.0)
+
+    text = str(value).strip()
+    try:
+        return float(text) * (15.0 if hours else 1.0)
+    except ValueError:
+        pass
+
+    match = SEXAGESIMAL_RE.match(text)
+    if not match:
+        raise ValueError(f'Unrecognised angle: {value!r}')
+    sign, whole, unit, minutes, seconds = match.groups()
+    angle = float(whole) + float(minutes or 0) / 60 + float(seconds or 0) / 3600
+    unit = unit.lower()
+    if unit == 'h' or (hours and unit not in ('d', '°')):
+        angle *= 15.0
+    return -angle if sign == '-' else angle
+
+
+def parse_ra(value, hours=False):
+    """RA in degrees; sexagesimal without a degree marker is read as hours"""
+    if isinstance(value, str):
+        try:
+            float(value)
+        except ValueError:
+            return parse_sexagesimal(value, hours=True)
+    return parse_sexagesimal(value, hours=hours)
+
+
+def iter_csv(stream, delimiter=','):
+    for row in csv.DictReader(stream, delimiter=delimiter):
+        yield row
+
+
+def iter_jsonl(stream):
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def _first(row, columns):
+    for column in columns:
+        value = row.get(column)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def _aliases(value):
+    if not value:
+        return []
+    if isinstance(value, list):
+        return [str(alias).strip() for alias in value if str(alias).strip()]
+    return [alias for alias in ALIAS_SPLIT_RE.split(str(value).strip()) if alias]
+
+
+def coordinate_from_row(row, body='Space', default_type='star', ra_hours=False):
+    """Map one catalog row onto a CelestialCoordinate, or None if it has no name or position"""
+    row = {str(key).strip().lower(): value for key, value in row.items() if key is not None}
+
+    catalog_ids = [
+        f'{prefix} {row[column]}'.strip()
+        for column, prefix in CATALOG_ID_COLUMNS
+        if row.get(column) not in (None, '')
+    ]
+    name = _first(row, NAME_COLUMNS) or (catalog_ids[0] if catalog_ids else None)
+    ra = _first(row, RA_COLUMNS)
+    dec = _first(row, DEC_COLUMNS)
+    if name is None or ra is None or dec is None:
+        return None
+
+    name = str(name).strip()[:255]
+    ra = parse_ra(ra, hours=ra_hours) % 360.0
+    dec = parse_sexagesimal(dec)
+    if not -90.0 <= dec <= 90.0:
+        raise ValueError(f'Declination out of range: {dec}')
+
+    raw_type = str(_first(row, TYPE_COLUMNS) or '').strip().lower()
+    coordinate_type = TYPE_ALIASES.get(raw_type, default_type if not raw_type else 'other')
+
+    popularity = _first(row, ('popularity',))
+    if popularity is None:
+        # Brighter objects rank higher in autocomplete
+        magnitude = _first(row, MAGNITUDE_COLUMNS)
+        popularity = round((20.0 - float(magnitude)) * 10) if magnitude is not None else 0
+
+    return CelestialCoordinate(
+        name=name,
+        type=coordinate_type,
+        longitude=ra,  # RA in degrees (0-360)
+        latitude=dec,  # Dec in degrees (-90 to +90)
+        body=str(row.get('body') or body),
+        description=_first(row, DESCRIPTION_COLUMNS),
+        # A purely numeric alias would match years and counts in APOD text
+        aliases=[
+            alias for alias in _aliases(_first(row, ALIAS_COLUMNS)) + catalog_ids
+            if alias != name and not alias.isdigit()
+        ],
+        popularity=int(popularity),
+    )
+
+
+def upsert_coordinates(coordinates):
+    """Insert or update one batch on (name, body); later duplicates in the batch win"""
+    unique = {(coord.name, coord.body): coord for coord in coordinates}
+    with transaction.atomic():
+        CelestialCoordinate.objects.bulk_create(
+            list(unique.values()),
+            update_conflicts=True,
+            unique_fields=['name', 'body'],
+            update_fields=COORDINATE_UPDATE_FIELDS
+        )
+    return len(unique)
+
+
+def refresh_coordinate_indexes():
+    """What the CelestialCoordinate signals would have done for a bulk write"""
+    invalidate_coordinate_indexes()
+    rebuild_sky_clusters()
+    invalidate_status()
+
+
+def import_catalog(rows, body='Space', default_type='star', ra_hours=False,
+                   batch_size=IMPORT_BATCH_SIZE, on_batch=None):
+    """
+    Stream rows into CelestialCoordinate in batches.
+
+    Only one batch is held in memory. on_batch(stats) is called after each
+    batch is written. Returns the final stats dict.
+    """
+    started = time.monotonic()
+    stats = {'read': 0, 'imported': 0, 'skipped': 0, 'batches': 0, 'errors': []}
+    batch = []
+
+    def flush():
+        stats['imported'] += upsert_coordinates(batch)
+        stats['batches'] += 1
+        batch.clear()
+        if on_batch:
+            on_batch(stats)
+
+    for row in rows:
+        stats['read'] += 1
+        try:
+            coordinate = coordinate_from_row(row, body=body, default_type=default_type, ra_hours=ra_hours)
+        except (ValueError, TypeError) as e:
+            coordinate = None
+            if len(stats['errors']) < 10:
+                stats['errors'].append(f"Row {stats['read']}: {e}")
+        if coordinate is None:
+            stats['skipped'] += 1
+            continue
+
+        batch.append(coordinate)
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+
+    if stats['imported']:
+        refresh_coordinate_indexes()
+
+    stats['seconds'] = round(time.monotonic() - started, 2)
+    log_event(
+        level='success',
+        message=f"Catalog import: {stats['imported']} coordinates upserted, {stats['skipped']} rows skipped",
+        details={key: value for key, value in stats.items() if key != 'errors'}
+    )
+    return stats
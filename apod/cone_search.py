@@ -0,0 +1,78 @@
+# apod/cone_search.py
+"""
+RA/Dec cone search over the sky objects of CelestialCoordinate (surface
+features of the Moon, Mars and so on are left out).
+
+Objects are held as unit vectors in a NumPy array sorted by declination.
+A query first narrows to the declination zone [dec - r, dec + r] with two
+binary searches, then keeps the rows whose dot product with the centre is at
+least cos(r). Working on the sphere rather than in RA/Dec makes the 0/360
+wraparound and the poles need no special handling.
+"""
+import numpy as np
+
+from .coordinate_index import VersionedIndex
+from .models import CelestialCoordinate
+
+MAX_RADIUS = 30.0
+
+
+def unit_vectors(ra, dec):
+    """(n, 3) unit vectors for RA/Dec arrays in degrees"""
+    ra = np.radians(ra)
+    dec = np.radians(dec)
+    cos_dec = np.cos(dec)
+    return np.column_stack((cos_dec * np.cos(ra), cos_dec * np.sin(ra), np.sin(dec)))
+
+
+class ConeIndex:
+
+    def __init__(self, ids, ra, dec):
+        order = np.argsort(dec, kind='stable')
+        self.ids = np.asarray(ids, dtype=np.int64)[order]
+        self.dec = np.asarray(dec, dtype=np.float64)[order]
+        self.xyz = unit_vectors(np.asarray(ra, dtype=np.float64)[order], self.dec)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def query(self, ra, dec, radius, limit=100):
+        """(id, separation in degrees) pairs within radius of ra/dec, nearest first"""
+        lo = np.searchsorted(self.dec, dec - radius, side='left')
+        hi = np.searchsorted(self.dec, dec + radius, side='right')
+        if lo >= hi:
+            return []
+
+        center = unit_vectors(np.array([ra]), np.array([dec]))[0]
+        zone = self.xyz[lo:hi]
+        dots = zone @ center
+        hits = np.nonzero(dots >= np.cos(np.radians(radius)))[0]
+        if not len(hits):
+            return []
+
+        # atan2(|a x b|, a . b) stays accurate for tiny separations where arccos does not
+        cross = np.linalg.norm(np.cross(zone[hits], center), axis=1)
+        separations = np.degrees(np.arctan2(cross, dots[hits]))
+        nearest = np.argsort(separations, kind='stable')[:limit]
+        return [(int(self.ids[lo + hits[i]]), float(separations[i])) for i in nearest]
+
+
+def build_index():
+    rows = list(
+        CelestialCoordinate.objects.exclude(body__in=CelestialCoordinate.SURFACE_BODIES)
+        .values_list('id', 'longitude', 'latitude')
+    )
+    ids, ra, dec = zip(*rows) if rows else ((), (), ())
+    # RA is stored in longitude (0-360) and Dec in latitude (-90 to +90)
+    return ConeIndex(ids, np.mod(ra, 360.0), np.clip(dec, -90.0, 90.0))
+
+
+_index = VersionedIndex(build_index)
+
+
+def warm_index():
+    _index.warm()
+
+
+def cone_search(ra, dec, radius, limit=100):
+    return _index.get().query(ra % 360.0, dec, radius, limit)
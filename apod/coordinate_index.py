@@ -0,0 +1,61 @@
+# apod/coordinate_index.py
+"""
+Per-worker in-memory indexes over CelestialCoordinate.
+
+Each worker builds its indexes once and checks a shared version stamp in the
+Django cache at most once per VERSION_CHECK_SECONDS. Any write to the table
+(model signals, bulk imports) bumps the stamp, so every worker rebuilds on
+its next lookup. Indexes over other tables pass their own version key.
+"""
+import threading
+import time
+import uuid
+
+from django.core.cache import cache
+
+VERSION_KEY = 'apod:coordinates:version'
+VERSION_CHECK_SECONDS = 1.0
+
+
+class VersionedIndex:
+
+    def __init__(self, build, version_key=VERSION_KEY):
+        self.build = build
+        self.version_key = version_key
+        self.index = None
+        self.version = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def get(self):
+        """Return this worker's index, rebuilding it if another process changed the table"""
+        now = time.monotonic()
+        if self.index is not None and now - self.checked_at < VERSION_CHECK_SECONDS:
+            return self.index
+
+        with self.lock:
+            version = cache.get(self.version_key)
+            if self.index is None or version != self.version:
+                self.index = self.build()
+                self.version = version
+            self.checked_at = now
+        return self.index
+
+    def invalidate(self):
+        """Make every worker sharing this index's version key rebuild it"""
+        cache.set(self.version_key, uuid.uuid4().hex, None)
+
+    def warm(self):
+        """Build the index on a background thread when a worker starts"""
+        def build():
+            try:
+                self.get()
+            except Exception as e:
+                print(f"Coordinate index warm-up failed: {e}")
+
+        threading.Thread(target=build, name='coordinate-index-warm', daemon=True).start()
+
+
+def invalidate_coordinate_indexes():
+    """Tell every worker to rebuild its coordinate indexes on the next lookup"""
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
@@ -0,0 +1,178 @@
+# apod/crosslinks.py
+"""
+Cross-links from APOD text to catalog objects.
+
+An Aho-Corasick automaton over every CelestialCoordinate name and alias
+scans each title and explanation once, whatever the catalog size. Matches
+must sit on word boundaries and the leftmost-longest one wins, so "M3" does
+not fire inside "M31" and "Orion Nebula" beats "Orion". Results are stored
+as APODObjectMention rows and kept current by the APODImage signals and
+the bulk backfill path.
+"""
+from collections import Counter, deque
+
+from django.db import transaction
+
+from .autocomplete import normalize
+from .coordinate_index import VersionedIndex
+from .models import APODImage, APODObjectMention, CelestialCoordinate
+
+# Aliases are often short catalogue codes, so they need more characters than
+# names; a pattern without a letter (a year, a count) never links anything
+MIN_NAME_LENGTH = 2
+MIN_ALIAS_LENGTH = 3
+LINK_BATCH_SIZE = 500
+
+
+class AhoCorasick:
+
+    def __init__(self, patterns):
+        # Node 0 is the root; goto[n] maps a character to the next node
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        self.lengths = []
+
+        for pattern_id, pattern in enumerate(patterns):
+            node = 0
+            for ch in pattern:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                node = nxt
+            self.output[node].append(pattern_id)
+            self.lengths.append(len(pattern))
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                fallback = self.fail[node]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(ch, 0)
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def find(self, text):
+        """Yield (start, end, pattern_id) for every occurrence in text"""
+        goto, fail, output, lengths = self.goto, self.fail, self.output, self.lengths
+        node = 0
+        for end, ch in enumerate(text, 1):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for pattern_id in output[node]:
+                yield end - lengths[pattern_id], end, pattern_id
+
+
+def _is_word_char(ch):
+    return ch.isalnum()
+
+
+def best_matches(automaton, text):
+    """Leftmost-longest, non-overlapping matches on word boundaries"""
+    candidates = [
+        (start, end, pattern_id)
+        for start, end, pattern_id in automaton.find(text)
+        if (start == 0 or not _is_word_char(text[start - 1]))
+        and (end == len(text) or not _is_word_char(text[end]))
+    ]
+    candidates.sort(key=lambda match: (match[0], match[0] - match[1]))
+
+    matches = []
+    covered = 0
+    for start, end, pattern_id in candidates:
+        if start >= covered:
+            matches.append(pattern_id)
+            covered = end
+    return matches
+
+
+class ObjectMatcher:
+    """The automaton plus the coordinate ids behind each pattern"""
+
+    def __init__(self, rows):
+        targets = {}
+        for coordinate_id, name, aliases in rows:
+            labels = [(name, MIN_NAME_LENGTH)] + [(alias, MIN_ALIAS_LENGTH) for alias in aliases or []]
+            for label, min_length in labels:
+                pattern = normalize(label)
+                if len(pattern) >= min_length and any(ch.isalpha() for ch in pattern):
+                    targets.setdefault(pattern, set()).add(coordinate_id)
+        self.patterns = list(targets)
+        self.targets = [targets[pattern] for pattern in self.patterns]
+        self.automaton = AhoCorasick(self.patterns)
+
+    def mentions(self, text):
+        """Counter of coordinate id -> occurrences in text"""
+        counts = Counter()
+        for pattern_id in best_matches(self.automaton, normalize(text)):
+            for coordinate_id in self.targets[pattern_id]:
+                counts[coordinate_id] += 1
+        return counts
+
+
+def build_matcher():
+    return ObjectMatcher(CelestialCoordinate.objects.values_list('id', 'name', 'aliases'))
+
+
+_matcher = VersionedIndex(build_matcher)
+
+
+def _link_rows(rows):
+    """Replace the mentions of (id, title, explanation) rows; returns the number stored"""
+    matcher = _matcher.get()
+    mentions = []
+    for image_id, title, explanation in rows:
+        in_title = matcher.mentions(title)
+        counts = in_title + matcher.mentions(explanation)
+        mentions.extend(
+            APODObjectMention(image_id=image_id, coordinate_id=coordinate_id,
+                              count=count, in_title=coordinate_id in in_title)
+            for coordinate_id, count in counts.items()
+        )
+
+    with transaction.atomic():
+        APODObjectMention.objects.filter(image_id__in=[row[0] for row in rows]).delete()
+        APODObjectMention.objects.bulk_create(mentions, batch_size=1000)
+    return len(mentions)
+
+
+def link_images(ids):
+    """Rescan the given images"""
+    rows = list(APODImage.objects.filter(id__in=list(ids)).values_list('id', 'title', 'explanation'))
+    return _link_rows(rows) if rows else 0
+
+
+def link_dates(dates):
+    """Rescan the images on dates written by bulk upserts (no signals)"""
+    return link_images(APODImage.objects.filter(date__in=list(dates)).values_list('id', flat=True))
+
+
+def relink_all(batch_size=LINK_BATCH_SIZE, on_batch=None):
+    """
+    Rescan every image in id order; returns (images, mentions).
+
+    Batches are keyset-paged rather than read through one open cursor, so
+    other writers (the SystemLog sink) are never blocked behind the scan.
+    """
+    images = mentions = 0
+    last_id = 0
+    while True:
+        batch = list(
+            APODImage.objects.filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'title', 'explanation')[:batch_size]
+        )
+        if not batch:
+            break
+        mentions += _link_rows(batch)
+        images += len(batch)
+        last_id = batch[-1][0]
+        if on_batch:
+            on_batch(images, mentions)
+    return images, mentions
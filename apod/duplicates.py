@@ -0,0 +1,146 @@
+# apod/duplicates.py
+"""
+Near-duplicate APOD pictures by perceptual-hash Hamming distance.
+
+Hashes are split into CHUNKS 16-bit pieces, each with its own table
+(multi-index hashing). Two hashes within distance d must agree to within
+d // CHUNKS bits on at least one piece, so a query only probes the table
+entries near its own pieces and verifies those few candidates; it never
+scans the archive. Each worker keeps the index in memory and rebuilds it
+when the shared version stamp changes after hashes are stored.
+"""
+from itertools import combinations
+
+import numpy as np
+import requests
+from PIL import Image
+
+from .coordinate_index import VersionedIndex
+from .image_proxy import open_rendition, resolve
+from .models import APODImage
+from .perceptual_hash import SAMPLE_WIDTH, image_hashes, signed_hashes, to_unsigned
+
+CHUNKS = 4
+CHUNK_BITS = 16
+DEFAULT_DISTANCE = 10
+MAX_DISTANCE = 12
+HASH_VERSION_KEY = 'apod:hashes:version'
+
+_POPCOUNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+_masks = {}
+
+
+def popcount(values):
+    """Set bits of each uint64"""
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    return _POPCOUNT8[values.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def flip_masks(radius):
+    """Every CHUNK_BITS-bit mask with at most radius bits set"""
+    if radius not in _masks:
+        masks = [0]
+        for bits in range(1, radius + 1):
+            masks.extend(sum(1 << bit for bit in chosen) for chosen in combinations(range(CHUNK_BITS), bits))
+        _masks[radius] = np.array(masks, dtype=np.uint64)
+    return _masks[radius]
+
+
+def _ranges(starts, ends):
+    """Concatenation of range(start, end) for every pair, vectorised"""
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if not total:
+        return np.zeros(0, dtype=np.int64)
+    return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+
+
+class HammingIndex:
+
+    def __init__(self, rows):
+        """rows are (id, phash, dhash) with hashes as unsigned integers"""
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.phashes = np.array([row[1] for row in rows], dtype=np.uint64)
+        self.dhashes = np.array([row[2] or 0 for row in rows], dtype=np.uint64)
+        self.positions = {int(image_id): i for i, image_id in enumerate(self.ids)}
+
+        # One table per chunk: rows ordered by that chunk, plus the sorted chunk values
+        self.orders = []
+        self.sorted_chunks = []
+        for chunk in range(CHUNKS):
+            pieces = (self.phashes >> np.uint64(CHUNK_BITS * chunk)) & np.uint64((1 << CHUNK_BITS) - 1)
+            order = np.argsort(pieces, kind='stable')
+            self.orders.append(order)
+            self.sorted_chunks.append(pieces[order])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, value, max_distance):
+        """(rows, distances) of hashes within max_distance of value, nearest first"""
+        masks = flip_masks(max_distance // CHUNKS)
+        candidates = []
+        for chunk in range(CHUNKS):
+            probes = np.uint64((value >> (CHUNK_BITS * chunk)) & ((1 << CHUNK_BITS) - 1)) ^ masks
+            sorted_chunk = self.sorted_chunks[chunk]
+            starts = np.searchsorted(sorted_chunk, probes, side='left')
+            ends = np.searchsorted(sorted_chunk, probes, side='right')
+            candidates.append(self.orders[chunk][_ranges(starts, ends)])
+
+        rows = np.unique(np.concatenate(candidates))
+        distances = popcount(self.phashes[rows] ^ np.uint64(value)).astype(np.int64)
+        keep = distances <= max_distance
+        rows, distances = rows[keep], distances[keep]
+        order = np.lexsort((rows, distances))
+        return rows[order], distances[order]
+
+
+def build_index():
+    rows = APODImage.objects.exclude(phash=None).values_list('id', 'phash', 'dhash')
+    return HammingIndex([
+        (image_id, to_unsigned(phash), to_unsigned(dhash) if dhash is not None else None)
+        for image_id, phash, dhash in rows
+    ])
+
+
+_index = VersionedIndex(build_index, version_key=HASH_VERSION_KEY)
+
+
+def invalidate_hash_index():
+    _index.invalidate()
+
+
+def near_duplicates(image_id, max_distance=DEFAULT_DISTANCE):
+    """[(image id, phash distance, dhash distance)] within max_distance, or None if the image has no hash"""
+    index = _index.get()
+    row = index.positions.get(image_id)
+    if row is None:
+        return None
+    rows, distances = index.search(int(index.phashes[row]), min(max_distance, MAX_DISTANCE))
+    dhash_distances = popcount(index.dhashes[rows] ^ index.dhashes[row])
+    return [
+        (int(index.ids[other]), int(distance), int(dhash_distance))
+        for other, distance, dhash_distance in zip(rows, distances, dhash_distances)
+        if other != row
+    ]
+
+
+def hash_images(ids):
+    """Hash images from their SAMPLE_WIDTH rendition; returns the number stored"""
+    stored = 0
+    for image_id in ids:
+        rendition = resolve('apod', image_id, SAMPLE_WIDTH, 'png')
+        if rendition is None:
+            continue
+        try:
+            f, _ = open_rendition(rendition)
+            with f, Image.open(f) as image:
+                hashes = image_hashes(image)
+        except (requests.exceptions.RequestException, OSError, ValueError) as e:
+            print(f"Error hashing APOD {image_id}: {e}")
+            continue
+        # No save(): hashes must not re-run the text indexing signals
+        stored += APODImage.objects.filter(id=image_id).update(**signed_hashes(hashes))
+    if stored:
+        invalidate_hash_index()
+    return stored
@@ -0,0 +1,276 @@
+# apod/image_mirror.py
+"""
+Local mirror of APOD originals with pre-generated responsive variants.
+
+Each new picture's original is streamed into MEDIA_ROOT/apod/<year>/<date>/
+and resized once into WebP and JPEG at APOD_MIRROR_WIDTHS, so pages can
+offer srcset candidates instead of hot-linking the multi-megabyte original.
+Downloads run on threads and resizing on a process pool. The mirror is kept
+under APOD_MIRROR_MAX_BYTES by evicting the least recently viewed images;
+page renders bump last_accessed at most once per TOUCH_INTERVAL.
+"""
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .image_variants import render_variants
+from .logsink import log_event
+from .models import APODImage, ImageMirror
+from .perceptual_hash import signed_hashes
+
+MIRROR_DIR = 'apod'
+DOWNLOAD_TIMEOUT = 60
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+MAX_ORIGINAL_BYTES = 100 * 1024 * 1024
+TOUCH_INTERVAL = timedelta(hours=1)
+# Width served as the plain src for browsers without srcset support
+DEFAULT_SRC_WIDTH = 1024
+MIRROR_BATCH_SIZE = 50
+EVICT_BATCH_SIZE = 100
+
+_session = None
+
+
+def get_session():
+    global _session
+    if _session is None:
+        session = requests.Session()
+        # Shared with the resize proxy's request threads
+        session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=max(settings.APOD_MIRROR_WORKERS, 8)))
+        session.headers['User-Agent'] = 'emiigen-apod-mirror'
+        _session = session
+    return _session
+
+
+def mirror_path(image):
+    """Directory of an image's files, relative to MEDIA_ROOT"""
+    return f'{MIRROR_DIR}/{image.date:%Y}/{image.date.isoformat()}'
+
+
+def media_path(relative):
+    return os.path.join(settings.MEDIA_ROOT, relative)
+
+
+def media_url(relative):
+    return f'{settings.MEDIA_URL}{relative}'
+
+
+def stream_to(url, path):
+    """Stream an image URL into path, refusing non-images and anything over MAX_ORIGINAL_BYTES"""
+    with get_session().get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+        response.raise_for_status()
+        content_type = response.headers.get('Content-Type', '')
+        if content_type and not content_type.startswith('image/'):
+            raise ValueError(f'Not an image: {content_type}')
+        size = 0
+        with open(path, 'wb') as f:
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_ORIGINAL_BYTES:
+                    raise ValueError(f'Original larger than {MAX_ORIGINAL_BYTES} bytes')
+                f.write(chunk)
+
+
+def download_original(image):
+    """Stream the original into the image's mirror directory; returns its path relative to MEDIA_ROOT"""
+    url = image.hdurl or image.url
+    directory = mirror_path(image)
+    os.makedirs(media_path(directory), exist_ok=True)
+
+    extension = os.path.splitext(url.split('?')[0])[1].lower() or '.jpg'
+    relative = f'{directory}/original{extension}'
+    partial = media_path(relative) + '.part'
+    stream_to(url, partial)
+    os.replace(partial, media_path(relative))
+    return relative
+
+
+def _render_pool(workers):
+    """
+    Processes for the CPU-bound resizing. Celery's prefork children are
+    daemonic and may not start processes, so they fall back to threads
+    (Pillow releases the GIL while resampling and encoding).
+    """
+    if multiprocessing.current_process().daemon:
+        return ThreadPoolExecutor(max_workers=workers)
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def _record_failure(image, error):
+    shutil.rmtree(media_path(mirror_path(image)), ignore_errors=True)
+    ImageMirror.objects.update_or_create(
+        image=image,
+        defaults={'status': 'failed', 'original': '', 'variants': [], 'total_bytes': 0, 'error': str(error)[:1000]}
+    )
+
+
+def _record_ready(image, original, result):
+    directory = mirror_path(image)
+    variants = [
+        {'width': v['width'], 'format': v['format'], 'path': f"{directory}/{v['name']}", 'bytes': v['bytes']}
+        for v in result['variants']
+    ]
+    total = os.path.getsize(media_path(original)) + sum(v['bytes'] for v in variants)
+    ImageMirror.objects.update_or_create(
+        image=image,
+        defaults={
+            'status': 'ready', 'original': original, 'width': result['width'], 'height': result['height'],
+            'variants': variants, 'total_bytes': total, 'error': None, 'last_accessed': timezone.now(),
+        }
+    )
+    APODImage.objects.filter(id=image.id, phash=None).update(**signed_hashes(result['hashes']))
+    return total
+
+
+def mirror_images(ids, workers=None):
+    """
+    Download and resize the given images; returns {'ready', 'failed', 'bytes'}.
+
+    Videos and other non-image media are skipped. Renders start as soon as
+    each download lands, so downloading and resizing overlap.
+    """
+    workers = workers or settings.APOD_MIRROR_WORKERS
+    images = list(APODImage.objects.filter(id__in=list(ids), media_type='image'))
+    stats = {'ready': 0, 'failed': 0, 'bytes': 0}
+    if not images:
+        return stats
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as downloads, _render_pool(workers) as renders:
+        fetching = {downloads.submit(download_original, image): image for image in images}
+        rendering = {}
+        for future in as_completed(fetching):
+            image = fetching[future]
+            try:
+                original = future.result()
+            except (requests.RequestException, OSError, ValueError) as e:
+                print(f"Error downloading APOD image for {image.date}: {e}")
+                _record_failure(image, e)
+                stats['failed'] += 1
+                continue
+            render = renders.submit(
+                render_variants, media_path(original), media_path(mirror_path(image)),
+                tuple(settings.APOD_MIRROR_WIDTHS), tuple(settings.APOD_MIRROR_FORMATS)
+            )
+            rendering[render] = (image, original)
+
+        for future in as_completed(rendering):
+            image, original = rendering[future]
+            try:
+                result = future.result()
+            except (OSError, ValueError) as e:
+                print(f"Error resizing APOD image for {image.date}: {e}")
+                _record_failure(image, e)
+                stats['failed'] += 1
+                continue
+            stats['bytes'] += _record_ready(image, original, result)
+            stats['ready'] += 1
+
+    if stats['ready']:
+        # Imported here: the duplicate index reads through the resize proxy, which imports this module
+        from .duplicates import invalidate_hash_index
+        invalidate_hash_index()
+
+    log_event(
+        level='success' if not stats['failed'] else 'warning',
+        message=f"Mirrored {stats['ready']} APOD images ({stats['failed']} failed) "
+                f"in {time.monotonic() - started:.1f}s",
+        details=dict(stats)
+    )
+    return stats
+
+
+def mirror_new_images(limit=MIRROR_BATCH_SIZE, retry_failed=False):
+    """Mirror the newest images that have no mirror yet, then enforce the disk budget"""
+    pending = Q(mirror__isnull=True)
+    if retry_failed:
+        pending |= Q(mirror__status='failed')
+    ids = list(
+        APODImage.objects.filter(pending, media_type='image').order_by('-date').values_list('id', flat=True)[:limit]
+    )
+    stats = mirror_images(ids)
+    stats['evicted'] = enforce_budget()
+    return stats
+
+
+def evict(mirror):
+    """Delete an image's files; pages fall back to the remote URLs"""
+    shutil.rmtree(media_path(mirror_path(mirror.image)), ignore_errors=True)
+    mirror.status = 'evicted'
+    mirror.original = ''
+    mirror.variants = []
+    mirror.total_bytes = 0
+    mirror.save()
+
+
+def enforce_budget(max_bytes=None):
+    """Evict least recently viewed images until the mirror fits max_bytes; returns the number evicted"""
+    max_bytes = settings.APOD_MIRROR_MAX_BYTES if max_bytes is None else max_bytes
+    ready = ImageMirror.objects.filter(status='ready')
+    total = ready.aggregate(total=Sum('total_bytes'))['total'] or 0
+
+    evicted = 0
+    while total > max_bytes:
+        batch = list(ready.select_related('image').order_by('last_accessed', 'id')[:EVICT_BATCH_SIZE])
+        if not batch:
+            break
+        for mirror in batch:
+            if total <= max_bytes:
+                break
+            total -= mirror.total_bytes
+            evict(mirror)
+            evicted += 1
+
+    if evicted:
+        log_event(level='info', message=f'Evicted {evicted} mirrored APOD images to stay under {max_bytes} bytes')
+    return evicted
+
+
+def sources(mirror):
+    """
+    Per-format srcset strings of a ready mirror, plus a DEFAULT_SRC_WIDTH
+    candidate per format and 'src' (JPEG when mirrored) for plain src and
+    CSS image-set() use.
+    """
+    srcset = {}
+    default = {}
+    for variant in mirror.variants:
+        url = media_url(variant['path'])
+        srcset.setdefault(variant['format'], []).append(f"{url} {variant['width']}w")
+        # Variants are smallest first: keep the widest that fits, else the smallest
+        if variant['width'] <= DEFAULT_SRC_WIDTH or variant['format'] not in default:
+            default[variant['format']] = url
+
+    return {
+        'src': default.get('jpeg') or next(iter(default.values()), media_url(mirror.original)),
+        'default': default,
+        'srcset': {fmt: ', '.join(candidates) for fmt, candidates in srcset.items()},
+        'original': media_url(mirror.original),
+        'width': mirror.width,
+        'height': mirror.height,
+    }
+
+
+def image_sources(image_ids, touch=False):
+    """
+    {image_id: sources} for the mirrored images among image_ids, in one query.
+
+    With touch, images not viewed within TOUCH_INTERVAL get a fresh
+    last_accessed, so eviction follows what pages actually show.
+    """
+    mirrors = list(ImageMirror.objects.filter(image_id__in=list(image_ids), status='ready'))
+    if touch:
+        now = timezone.now()
+        stale = [mirror.id for mirror in mirrors if mirror.last_accessed < now - TOUCH_INTERVAL]
+        if stale:
+            ImageMirror.objects.filter(id__in=stale).update(last_accessed=now)
+    return {mirror.image_id: sources(mirror) for mirror in mirrors}
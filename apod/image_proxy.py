@@ -0,0 +1,100 @@
+# apod/image_proxy.py
+"""
+On-demand resized images for /img/<kind>/<id>?w=&fmt=.
+
+A kind maps an id onto its source image: APOD pictures (the mirrored
+original when there is one, otherwise NASA's url, or the thumbnail for
+videos) and Worldview Images of the Week. Widths are snapped up to
+WIDTH_STEP and capped at MAX_WIDTH so the number of renditions per source
+stays bounded. Remote sources and renditions share one DiskCache, named by
+the hash of the source and the rendition parameters, so identical requests
+from any worker are resized once.
+"""
+from django.conf import settings
+from django.urls import reverse
+
+from emiigen.disk_cache import DiskCache
+from gibs.models import WorldviewImageOfWeek
+
+from .image_mirror import media_path, stream_to
+from .image_variants import SAVE_OPTIONS, render_width
+from .models import APODImage, ImageMirror
+
+WIDTH_STEP = 32
+MAX_WIDTH = 2048
+DEFAULT_WIDTH = 640
+FORMATS = ('webp', 'jpeg', 'png')
+CONTENT_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg', 'png': 'image/png'}
+
+image_cache = DiskCache('images', settings.IMAGE_PROXY_ROOT, settings.IMAGE_PROXY_MAX_BYTES)
+
+
+def apod_source(image_id):
+    """Local mirrored original, else the remote picture or video thumbnail"""
+    image = APODImage.objects.filter(id=image_id).values('media_type', 'url', 'thumbnail_url').first()
+    if not image:
+        return None
+    original = ImageMirror.objects.filter(image_id=image_id, status='ready').values_list('original', flat=True).first()
+    if original:
+        return {'path': media_path(original), 'address': f'mirror:{original}'}
+    url = image['url'] if image['media_type'] == 'image' else image['thumbnail_url']
+    return {'url': url, 'address': url} if url else None
+
+
+def worldview_source(image_id):
+    image = WorldviewImageOfWeek.objects.filter(id=image_id).values('image_url').first()
+    return {'url': image['image_url'], 'address': image['image_url']} if image else None
+
+
+SOURCES = {
+    'apod': apod_source,
+    'worldview': worldview_source,
+}
+
+
+def proxy_url(kind, image_id, width):
+    return f"{reverse('apod:image_proxy', args=[kind, image_id])}?w={width}"
+
+
+def snap_width(width):
+    """Round up to WIDTH_STEP within [WIDTH_STEP, MAX_WIDTH]"""
+    return min(MAX_WIDTH, max(WIDTH_STEP, -(-width // WIDTH_STEP) * WIDTH_STEP))
+
+
+def negotiate_format(fmt, accept):
+    """(format, negotiated): WebP for browsers that accept it when fmt is not given"""
+    if fmt:
+        return fmt, False
+    return ('webp' if 'image/webp' in (accept or '') else 'jpeg'), True
+
+
+def _source_path(source):
+    """A local path for the source, downloading remote ones into the cache once"""
+    if 'path' in source:
+        return source['path']
+    path, _ = image_cache.fill(DiskCache.key('source', source['url']), 'src', lambda temp: stream_to(source['url'], temp))
+    return path
+
+
+def resolve(kind, image_id, width, fmt):
+    """
+    {'source', 'width', 'format', 'key', 'etag'} for a request, or None when
+    the kind, id or source does not exist. Nothing is downloaded yet, so a
+    matching If-None-Match can be answered without touching the image.
+    """
+    lookup = SOURCES.get(kind)
+    source = lookup(image_id) if lookup else None
+    if not source:
+        return None
+
+    width = snap_width(width)
+    key = DiskCache.key('rendition', source['address'], width, fmt, sorted(SAVE_OPTIONS[fmt].items()))
+    return {'source': source, 'width': width, 'format': fmt, 'key': key, 'etag': f'"{key[:32]}"'}
+
+
+def open_rendition(rendition):
+    """(open file, hit); download and decode errors propagate"""
+    def produce(temp):
+        render_width(_source_path(rendition['source']), temp, rendition['width'], rendition['format'])
+
+    return image_cache.open(rendition['key'], rendition['format'], produce)
@@ -0,0 +1,83 @@
+# apod/image_variants.py
+"""
+Responsive variants of one downloaded APOD original.
+
+Only Pillow and NumPy are imported here, no Django, so these functions can
+run in a process pool worker without setting up the project.
+"""
+import os
+
+from PIL import Image, ImageOps
+
+from .perceptual_hash import image_hashes
+
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg', 'png': 'png'}
+SAVE_OPTIONS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+    'png': {'format': 'PNG', 'optimize': True},
+}
+
+
+def target_widths(original_width, widths):
+    """The requested widths below the original, plus the original when it is smaller than the largest"""
+    targets = sorted(width for width in widths if width < original_width)
+    if original_width <= max(widths):
+        targets.append(original_width)
+    return targets
+
+
+def _opaque(image):
+    if image.mode in ('RGB', 'L'):
+        return image
+    return image.convert('RGBA').convert('RGB') if 'A' in image.getbands() else image.convert('RGB')
+
+
+def render_variants(source_path, out_dir, widths, formats):
+    """
+    Write every width/format variant of source_path into out_dir.
+
+    Returns {'width', 'height', 'hashes', 'variants': [{'width', 'format',
+    'name', 'bytes'}]} with the variants smallest first and the perceptual
+    hashes of the image. Images are never upscaled.
+    """
+    with Image.open(source_path) as original:
+        image = _opaque(ImageOps.exif_transpose(original))
+        width, height = image.size
+        hashes = image_hashes(image)
+
+        variants = []
+        # Resize down the width ladder from the previous step; each step is a clean downscale
+        current = image
+        for target in sorted(target_widths(width, widths), reverse=True):
+            if target != current.width:
+                current = current.resize((target, max(1, round(height * target / width))), Image.LANCZOS)
+            for fmt in formats:
+                name = f'{target}.{EXTENSIONS[fmt]}'
+                path = os.path.join(out_dir, name)
+                current.save(path, **SAVE_OPTIONS[fmt])
+                variants.append({'width': target, 'format': fmt, 'name': name, 'bytes': os.path.getsize(path)})
+
+    variants.sort(key=lambda variant: (variant['width'], variant['format']))
+    return {'width': width, 'height': height, 'hashes': hashes, 'variants': variants}
+
+
+def render_width(source_path, out_path, width, fmt):
+    """
+    Write one variant of source_path at width (capped at the original) in fmt.
+
+    PNG keeps transparency; WebP and JPEG are flattened. Returns the
+    (width, height) written.
+    """
+    with Image.open(source_path) as original:
+        # JPEGs decode straight at a 1/2, 1/4 or 1/8 scale that still covers width either way up
+        original.draft('RGB', (width, width))
+        image = ImageOps.exif_transpose(original)
+        if fmt == 'png' and ('A' in image.getbands() or image.mode == 'P'):
+            image = image.convert('RGBA')
+        else:
+            image = _opaque(image)
+        if width < image.width:
+            image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        image.save(out_path, **SAVE_OPTIONS[fmt])
+        return image.size
@@ -0,0 +1,215 @@
+# apod/jobs.py
+import json
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .backfill import backfill_apod_range
+from .models import TerminalJob
+
+# Running jobs whose last heartbeat is older than this are treated as dead
+JOB_STALE_AFTER = timedelta(minutes=10)
+# Pending jobs no worker has picked up for this long were lost by the broker
+JOB_QUEUED_MAX = timedelta(hours=6)
+
+# Submissions hold this lock in the shared cache while they compare and insert ranges
+SUBMIT_LOCK_KEY = 'terminal-jobs:submit'
+SUBMIT_LOCK_TIMEOUT = 30
+POLL_SECONDS = 0.05
+
+# Milliseconds the browser waits before asking an SSE endpoint for more events
+STREAM_RETRY_MS = 1000
+
+
+def expire_stale_jobs():
+    """
+    Fail running jobs whose heartbeat stopped and pending jobs that waited
+    in the queue for longer than JOB_QUEUED_MAX
+    """
+    now = timezone.now()
+    TerminalJob.objects.filter(
+        Q(status='running', heartbeat_at__lt=now - JOB_STALE_AFTER)
+        | Q(status='pending', created_at__lt=now - JOB_QUEUED_MAX)
+    ).update(status='failed', error='Job stopped reporting progress', updated_at=now)
+
+
+@contextmanager
+def submit_lock():
+    """
+    Serialise submissions across worker processes, so two requests for
+    overlapping ranges cannot both find the same dates uncovered
+    """
+    deadline = time.monotonic() + SUBMIT_LOCK_TIMEOUT
+    acquired = cache.add(SUBMIT_LOCK_KEY, 1, SUBMIT_LOCK_TIMEOUT)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(POLL_SECONDS)
+        acquired = cache.add(SUBMIT_LOCK_KEY, 1, SUBMIT_LOCK_TIMEOUT)
+    # Past the deadline the holder is stuck or dead: go ahead, the unique
+    # active range still guards exact repeats
+    try:
+        yield
+    finally:
+        if acquired:
+            cache.delete(SUBMIT_LOCK_KEY)
+
+
+def active_jobs_overlapping(start_date, end_date):
+    """Pending or running jobs whose range overlaps [start_date, end_date]"""
+    return list(
+        TerminalJob.objects.filter(
+            status__in=TerminalJob.ACTIVE_STATUSES,
+            start_date__lte=end_date,
+            end_date__gte=start_date,
+        ).order_by('start_date')
+    )
+
+
+def uncovered_ranges(start_date, end_date, jobs):
+    """Split [start_date, end_date] into the pieces not covered by any job"""
+    ranges = []
+    cursor = start_date
+    for job in sorted(jobs, key=lambda j: j.start_date):
+        if job.start_date > cursor:
+            ranges.append((cursor, min(end_date, job.start_date - timedelta(days=1))))
+        cursor = max(cursor, job.end_date + timedelta(days=1))
+        if cursor > end_date:
+            break
+    if cursor <= end_date:
+        ranges.append((cursor, end_date))
+    return ranges
+
+
+def submit_range(kind, start_date, end_date):
+    """
+    Queue background work for [start_date, end_date] and return the job ids to follow.
+
+    Dates already covered by a pending or running job are shared with that
+    job; only the uncovered pieces get new jobs, which run on a Celery
+    worker once the transaction commits. The lookup and the inserts run
+    under submit_lock and commit before it is released, so a concurrent
+    request sees these jobs and shares them.
+    """
+    expire_stale_jobs()
+    job_ids = []
+
+    with submit_lock(), transaction.atomic():
+        shared = active_jobs_overlapping(start_date, end_date)
+        job_ids.extend(job.id for job in shared)
+
+        for piece_start, piece_end in uncovered_ranges(start_date, end_date, shared):
+            try:
+                with transaction.atomic():
+                    job = TerminalJob.objects.create(kind=kind, start_date=piece_start, end_date=piece_end)
+            except IntegrityError:
+                job = TerminalJob.objects.get(
+                    status__in=TerminalJob.ACTIVE_STATUSES, start_date=piece_start, end_date=piece_end
+                )
+            else:
+                transaction.on_commit(lambda job_id=job.id: dispatch_job(job_id))
+            job_ids.append(job.id)
+
+    return job_ids
+
+
+def dispatch_job(job_id):
+    """Queue a job on the Celery worker, failing it if the broker cannot take it"""
+    try:
+        from .tasks import run_terminal_job
+        run_terminal_job.delay(job_id)
+    except Exception as e:
+        TerminalJob.objects.filter(id=job_id).update(
+            status='failed', error=f'Could not queue job: {e}', updated_at=timezone.now()
+        )
+
+
+def job_dates(start_date, end_date):
+    """Dates from end_date back to start_date, newest first like the terminal output"""
+    return [end_date - timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+
+
+def date_result(date, saved):
+    if date in saved:
+        return {'success': True, 'date': date.strftime('%Y-%m-%d'), 'title': saved[date]}
+    return {'success': False, 'date': date.strftime('%Y-%m-%d'), 'error': 'Failed to fetch'}
+
+
+def run_job(job_id):
+    """Run a terminal job, saving results after every window"""
+    close_old_connections()
+    try:
+        # A redelivered task must not run a job twice
+        if not TerminalJob.objects.filter(id=job_id, status='pending').update(
+            status='running', heartbeat_at=timezone.now(), updated_at=timezone.now()
+        ):
+            return
+        job = TerminalJob.objects.get(id=job_id)
+
+        reported = set()
+
+        def on_window(window_start, window_end, images, error):
+            saved = {image.date: image.title for image in images}
+            window = job_dates(window_start, window_end)
+            job.results.extend(date_result(date, saved) for date in window)
+            reported.update(window)
+            job.heartbeat_at = timezone.now()
+            job.save(update_fields=['results', 'heartbeat_at', 'updated_at'])
+
+        backfill_apod_range(job.start_date, job.end_date, on_window=on_window)
+
+        # Dates outside the archive (future or before 1995-06-16) are never requested
+        skipped = [date for date in job_dates(job.start_date, job.end_date) if date not in reported]
+        job.results.extend(date_result(date, {}) for date in skipped)
+        job.status = 'completed'
+        job.save(update_fields=['results', 'status', 'updated_at'])
+    except Exception as e:
+        TerminalJob.objects.filter(id=job_id).update(status='failed', error=str(e), updated_at=timezone.now())
+    finally:
+        close_old_connections()
+
+
+def job_summary(job):
+    successes = sum(1 for result in job.results if result.get('success'))
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'start_date': job.start_date.strftime('%Y-%m-%d'),
+        'end_date': job.end_date.strftime('%Y-%m-%d'),
+        'total': (job.end_date - job.start_date).days + 1,
+        'done': len(job.results),
+        'count': successes,
+        'error': job.error,
+    }
+
+
+def sse_event(event, data, event_id=None):
+    message = f'event: {event}\ndata: {json.dumps(data)}\n\n'
+    if event_id is not None:
+        message = f'id: {event_id}\n' + message
+    return message
+
+
+def job_events(job_id, last_index=0):
+    """
+    Server-Sent Events for a job's results after last_index: one "result"
+    per date, then "done" once it has finished.
+
+    The response ends straight away rather than holding a worker while the
+    job runs; the browser reconnects after STREAM_RETRY_MS and, because
+    event ids are result offsets, resumes from its Last-Event-ID.
+    """
+    job = TerminalJob.objects.filter(id=job_id).first()
+    if job is None:
+        return sse_event('error', {'error': 'Job not found'})
+
+    events = [f'retry: {STREAM_RETRY_MS}\n\n']
+    for index, result in enumerate(job.results[last_index:], start=last_index + 1):
+        events.append(sse_event('result', result, event_id=index))
+    if job.status in ('completed', 'failed'):
+        events.append(sse_event('done', job_summary(job)))
+    return ''.join(events)
@@ -0,0 +1,108 @@
+# apod/logsink.py
+"""
+Buffered SystemLog writer.
+
+Entries are collected in memory and written with bulk_create by a background
+thread, either when batch_size entries are waiting or every flush_interval
+seconds. Each process (gunicorn worker, Celery worker) owns its own sink and
+flushes it at exit. When the buffer backs up, low-value 'info' entries are
+sampled and then dropped; other levels are always kept.
+"""
+import atexit
+import os
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import SystemLog
+
+
+class SystemLogSink:
+
+    def __init__(self, batch_size=50, flush_interval=2.0, high_water=1000, max_buffer=5000, info_sample_rate=10):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.high_water = high_water
+        self.max_buffer = max_buffer
+        self.info_sample_rate = info_sample_rate
+
+        self.buffer = []
+        self.dropped = 0
+        self.info_seen = 0
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.pid = None
+        self.thread = None
+
+    def _ensure_thread(self):
+        # A forked worker inherits the parent's sink but not its thread
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.buffer = []
+            self.thread = threading.Thread(target=self._run, name='systemlog-sink', daemon=True)
+            self.thread.start()
+
+    def log(self, level, message, details=None):
+        with self.lock:
+            self._ensure_thread()
+            size = len(self.buffer)
+
+            if level == 'info' and size >= self.high_water:
+                self.info_seen += 1
+                if size >= self.max_buffer or self.info_seen % self.info_sample_rate:
+                    self.dropped += 1
+                    return
+
+            self.buffer.append(SystemLog(
+                timestamp=timezone.now(),
+                level=level,
+                message=message,
+                details=details
+            ))
+            if len(self.buffer) >= self.batch_size:
+                self.wakeup.set()
+
+    def flush(self):
+        """Write every buffered entry now"""
+        with self.flush_lock:
+            with self.lock:
+                entries, self.buffer = self.buffer, []
+                dropped, self.dropped = self.dropped, 0
+
+            if dropped:
+                entries.append(SystemLog(
+                    timestamp=timezone.now(),
+                    level='warning',
+                    message=f'Dropped {dropped} info log entries under backpressure'
+                ))
+            if not entries:
+                return
+
+            try:
+                SystemLog.objects.bulk_create(entries, batch_size=500)
+            except Exception as e:
+                print(f"SystemLog flush failed, {len(entries)} entries lost: {e}")
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+
+sink = SystemLogSink(
+    batch_size=getattr(settings, 'SYSTEM_LOG_BATCH_SIZE', 50),
+    flush_interval=getattr(settings, 'SYSTEM_LOG_FLUSH_INTERVAL', 2.0),
+)
+atexit.register(sink.flush)
+
+
+def log_event(level, message, details=None):
+    """Queue a SystemLog entry for the next batched write"""
+    sink.log(level, message, details)
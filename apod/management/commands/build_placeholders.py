@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from apod.models import APODImage
+from apod.placeholders import compute_placeholders
+
+
+class Command(BaseCommand):
+    help = 'Compute BlurHash and palette placeholders for APODs that have none'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Newest images to process (default: all missing)'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Recompute images that already have a placeholder'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Images downloaded and hashed in parallel (default: 4)'
+        )
+
+    def handle(self, *args, **options):
+        images = APODImage.objects.order_by('-date')
+        if not options['all']:
+            images = images.filter(blurhash='')
+        ids = list(images.values_list('id', flat=True)[:options['limit']])
+
+        workers = max(options['workers'], 1)
+        chunks = [ids[i::workers] for i in range(workers)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            stored = sum(pool.map(compute_placeholders, chunks))
+
+        self.stdout.write(self.style.SUCCESS(f'Stored placeholders for {stored} of {len(ids)} images'))
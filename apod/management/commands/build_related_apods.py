@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from apod.related import rebuild_related, refresh_related
+
+
+class Command(BaseCommand):
+    help = 'Compute related-APOD neighbours for new images, or for every image with --full'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Recompute every image instead of only new ones'
+        )
+
+    def handle(self, *args, **options):
+        if options['full']:
+            count = rebuild_related()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt related images for {count} APODs'))
+            return
+
+        new, updated = refresh_related()
+        self.stdout.write(self.style.SUCCESS(f'Related images: {new} new APODs scored, {updated} existing updated'))
@@ -4,7 +4,9 @@ from django.utils.dateparse import parse_date
 from datetime import datetime, timedelta
 import requests
 from apod.models import APODImage
+from apod.backfill import backfill_apod_range, BACKFILL_WINDOW_DAYS
 from django.conf import settings
+from emiigen.nasa_client import get_client
 
 class Command(BaseCommand):
     help = 'Fetch NASA APOD for a specific date'
@@ -23,24 +25,52 @@ class Command(BaseCommand):
             default=0,
             help='Number of days to backfill from today'
         )
+        parser.add_argument(
+            '--start-date',
+            type=str,
+            default=None,
+            help='Backfill from this date (YYYY-MM-DD) instead of a day count'
+        )
+        parser.add_argument(
+            '--end-date',
+            type=str,
+            default=None,
+            help='Last date to backfill (YYYY-MM-DD, defaults to yesterday)'
+        )
+        parser.add_argument(
+            '--window',
+            type=int,
+            default=BACKFILL_WINDOW_DAYS,
+            help='Days requested per API call during backfill'
+        )
 
     def handle(self, *args, **options):
-        if options['backfill'] > 0:
-            # Backfill multiple days
-            days = options['backfill']
-            self.stdout.write(f'Backfilling {days} days of APOD images...')
-            
+        if options['backfill'] > 0 or options['start_date']:
+            # Backfill a date range in start_date/end_date windows
             from django.utils import timezone
-            today = timezone.now().date()
-            success_count = 0
+            yesterday = timezone.now().date() - timedelta(days=1)
+            
+            end_date = parse_date(options['end_date']) if options['end_date'] else yesterday
+            if options['start_date']:
+                start_date = parse_date(options['start_date'])
+            else:
+                start_date = end_date - timedelta(days=options['backfill'] - 1) if end_date else None
             
-            for i in range(days):
-                date = today - timedelta(days=i+1)
-                if self.fetch_single_apod(date):
-                    success_count += 1
+            if not start_date or not end_date:
+                self.stderr.write(self.style.ERROR('Invalid date format. Use YYYY-MM-DD'))
+                return
             
+            self.stdout.write(f'Backfilling APOD images from {start_date} to {end_date}...')
+            summary = backfill_apod_range(
+                start_date,
+                end_date,
+                window_days=options['window'],
+                on_window=self.report_window
+            )
+            
+            total = (summary['end_date'] - summary['start_date']).days + 1
             self.stdout.write(self.style.SUCCESS(
-                f'\nCompleted! Successfully fetched {success_count}/{days} images'
+                f'\nCompleted! Successfully fetched {len(summary["saved"])}/{max(total, 0)} images'
             ))
         
         elif options['date']:
@@ -59,14 +89,21 @@ class Command(BaseCommand):
             yesterday = today - timedelta(days=1)
             self.fetch_single_apod(yesterday)
 
+    def report_window(self, window_start, window_end, images, error):
+        if error:
+            self.stderr.write(self.style.ERROR(f'  ✗ {window_start} to {window_end}: {error}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'  ✓ {window_start} to {window_end}: {len(images)} images saved'
+            ))
+
     def fetch_single_apod(self, date):
         try:
             self.stdout.write(f'Fetching APOD for {date}...')
             
-            response = requests.get(
+            response = get_client().get(
                 settings.NASA_APOD_URL,
                 params={
-                    'api_key': settings.NASA_API_KEY,
                     'date': date.strftime('%Y-%m-%d')
                 },
                 timeout=10
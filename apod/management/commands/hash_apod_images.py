@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from apod.duplicates import hash_images
+from apod.models import APODImage
+
+
+class Command(BaseCommand):
+    help = 'Compute perceptual hashes for APODs that have none, for near-duplicate detection'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Rehash images that already have a hash'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Images downloaded and hashed in parallel (default: 8)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Images per worker task (default: 200)'
+        )
+
+    def handle(self, *args, **options):
+        images = APODImage.objects.order_by('-date')
+        if not options['all']:
+            images = images.filter(phash=None)
+        ids = list(images.values_list('id', flat=True))
+
+        size = max(options['batch_size'], 1)
+        batches = [ids[i:i + size] for i in range(0, len(ids), size)]
+        stored = 0
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as pool:
+            for count in pool.map(hash_images, batches):
+                stored += count
+                self.stdout.write(f'  {stored}/{len(ids)} hashed')
+
+        self.stdout.write(self.style.SUCCESS(f'Hashed {stored} of {len(ids)} images'))
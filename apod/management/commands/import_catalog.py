@@ -0,0 +1,76 @@
+# apod/management/commands/import_catalog.py
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apod.catalog_import import import_catalog, iter_csv, iter_jsonl, IMPORT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Stream a CSV or JSONL star/deep-sky catalog into the celestial coordinates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str, help='Catalog file, or - for stdin')
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'tsv', 'jsonl'],
+            default=None,
+            help='Input format (defaults to the file extension)'
+        )
+        parser.add_argument('--body', type=str, default='Space', help='Body for rows without a body column')
+        parser.add_argument('--type', type=str, default='star', help='Type for rows without a type column')
+        parser.add_argument(
+            '--ra-hours',
+            action='store_true',
+            help='Decimal RA values are hours (HYG) rather than degrees'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help='Rows written per transaction'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format']
+        if fmt is None:
+            extension = os.path.splitext(path)[1].lower().lstrip('.')
+            fmt = {'json': 'jsonl', 'ndjson': 'jsonl', 'txt': 'csv'}.get(extension, extension)
+        if fmt not in ('csv', 'tsv', 'jsonl'):
+            raise CommandError('Cannot tell the catalog format, pass --format')
+
+        if path == '-':
+            stream = sys.stdin
+        else:
+            try:
+                stream = open(path, newline='', encoding='utf-8-sig')
+            except OSError as e:
+                raise CommandError(f'Cannot open {path}: {e}')
+
+        rows = iter_jsonl(stream) if fmt == 'jsonl' else iter_csv(stream, delimiter='\t' if fmt == 'tsv' else ',')
+
+        def report_batch(stats):
+            self.stdout.write(f"  {stats['read']} rows read, {stats['imported']} upserted")
+
+        self.stdout.write(f'Importing {path} ({fmt})...')
+        try:
+            stats = import_catalog(
+                rows,
+                body=options['body'],
+                default_type=options['type'],
+                ra_hours=options['ra_hours'],
+                batch_size=options['batch_size'],
+                on_batch=report_batch
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for error in stats['errors']:
+            self.stdout.write(self.style.WARNING(f'  {error}'))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['imported']} coordinates from {stats['read']} rows "
+            f"({stats['skipped']} skipped) in {stats['seconds']}s"
+        ))
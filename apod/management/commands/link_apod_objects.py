@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from apod.crosslinks import relink_all, LINK_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Rescan every APOD title and explanation for catalog objects'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=LINK_BATCH_SIZE,
+            help='Images scanned and written per transaction'
+        )
+
+    def handle(self, *args, **options):
+        def report_batch(images, mentions):
+            self.stdout.write(f'  {images} images scanned, {mentions} mentions')
+
+        images, mentions = relink_all(batch_size=options['batch_size'], on_batch=report_batch)
+        self.stdout.write(self.style.SUCCESS(f'Linked {mentions} object mentions across {images} images'))
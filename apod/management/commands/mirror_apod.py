@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from apod.backfill import BACKFILL_WINDOW_DAYS
+from apod.mirror import DEFAULT_JOB_NAME, mirror_apod_archive
+
+
+class Command(BaseCommand):
+    help = 'Mirror the full APOD archive, resuming from the last checkpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--name',
+            type=str,
+            default=DEFAULT_JOB_NAME,
+            help='Checkpoint name of the mirror job'
+        )
+        parser.add_argument(
+            '--chunk',
+            type=int,
+            default=BACKFILL_WINDOW_DAYS,
+            help='Maximum days covered by one API request'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore the saved checkpoint and start from 1995-06-16'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Mirroring APOD archive ({options["name"]})...')
+
+        checkpoint = mirror_apod_archive(
+            name=options['name'],
+            chunk_days=options['chunk'],
+            restart=options['restart'],
+            on_chunk=self.report_chunk
+        )
+
+        if checkpoint.status == 'failed':
+            self.stderr.write(self.style.ERROR(
+                f'\nStopped after {checkpoint.cursor}: {checkpoint.last_error}\n'
+                f'Run the command again to resume.'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'\nCompleted! {checkpoint.dates_done} dates mirrored in {checkpoint.elapsed_seconds:.1f}s'
+            ))
+
+    def report_chunk(self, checkpoint, done, total, rate):
+        self.stdout.write(
+            f'  ✓ up to {checkpoint.cursor}: {done}/{total} dates ({rate:.1f} dates/s)'
+        )
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from apod.image_mirror import MIRROR_BATCH_SIZE, enforce_budget, mirror_new_images
+
+
+class Command(BaseCommand):
+    help = 'Download new APOD originals into MEDIA_ROOT, build their responsive variants and enforce the disk budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=MIRROR_BATCH_SIZE,
+            help=f'Newest images to mirror in this run (default: {MIRROR_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Also retry images whose last download or resize failed'
+        )
+        parser.add_argument(
+            '--evict-only',
+            action='store_true',
+            help='Only evict least recently viewed images over the budget'
+        )
+
+    def handle(self, *args, **options):
+        if options['evict_only']:
+            evicted = enforce_budget()
+            self.stdout.write(self.style.SUCCESS(f'Evicted {evicted} mirrored images'))
+            return
+
+        stats = mirror_new_images(limit=options['limit'], retry_failed=options['retry_failed'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Mirrored {stats['ready']} images ({stats['bytes'] / 1024 / 1024:.1f} MB), "
+            f"{stats['failed']} failed, {stats['evicted']} evicted"
+        ))
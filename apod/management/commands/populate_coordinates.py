@@ -1,40 +1,35 @@
 from django.core.management.base import BaseCommand
-from apod.models import CelestialCoordinate
+from apod.catalog_import import import_catalog
 
 class Command(BaseCommand):
     help = 'Populate celestial coordinates database'
 
     def handle(self, *args, **options):
-        # Sample coordinate data
+        # Sample coordinate data; RA/Dec may be sexagesimal and are converted to degrees
         coordinates = [
             {
                 'name': 'Polaris',
                 'type': 'star',
-                'latitude': '89°15′50.8″',
-                'longitude': '37°57′07″',
-                'body': 'Star',
-                'description': 'The North Star'
+                'dec': '89°15′50.8″',
+                'ra': '37°57′07″',
+                'body': 'Space',
+                'description': 'The North Star',
+                'aliases': ['Alpha Ursae Minoris', 'North Star']
             },
             {
                 'name': 'Pleiades',
-                'type': 'cluster',
-                'latitude': '24°07′',
-                'longitude': '56°19′',
-                'body': 'Star Cluster',
-                'description': 'The Seven Sisters star cluster'
+                'type': 'open cluster',
+                'dec': '24°07′',
+                'ra': '56°19′',
+                'body': 'Space',
+                'description': 'The Seven Sisters star cluster',
+                'aliases': ['M45', 'Seven Sisters']
             },
             # Add more coordinates as needed
         ]
 
+        stats = import_catalog(coordinates)
         for coord in coordinates:
-            CelestialCoordinate.objects.get_or_create(
-                name=coord['name'],
-                defaults={
-                    'type': coord['type'],
-                    'latitude': coord['latitude'],
-                    'longitude': coord['longitude'],
-                    'body': coord['body'],
-                    'description': coord['description']
-                }
-            )
-            self.stdout.write(self.style.SUCCESS(f'Added coordinate: {coord["name"]}'))
\ No newline at end of file
+            self.stdout.write(self.style.SUCCESS(f'Added coordinate: {coord["name"]}'))
+        for error in stats['errors']:
+            self.stdout.write(self.style.WARNING(error))
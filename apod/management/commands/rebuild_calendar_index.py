@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from apod.calendar_index import rebuild_all
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-year APOD calendar index'
+
+    def handle(self, *args, **options):
+        years = rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt calendar index for {len(years)} years'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from apod.sky_clusters import rebuild_all, MAX_LEVEL
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed sky-map clusters for every zoom level'
+
+    def handle(self, *args, **options):
+        cells = rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {cells} sky cells across {MAX_LEVEL + 1} levels'))
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:38
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apod', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MirrorCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='running', max_length=20)),
+                ('cursor', models.DateField(blank=True, null=True)),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('dates_done', models.IntegerField(default=0)),
+                ('dates_missing', models.IntegerField(default=0)),
+                ('chunks_done', models.IntegerField(default=0)),
+                ('elapsed_seconds', models.FloatField(default=0.0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-updated_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apod', '0003_terminaljob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarYearIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField(unique=True)),
+                ('bitmap', models.BinaryField(max_length=46)),
+                ('ids', models.JSONField(default=list)),
+                ('count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-year'],
+            },
+        ),
+    ]
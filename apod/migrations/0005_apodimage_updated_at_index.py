@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apod', '0004_calendaryearindex'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='apodimage',
+            index=models.Index(fields=['updated_at'], name='apod_apodim_updated_8828eb_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS apod_search USING fts5("
+            "title, explanation, tokenize = 'porter unicode61', prefix = '2 3 4')"
+        )
+        schema_editor.execute(
+            "INSERT INTO apod_search (rowid, title, explanation) "
+            "SELECT id, title, explanation FROM apod_apodimage"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE TABLE IF NOT EXISTS apod_search ("
+            "id bigint PRIMARY KEY REFERENCES apod_apodimage (id) ON DELETE CASCADE, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS apod_search_document_idx ON apod_search USING GIN (document)"
+        )
+        schema_editor.execute(
+            "INSERT INTO apod_search (id, document) "
+            "SELECT id, "
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(explanation, '')), 'B') "
+            "FROM apod_apodimage"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute("DROP TABLE IF EXISTS apod_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apod', '0005_apodimage_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
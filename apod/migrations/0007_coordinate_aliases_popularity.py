@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apod', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='celestialcoordinate',
+            name='aliases',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='celestialcoordinate',
+            name='popularity',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apod', '0007_coordinate_aliases_popularity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SkyCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.PositiveSmallIntegerField()),
+                ('row', models.IntegerField()),
+                ('col', models.IntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('ra', models.FloatField()),
+                ('dec', models.FloatField()),
+                ('members', models.JSONField(blank=True, default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['level', 'row', 'col'],
+                'unique_together': {('level', 'row', 'col')},
+            },
+        ),
+    ]
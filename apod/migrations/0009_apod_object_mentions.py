@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apod', '0008_skycell'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='APODObjectMention',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=1)),
+                ('in_title', models.BooleanField(default=False)),
+                ('coordinate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mentions', to='apod.celestialcoordinate')),
+                ('image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mentions', to='apod.apodimage')),
+            ],
+            options={
+                'unique_together': {('image', 'coordinate')},
+            },
+        ),
+        migrations.AddField(
+            model_name='celestialcoordinate',
+            name='mentioned_in',
+            field=models.ManyToManyField(blank=True, related_name='mentioned_objects', through='apod.APODObjectMention', to='apod.apodimage'),
+        ),
+    ]
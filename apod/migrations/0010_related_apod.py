@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apod', '0009_apod_object_mentions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedAPOD',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_links', to='apod.apodimage')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='apod.apodimage')),
+            ],
+            options={
+                'ordering': ['image', 'rank'],
+                'unique_together': {('image', 'rank')},
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apod', '0010_related_apod'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageMirror',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('ready', 'Ready'), ('failed', 'Failed'), ('evicted', 'Evicted')], default='ready', max_length=20)),
+                ('original', models.CharField(blank=True, max_length=255)),
+                ('width', models.IntegerField(default=0)),
+                ('height', models.IntegerField(default=0)),
+                ('variants', models.JSONField(blank=True, default=list)),
+                ('total_bytes', models.BigIntegerField(default=0)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('last_accessed', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('image', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='mirror', to='apod.apodimage')),
+            ],
+            options={
+                'ordering': ['-updated_at'],
+            },
+        ),
+    ]
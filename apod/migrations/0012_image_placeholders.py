@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apod', '0011_image_mirror'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apodimage',
+            name='blurhash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='apodimage',
+            name='palette',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
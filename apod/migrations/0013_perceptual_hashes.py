@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apod', '0012_image_placeholders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apodimage',
+            name='dhash',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='apodimage',
+            name='phash',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
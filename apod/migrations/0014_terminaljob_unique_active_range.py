@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apod', '0013_perceptual_hashes'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='terminaljob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('start_date', 'end_date'), name='unique_active_terminal_job_range'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:36
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_scored_images(apps, schema_editor):
+    # Images that already have neighbours were scored by an earlier refresh
+    APODImage = apps.get_model('apod', 'APODImage')
+    APODImage.objects.filter(related_links__isnull=False).update(related_scored_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apod', '0014_terminaljob_unique_active_range'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apodimage',
+            name='related_scored_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(mark_scored_images, migrations.RunPython.noop),
+    ]
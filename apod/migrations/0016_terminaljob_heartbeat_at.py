@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apod', '0015_apodimage_related_scored_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='terminaljob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,131 @@
+# apod/mirror.py
+import time
+from contextlib import closing
+from datetime import timedelta
+
+from django.utils import timezone
+
+from emiigen.nasa_client import get_client
+
+from .backfill import APOD_FIRST_DATE, BACKFILL_WINDOW_DAYS, fetch_apod_window_safe, save_apod_window
+from .logsink import log_event
+from .models import APODImage, MirrorCheckpoint
+
+DEFAULT_JOB_NAME = 'apod-archive-mirror'
+
+
+def missing_apod_dates(start_date, end_date):
+    """
+    Return the sorted dates in [start_date, end_date] with no APODImage, using one query.
+    Today is left out: its APOD may not be published yet.
+    """
+    end_date = min(end_date, timezone.now().date() - timedelta(days=1))
+    existing = set(
+        APODImage.objects.filter(date__range=(start_date, end_date)).values_list('date', flat=True)
+    )
+    days = (end_date - start_date).days + 1
+    all_dates = (start_date + timedelta(days=i) for i in range(max(days, 0)))
+    return [date for date in all_dates if date not in existing]
+
+
+def chunk_missing_dates(dates, chunk_days=BACKFILL_WINDOW_DAYS):
+    """Group sorted dates into (start, end, count) windows spanning at most chunk_days"""
+    chunks = []
+    for date in dates:
+        if chunks and (date - chunks[-1][0]).days < chunk_days:
+            chunks[-1][1] = date
+            chunks[-1][2] += 1
+        else:
+            chunks.append([date, date, 1])
+    return [tuple(chunk) for chunk in chunks]
+
+
+def mirror_apod_archive(name=DEFAULT_JOB_NAME, chunk_days=BACKFILL_WINDOW_DAYS, restart=False, on_chunk=None):
+    """
+    Mirror the full APOD archive from 1995-06-16 to yesterday.
+
+    Only dates missing from the database are fetched, oldest first, in chunks
+    of at most chunk_days. A MirrorCheckpoint row is updated after every
+    saved chunk, so an interrupted run resumes after the last saved chunk.
+    The run stops at the first failed chunk and leaves the cursor before it.
+    """
+    end_date = timezone.now().date() - timedelta(days=1)
+    checkpoint, created = MirrorCheckpoint.objects.get_or_create(name=name)
+
+    if restart or created or checkpoint.status == 'completed':
+        checkpoint.cursor = None
+        checkpoint.dates_done = 0
+        checkpoint.chunks_done = 0
+        checkpoint.elapsed_seconds = 0.0
+        checkpoint.started_at = timezone.now()
+
+    start_date = checkpoint.cursor + timedelta(days=1) if checkpoint.cursor else APOD_FIRST_DATE
+    missing = missing_apod_dates(start_date, end_date)
+    chunks = chunk_missing_dates(missing, chunk_days)
+
+    checkpoint.status = 'running'
+    checkpoint.end_date = end_date
+    checkpoint.dates_missing = len(missing)
+    checkpoint.last_error = None
+    checkpoint.save()
+
+    log_event(
+        level='info',
+        message=f'APOD mirror {name} started: {len(missing)} missing dates in {len(chunks)} chunks',
+        details={'resume_from': start_date.strftime('%Y-%m-%d')}
+    )
+
+    run_started = time.monotonic()
+    run_done = 0
+    elapsed_before = checkpoint.elapsed_seconds
+    windows = [(start, end) for start, end, _ in chunks]
+
+    # Closing the iterator on the first failure cancels the chunks not yet requested
+    with closing(get_client().map(fetch_apod_window_safe, windows)) as fetched:
+        for (chunk_start, chunk_end, chunk_missing), (entries, error) in zip(chunks, fetched):
+            if error:
+                checkpoint.status = 'failed'
+                checkpoint.last_error = error
+                checkpoint.save()
+                log_event(
+                    level='error',
+                    message=f'APOD mirror {name} stopped at {chunk_start} to {chunk_end}',
+                    details={'error': error, 'cursor': str(checkpoint.cursor)}
+                )
+                break
+
+            save_apod_window(entries)
+            run_done += chunk_missing
+            elapsed = time.monotonic() - run_started
+            rate = run_done / elapsed if elapsed else 0.0
+
+            checkpoint.cursor = chunk_end
+            checkpoint.dates_done += chunk_missing
+            checkpoint.chunks_done += 1
+            checkpoint.elapsed_seconds = elapsed_before + elapsed
+            checkpoint.save()
+
+            log_event(
+                level='info',
+                message=f'APOD mirror {name}: {run_done}/{len(missing)} dates ({rate:.1f} dates/s)',
+                details={
+                    'cursor': chunk_end.strftime('%Y-%m-%d'),
+                    'remaining': len(missing) - run_done,
+                    'dates_per_second': round(rate, 2),
+                }
+            )
+
+            if on_chunk:
+                on_chunk(checkpoint, run_done, len(missing), rate)
+        else:
+            checkpoint.status = 'completed'
+            checkpoint.cursor = end_date
+            checkpoint.save()
+            elapsed = time.monotonic() - run_started
+            log_event(
+                level='success',
+                message=f'APOD mirror {name} completed: {run_done} dates in {elapsed:.1f}s',
+                details={'dates_per_second': round(run_done / elapsed, 2) if elapsed else None}
+            )
+
+    return checkpoint
@@ -12,6 +12,15 @@ class APODImage(models.Model):
     copyright = models.CharField(max_length=255, blank=True, null=True)
     thumbnail_url = models.URLField(max_length=500, blank=True, null=True)
     
+    # Loading placeholders computed after ingest (apod/placeholders.py)
+    blurhash = models.CharField(max_length=64, blank=True, default='')
+    palette = models.JSONField(default=list, blank=True)  # ["#rrggbb", ...] most common first
+    # 64-bit perceptual hashes stored signed (apod/perceptual_hash.py)
+    phash = models.BigIntegerField(null=True, blank=True)
+    dhash = models.BigIntegerField(null=True, blank=True)
+    # Last related-images scoring (apod/related.py), set even when no neighbour was found
+    related_scored_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -19,6 +28,9 @@ class APODImage(models.Model):
         ordering = ['-date']
         verbose_name = 'APOD Image'
         verbose_name_plural = 'APOD Images'
+        indexes = [
+            models.Index(fields=['updated_at']),
+        ]
     
     def __str__(self):
         return f"{self.date} - {self.title}"
@@ -34,6 +46,9 @@ class CelestialCoordinate(models.Model):
         ('Other', 'Other'),
     ]
     
+    # Bodies whose coordinates are surface lat/lon rather than RA/Dec
+    SURFACE_BODIES = ['Moon', 'Mars', 'Earth', 'Jupiter', 'Saturn']
+    
     TYPE_CHOICES = [
         ('crater', 'Crater'),
         ('mountain', 'Mountain'),
@@ -51,6 +66,11 @@ class CelestialCoordinate(models.Model):
     body = models.CharField(max_length=50, choices=BODY_CHOICES)
     description = models.TextField(blank=True, null=True)
     
+    # Alternative names (catalog ids, common names) matched by autocomplete
+    aliases = models.JSONField(default=list, blank=True)
+    # Ranking weight for autocomplete, higher first
+    popularity = models.IntegerField(default=0)
+    
     apod_image = models.ForeignKey(
         APODImage, 
         on_delete=models.SET_NULL, 
@@ -58,6 +78,13 @@ class CelestialCoordinate(models.Model):
         blank=True,
         related_name='coordinates'
     )
+    # Pictures whose title or explanation names this object, found by apod.crosslinks
+    mentioned_in = models.ManyToManyField(
+        APODImage,
+        through='APODObjectMention',
+        related_name='mentioned_objects',
+        blank=True
+    )
     
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -85,4 +112,182 @@ class SystemLog(models.Model):
         ordering = ['-timestamp']
     
     def __str__(self):
-        return f"{self.timestamp.strftime('%Y-%m-%d %H:%M:%S')} - {self.level}: {self.message[:50]}"
\ No newline at end of file
+        return f"{self.timestamp.strftime('%Y-%m-%d %H:%M:%S')} - {self.level}: {self.message[:50]}"
+
+class MirrorCheckpoint(models.Model):
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    name = models.CharField(max_length=100, unique=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    
+    # Last date whose chunk was fetched and saved; a restart resumes after it
+    cursor = models.DateField(null=True, blank=True)
+    end_date = models.DateField(null=True, blank=True)
+    
+    dates_done = models.IntegerField(default=0)
+    dates_missing = models.IntegerField(default=0)
+    chunks_done = models.IntegerField(default=0)
+    elapsed_seconds = models.FloatField(default=0.0)
+    last_error = models.TextField(blank=True, null=True)
+    
+    started_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-updated_at']
+    
+    def __str__(self):
+        return f"{self.name} - {self.status} ({self.cursor})"
+
+
+class TerminalJob(models.Model):
+    KIND_CHOICES = [
+        ('fetch', 'Fetch'),
+        ('backfill', 'Backfill'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    ACTIVE_STATUSES = ['pending', 'running']
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    
+    # Per-date results in the order they finished: {"date", "success", "title"/"error"}
+    results = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True, null=True)
+    
+    # Set when the worker starts the job and after every window it saves
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            # One pending or running job per range, so concurrent requests share it
+            models.UniqueConstraint(
+                fields=['start_date', 'end_date'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='unique_active_terminal_job_range',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} {self.start_date} to {self.end_date} ({self.status})"
+
+
+class CalendarYearIndex(models.Model):
+    """Precomputed availability of APOD days for one calendar year"""
+    year = models.IntegerField(unique=True)
+    
+    # Bit n (LSB first) is set when day n of the year (0 = Jan 1) has an APOD
+    bitmap = models.BinaryField(max_length=46)
+    # APODImage ids of the set bits, in day order
+    ids = models.JSONField(default=list)
+    count = models.IntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-year']
+    
+    def __str__(self):
+        return f"{self.year} ({self.count} days)"
+
+
+class SkyCell(models.Model):
+    """Precomputed sky-map aggregate for one RA/Dec grid cell at one zoom level"""
+    level = models.PositiveSmallIntegerField()
+    row = models.IntegerField()
+    col = models.IntegerField()
+    
+    count = models.IntegerField(default=0)
+    # Spherical centroid of the objects in the cell, in degrees
+    ra = models.FloatField()
+    dec = models.FloatField()
+    # The members themselves when the cell is sparse, otherwise empty
+    members = models.JSONField(default=list, blank=True)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['level', 'row', 'col']
+        unique_together = ['level', 'row', 'col']
+    
+    def __str__(self):
+        return f"L{self.level} ({self.row}, {self.col}): {self.count}"
+
+
+class APODObjectMention(models.Model):
+    """A catalog object named in an APOD title or explanation"""
+    image = models.ForeignKey(APODImage, on_delete=models.CASCADE, related_name='mentions')
+    coordinate = models.ForeignKey(CelestialCoordinate, on_delete=models.CASCADE, related_name='mentions')
+    
+    # Times the object's name or an alias occurs in the text
+    count = models.IntegerField(default=1)
+    in_title = models.BooleanField(default=False)
+    
+    class Meta:
+        unique_together = ['image', 'coordinate']
+    
+    def __str__(self):
+        return f"{self.coordinate.name} in {self.image.date}"
+
+
+class RelatedAPOD(models.Model):
+    """One of the top-k most similar pictures to an image, by TF-IDF cosine"""
+    image = models.ForeignKey(APODImage, on_delete=models.CASCADE, related_name='related_links')
+    related = models.ForeignKey(APODImage, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    
+    class Meta:
+        ordering = ['image', 'rank']
+        unique_together = ['image', 'rank']
+    
+    def __str__(self):
+        return f"{self.image_id} -> {self.related_id} (#{self.rank})"
+
+
+class ImageMirror(models.Model):
+    """Local copy of an APOD original and its resized variants under MEDIA_ROOT"""
+    STATUS_CHOICES = [
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+        ('evicted', 'Evicted'),
+    ]
+    
+    image = models.OneToOneField(APODImage, on_delete=models.CASCADE, related_name='mirror')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ready')
+    
+    # Paths relative to MEDIA_ROOT
+    original = models.CharField(max_length=255, blank=True)
+    width = models.IntegerField(default=0)
+    height = models.IntegerField(default=0)
+    # [{"width", "format", "path", "bytes"}, ...] smallest first
+    variants = models.JSONField(default=list, blank=True)
+    total_bytes = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True, null=True)
+    
+    # Drives LRU eviction when the mirror exceeds its disk budget
+    last_accessed = models.DateTimeField(default=timezone.now, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-updated_at']
+    
+    def __str__(self):
+        return f"{self.image.date} mirror ({self.status})"
@@ -0,0 +1,68 @@
+# apod/perceptual_hash.py
+"""
+64-bit perceptual hashes of APOD pictures.
+
+pHash keeps the signs of the lowest 8x8 DCT frequencies of a 32x32
+greyscale copy against their median; dHash compares neighbouring pixels of
+a 9x8 copy. Both survive resizing, recompression and small colour changes,
+so reposted pictures land within a few bits of each other. Only Pillow and
+NumPy are imported, so the mirror's process pool can hash while it resizes.
+"""
+import numpy as np
+from PIL import Image
+
+HASH_BITS = 64
+PHASH_SIZE = 32
+PHASH_LOW = 8
+# Every hash is taken from the same reduced copy, whatever the source size
+SAMPLE_WIDTH = 64
+
+
+def _dct_matrix(n):
+    k = np.arange(n)
+    return np.cos(np.pi * np.outer(k, 2 * k + 1) / (2 * n))
+
+
+_DCT = _dct_matrix(PHASH_SIZE)
+_BIT_WEIGHTS = 1 << np.arange(HASH_BITS - 1, -1, -1, dtype=np.uint64)
+
+
+def _pack(bits):
+    """Unsigned 64-bit integer from 64 booleans, first bit most significant"""
+    return int((bits.ravel().astype(np.uint64) * _BIT_WEIGHTS).sum())
+
+
+def to_signed(value):
+    """Store unsigned 64-bit hashes in a signed BigIntegerField"""
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+
+def to_unsigned(value):
+    return value + (1 << HASH_BITS) if value < 0 else value
+
+
+def signed_hashes(hashes):
+    """image_hashes() output as APODImage field values"""
+    return {name: to_signed(value) for name, value in hashes.items()}
+
+
+def _grey(image, size):
+    return np.asarray(image.convert('L').resize(size, Image.LANCZOS), dtype=np.float64)
+
+
+def phash(image):
+    frequencies = _DCT @ _grey(image, (PHASH_SIZE, PHASH_SIZE)) @ _DCT.T
+    low = frequencies[:PHASH_LOW, :PHASH_LOW]
+    return _pack(low > np.median(low))
+
+
+def dhash(image):
+    pixels = _grey(image, (9, 8))
+    return _pack(pixels[:, 1:] > pixels[:, :-1])
+
+
+def image_hashes(image):
+    """{'phash', 'dhash'} as unsigned integers, from a SAMPLE_WIDTH copy of image"""
+    if image.width > SAMPLE_WIDTH:
+        image = image.resize((SAMPLE_WIDTH, max(1, round(image.height * SAMPLE_WIDTH / image.width))), Image.LANCZOS)
+    return {'phash': phash(image), 'dhash': dhash(image)}
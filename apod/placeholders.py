@@ -0,0 +1,152 @@
+# apod/placeholders.py
+"""
+BlurHash and dominant-colour placeholders for APOD pictures.
+
+Both are computed from a 64px rendition taken through the resize proxy, so
+the source is downloaded once and shared with later thumbnail requests.
+The perceptual hashes for duplicate detection come from the same copy.
+Ingest queues new or re-pointed images as a Celery task, so the work
+survives web worker restarts; the stored values are embedded in pages and
+API responses so the layout paints at once, before any remote image arrives.
+"""
+import math
+
+import numpy as np
+import requests
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from .duplicates import invalidate_hash_index
+from .image_proxy import open_rendition, resolve
+from .models import APODImage
+from .perceptual_hash import image_hashes, signed_hashes
+from .response_cache import invalidate_image
+
+SAMPLE_WIDTH = 64
+X_COMPONENTS = 4
+Y_COMPONENTS = 3
+PALETTE_SIZE = 5
+PALETTE_CANDIDATES = 16
+# Manhattan RGB distance below which two palette colours count as the same
+PALETTE_MIN_DISTANCE = 48
+BASE83 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+
+
+def _base83(value, length):
+    return ''.join(BASE83[(value // 83 ** (length - i - 1)) % 83] for i in range(length))
+
+
+def _srgb_to_linear(values):
+    values = values / 255.0
+    return np.where(values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4)
+
+
+def _linear_to_srgb(value):
+    value = min(max(value, 0.0), 1.0)
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def blurhash(image, x_components=X_COMPONENTS, y_components=Y_COMPONENTS):
+    """BlurHash of a PIL image; every DCT component is one matrix product"""
+    pixels = _srgb_to_linear(np.asarray(image.convert('RGB'), dtype=np.float64))
+    height, width, _ = pixels.shape
+    basis_x = np.cos(np.pi * np.outer(np.arange(x_components), np.arange(width)) / width)
+    basis_y = np.cos(np.pi * np.outer(np.arange(y_components), np.arange(height)) / height)
+    # factors[j, i] = mean over pixels of basis_y[j] * basis_x[i] * colour, doubled for AC terms
+    factors = np.einsum('jy,ix,yxc->jic', basis_y, basis_x, pixels) / (width * height)
+    factors[1:] *= 2
+    factors[0, 1:] *= 2
+    factors = factors.reshape(-1, 3)
+
+    dc, ac = factors[0], factors[1:]
+    result = _base83((x_components - 1) + (y_components - 1) * 9, 1)
+    if len(ac):
+        quantised_max = int(max(0, min(82, math.floor(np.abs(ac).max() * 166 - 0.5))))
+        maximum = (quantised_max + 1) / 166
+        result += _base83(quantised_max, 1)
+    else:
+        maximum = 1.0
+        result += _base83(0, 1)
+
+    r, g, b = (_linear_to_srgb(channel) for channel in dc)
+    result += _base83((r << 16) + (g << 8) + b, 4)
+
+    scaled = ac / maximum
+    quantised = np.clip(np.floor(np.sign(scaled) * np.sqrt(np.abs(scaled)) * 9 + 9.5), 0, 18).astype(int)
+    for qr, qg, qb in quantised:
+        result += _base83(qr * 19 * 19 + qg * 19 + qb, 2)
+    return result
+
+
+def dominant_palette(image, colors=PALETTE_SIZE):
+    """
+    Hex colours, most common first. A finer median-cut palette is reduced
+    greedily so near-identical shades (JPEG noise in a dark sky) do not
+    crowd out a small but distinct colour.
+    """
+    quantised = image.convert('RGB').quantize(colors=PALETTE_CANDIDATES, method=Image.Quantize.MEDIANCUT)
+    palette = quantised.getpalette()
+    chosen = []
+    for _, index in sorted(quantised.getcolors(PALETTE_CANDIDATES), reverse=True):
+        rgb = np.array(palette[index * 3:index * 3 + 3])
+        if all(np.abs(rgb - other).sum() > PALETTE_MIN_DISTANCE for other in chosen):
+            chosen.append(rgb)
+            if len(chosen) == colors:
+                break
+    return ['#%02x%02x%02x' % tuple(int(c) for c in rgb) for rgb in chosen]
+
+
+def compute_placeholder(image_id):
+    """
+    APODImage field values (blurhash, palette, phash, dhash) of one APOD
+    from its SAMPLE_WIDTH rendition, or None without a source
+    """
+    rendition = resolve('apod', image_id, SAMPLE_WIDTH, 'png')
+    if rendition is None:
+        return None
+    f, _ = open_rendition(rendition)
+    with f, Image.open(f) as image:
+        return {'blurhash': blurhash(image), 'palette': dominant_palette(image), **signed_hashes(image_hashes(image))}
+
+
+def compute_placeholders(ids):
+    """Compute and store placeholders; returns the number stored"""
+    stored = 0
+    for image_id in ids:
+        try:
+            result = compute_placeholder(image_id)
+        except (requests.exceptions.RequestException, OSError, ValueError) as e:
+            print(f"Error computing placeholder for APOD {image_id}: {e}")
+            continue
+        if result is None:
+            continue
+        # No save(): placeholders must not re-run the text indexing signals
+        updated = APODImage.objects.filter(id=image_id).update(**result, updated_at=timezone.now())
+        if updated:
+            invalidate_image(image_id=image_id)
+            stored += 1
+    if stored:
+        invalidate_hash_index()
+    return stored
+
+
+def _dispatch(ids):
+    try:
+        from .tasks import compute_apod_placeholders
+        compute_apod_placeholders.delay(ids)
+    except Exception as e:
+        # build_placeholders picks up whatever could not be queued
+        print(f"Error queueing placeholders for APODs {ids}: {e}")
+
+
+def queue_placeholders(ids):
+    """
+    Compute placeholders on the Celery worker so ingest does not wait on
+    image downloads; queued once the saving transaction commits
+    """
+    ids = list(ids)
+    if ids:
+        transaction.on_commit(lambda: _dispatch(ids))
@@ -0,0 +1,220 @@
+# apod/related.py
+"""
+Related-APOD recommendations from TF-IDF cosine similarity.
+
+Titles and explanations become sparse, L2-normalised TF-IDF rows stored as
+CSR arrays, with a term -> documents posting list beside them. Similarities
+for a batch of rows are one bincount over the postings of the batch's terms,
+so only documents that share a term are ever touched. The top TOP_K
+neighbours of each image are stored in RelatedAPOD and the image is stamped
+with related_scored_at; refresh_related() only scores images that were never
+scored and the existing images they would displace, so new days are cheap.
+"""
+import re
+import time
+from collections import Counter
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .logsink import log_event
+from .models import APODImage, RelatedAPOD
+
+TOP_K = 8
+BATCH_ROWS = 64
+MIN_DF = 2
+MAX_DF_RATIO = 0.25
+TITLE_WEIGHT = 3
+
+TOKEN_RE = re.compile(r'[a-z][a-z0-9]{2,}')
+STOPWORDS = frozenset('''
+    the and for are but not you all any can had her was one our out day get has him his how man new now old see
+    two way who boy did its let put say she too use that with have this will your from they know want been good
+    much some time very when come here just like long make many over such take than them well were what which
+    while also into more most only other their there these those then about after again being below could
+    does each even ever further image picture shown seen featured today near known across
+    around would should might where whose within without between through during under above
+'''.split())
+
+
+def tokens(text):
+    return [token for token in TOKEN_RE.findall((text or '').lower()) if token not in STOPWORDS]
+
+
+def _ranges(starts, ends):
+    """Concatenation of range(start, end) for every pair, vectorised"""
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if not total:
+        return np.zeros(0, dtype=np.int64)
+    return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+
+
+class TfidfMatrix:
+
+    def __init__(self, docs):
+        """docs is a list of (id, title, explanation)"""
+        self.ids = np.array([doc[0] for doc in docs], dtype=np.int64)
+        self.positions = {int(image_id): row for row, image_id in enumerate(self.ids)}
+        n = len(docs)
+
+        counts = [Counter(tokens(title) * TITLE_WEIGHT + tokens(explanation)) for _, title, explanation in docs]
+        df = Counter()
+        for doc_counts in counts:
+            df.update(doc_counts.keys())
+        max_df = max(MIN_DF, int(n * MAX_DF_RATIO))
+        vocabulary = {term: i for i, term in enumerate(sorted(t for t, f in df.items() if MIN_DF <= f <= max_df))}
+        idf = np.log((1.0 + n) / (1.0 + np.array([df[t] for t in vocabulary], dtype=np.float64))) + 1.0
+
+        indptr = [0]
+        indices = []
+        data = []
+        for doc_counts in counts:
+            terms = [(vocabulary[t], c) for t, c in doc_counts.items() if t in vocabulary]
+            if terms:
+                term_ids = np.array([t for t, _ in terms], dtype=np.int64)
+                weights = (1.0 + np.log([c for _, c in terms])) * idf[term_ids]
+                weights /= np.linalg.norm(weights)
+                indices.extend(term_ids.tolist())
+                data.extend(weights.tolist())
+            indptr.append(len(indices))
+
+        self.indptr = np.array(indptr, dtype=np.int64)
+        self.indices = np.array(indices, dtype=np.int64)
+        self.data = np.array(data, dtype=np.float32)
+
+        # Postings: the same entries ordered by term
+        entry_rows = np.repeat(np.arange(n, dtype=np.int64), np.diff(self.indptr))
+        order = np.argsort(self.indices, kind='stable')
+        self.post_docs = entry_rows[order]
+        self.post_weights = self.data[order]
+        self.term_ptr = np.concatenate(([0], np.cumsum(np.bincount(self.indices, minlength=len(vocabulary)))))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def similarities(self, rows):
+        """(len(rows), n) cosine similarities, zero on the diagonal"""
+        rows = np.asarray(rows, dtype=np.int64)
+        n = len(self.ids)
+        starts, ends = self.indptr[rows], self.indptr[rows + 1]
+        entries = _ranges(starts, ends)
+        entry_batch_row = np.repeat(np.arange(len(rows), dtype=np.int64), ends - starts)
+        terms = self.indices[entries]
+
+        post_starts, post_ends = self.term_ptr[terms], self.term_ptr[terms + 1]
+        postings = _ranges(post_starts, post_ends)
+        repeats = post_ends - post_starts
+        bins = np.repeat(entry_batch_row, repeats) * n + self.post_docs[postings]
+        weights = np.repeat(self.data[entries], repeats) * self.post_weights[postings]
+
+        scores = np.bincount(bins, weights=weights, minlength=len(rows) * n).reshape(len(rows), n)
+        scores[np.arange(len(rows)), rows] = 0.0
+        return scores
+
+
+def top_neighbours(scores, k=TOP_K):
+    """Per row, (columns, scores) of the k best positive scores, best first"""
+    k = min(k, scores.shape[1] - 1)
+    if k <= 0:
+        return [(np.zeros(0, dtype=np.int64), np.zeros(0))] * len(scores)
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    best_scores = np.take_along_axis(scores, best, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind='stable')
+    best = np.take_along_axis(best, order, axis=1)
+    best_scores = np.take_along_axis(best_scores, order, axis=1)
+    return [(columns[values > 0], values[values > 0]) for columns, values in zip(best, best_scores)]
+
+
+def _store(matrix, rows, scores, replace=True):
+    links = []
+    for row, (columns, values) in zip(rows, top_neighbours(scores)):
+        links.extend(
+            RelatedAPOD(image_id=int(matrix.ids[row]), related_id=int(matrix.ids[column]), rank=rank, score=float(value))
+            for rank, (column, value) in enumerate(zip(columns, values))
+        )
+    image_ids = [int(matrix.ids[row]) for row in rows]
+    with transaction.atomic():
+        if replace:
+            RelatedAPOD.objects.filter(image_id__in=image_ids).delete()
+        RelatedAPOD.objects.bulk_create(links, batch_size=1000)
+        # An image with no neighbours has no links, so scoring is recorded on the image
+        APODImage.objects.filter(id__in=image_ids).update(related_scored_at=timezone.now())
+
+
+def _score_rows(matrix, rows, on_scores=None, replace=True):
+    """Score and store rows in batches; on_scores(batch_rows, scores) sees every batch"""
+    for i in range(0, len(rows), BATCH_ROWS):
+        batch = rows[i:i + BATCH_ROWS]
+        scores = matrix.similarities(batch)
+        _store(matrix, batch, scores, replace=replace)
+        if on_scores:
+            on_scores(batch, scores)
+
+
+def load_matrix():
+    return TfidfMatrix(list(APODImage.objects.order_by('id').values_list('id', 'title', 'explanation')))
+
+
+def rebuild_related():
+    """Recompute the neighbours of every image; returns the number of images"""
+    started = time.monotonic()
+    matrix = load_matrix()
+    # One transaction: readers keep the old neighbours until the new set is complete
+    with transaction.atomic():
+        RelatedAPOD.objects.all().delete()
+        _score_rows(matrix, list(range(len(matrix))), replace=False)
+    log_event(
+        level='success',
+        message=f'Rebuilt related APODs for {len(matrix)} images in {time.monotonic() - started:.1f}s'
+    )
+    return len(matrix)
+
+
+def refresh_related():
+    """
+    Score images that were never scored, then rescore existing images that
+    one of them now beats. Returns (new, updated) image counts.
+    """
+    new_ids = list(APODImage.objects.filter(related_scored_at__isnull=True).values_list('id', flat=True))
+    if not new_ids:
+        return 0, 0
+
+    started = time.monotonic()
+    matrix = load_matrix()
+    new_rows = [matrix.positions[image_id] for image_id in new_ids if image_id in matrix.positions]
+
+    # The weakest stored neighbour of each existing image; below k neighbours anything beats it
+    thresholds = np.full(len(matrix), np.inf)
+    for link in RelatedAPOD.objects.values('image_id').annotate(weakest=Min('score'), links=Count('id')):
+        row = matrix.positions.get(link['image_id'])
+        if row is not None:
+            thresholds[row] = link['weakest'] if link['links'] >= TOP_K else 0.0
+    best_new = np.zeros(len(matrix))
+
+    def track(batch, scores):
+        np.maximum(best_new, scores.max(axis=0), out=best_new)
+
+    _score_rows(matrix, new_rows, on_scores=track)
+
+    displaced = np.nonzero(best_new > thresholds)[0]
+    displaced = sorted(set(displaced.tolist()) - set(new_rows))
+    _score_rows(matrix, displaced)
+
+    log_event(
+        level='info',
+        message=f'Related APODs: {len(new_rows)} new, {len(displaced)} updated in {time.monotonic() - started:.1f}s'
+    )
+    return len(new_rows), len(displaced)
+
+
+def related_images(image_id, limit=TOP_K):
+    """The stored neighbours of an image, best first"""
+    return list(
+        RelatedAPOD.objects.filter(image_id=image_id).order_by('rank').values(
+            'related_id', 'related__title', 'related__date', 'related__url',
+            'related__media_type', 'related__thumbnail_url', 'score'
+        )[:limit]
+    )
@@ -0,0 +1,127 @@
+# apod/response_cache.py
+"""
+Response cache for the APOD read APIs.
+
+Payloads are stored in the shared Django cache keyed by image id or date and
+are deleted by model signals (or explicitly after bulk writes) once the
+writing transaction commits, so every worker sees an invalidation as soon as
+the new rows are readable. Hits and misses are counted per process and added
+to the shared cache every COUNTS_FLUSH_SECONDS, so a hit costs no cache write.
+"""
+import atexit
+import os
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import APODImage
+
+KEY_PREFIX = 'apod:resp'
+STATUS_KEY = f'{KEY_PREFIX}:status'
+HITS_KEY = f'{KEY_PREFIX}:hits'
+MISSES_KEY = f'{KEY_PREFIX}:misses'
+
+# Long timeouts are safe because writes invalidate; status also counts logs
+DETAIL_TIMEOUT = 60 * 60 * 24
+STATUS_TIMEOUT = 30
+COUNTS_FLUSH_SECONDS = 10
+
+
+def detail_key(image_id):
+    return f'{KEY_PREFIX}:detail:{image_id}'
+
+
+def date_key(date_str):
+    return f'{KEY_PREFIX}:date:{date_str}'
+
+
+class _Counters:
+    """Per-process hit/miss counts, added to the shared cache in batches"""
+
+    def __init__(self):
+        self.counts = {}
+        self.flushed = time.monotonic()
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+
+    def count(self, key):
+        with self.lock:
+            # A forked worker must not flush the parent's counts again
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.counts = {}
+            self.counts[key] = self.counts.get(key, 0) + 1
+            due = time.monotonic() - self.flushed >= COUNTS_FLUSH_SECONDS
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            counts, self.counts = self.counts, {}
+            self.flushed = time.monotonic()
+        for key, delta in counts.items():
+            try:
+                cache.incr(key, delta)
+            except ValueError:
+                cache.add(key, 0, None)
+                cache.incr(key, delta)
+
+
+_counters = _Counters()
+atexit.register(_counters.flush)
+
+
+def cached_payload(key, build, timeout=DETAIL_TIMEOUT):
+    """Return (data, status) from the cache, or build, store and return it"""
+    cached = cache.get(key)
+    if cached is not None:
+        _counters.count(HITS_KEY)
+        return cached
+
+    _counters.count(MISSES_KEY)
+    payload = build()
+    cache.set(key, payload, timeout)
+    return payload
+
+
+def _delete_on_commit(keys):
+    # Deleting earlier would let a concurrent reader cache the old rows again
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_image(image_id=None, date=None):
+    keys = [STATUS_KEY]
+    if image_id is not None:
+        keys.append(detail_key(image_id))
+    if date is not None:
+        keys.append(date_key(date.strftime('%Y-%m-%d')))
+    _delete_on_commit(keys)
+
+
+def invalidate_dates(dates):
+    """Invalidate every cached response for dates written without signals"""
+    dates = list(dates)
+    ids = APODImage.objects.filter(date__in=dates).values_list('id', flat=True)
+    keys = [STATUS_KEY]
+    keys += [detail_key(image_id) for image_id in ids]
+    keys += [date_key(date.strftime('%Y-%m-%d')) for date in dates]
+    _delete_on_commit(keys)
+
+
+def invalidate_status():
+    _delete_on_commit([STATUS_KEY])
+
+
+def cache_stats():
+    """Shared hit/miss counts, including this process's unflushed ones"""
+    _counters.flush()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 3) if total else None,
+    }
@@ -0,0 +1,208 @@
+# apod/search.py
+"""
+Full-text search over APOD titles and explanations.
+
+The index lives in an `apod_search` table created by migration 0006: an FTS5
+virtual table on SQLite, or a weighted tsvector column with a GIN index on
+PostgreSQL. Both backends expose the same interface and are kept in sync by
+the APODImage signals and by the bulk backfill path.
+"""
+import html
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import APODImage
+
+# Private-use markers survive escaping and are swapped for <mark> afterwards
+MARK_START = '\ue000'
+MARK_END = '\ue001'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def query_terms(query):
+    """Split a user query into plain word tokens"""
+    return TOKEN_RE.findall(query.lower())[:10]
+
+
+def highlight(snippet):
+    """Escape a snippet and turn the match markers into <mark> tags"""
+    return (
+        html.escape(snippet or '')
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+class SearchBackend:
+    """Fallback backend for databases without a native full-text index"""
+
+    def index(self, ids):
+        pass
+
+    def remove(self, ids):
+        pass
+
+    def rebuild(self):
+        return 0
+
+    def search(self, query, limit=20):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        images = APODImage.objects.all()
+        for term in terms:
+            images = images.filter(Q(title__icontains=term) | Q(explanation__icontains=term))
+        return [
+            {
+                'id': image.id,
+                'title': image.title,
+                'date': image.date,
+                'snippet': html.escape(image.explanation[:200]),
+                'score': 0.0,
+            }
+            for image in images.order_by('-date')[:limit]
+        ]
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """FTS5 virtual table ranked with bm25, title weighted over explanation"""
+
+    def index(self, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        placeholders = ', '.join(['%s'] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM apod_search WHERE rowid IN ({placeholders})', ids)
+            cursor.execute(
+                f'INSERT INTO apod_search (rowid, title, explanation) '
+                f'SELECT id, title, explanation FROM apod_apodimage WHERE id IN ({placeholders})',
+                ids
+            )
+
+    def remove(self, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        placeholders = ', '.join(['%s'] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM apod_search WHERE rowid IN ({placeholders})', ids)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM apod_search')
+            cursor.execute(
+                'INSERT INTO apod_search (rowid, title, explanation) '
+                'SELECT id, title, explanation FROM apod_apodimage'
+            )
+            cursor.execute("INSERT INTO apod_search (apod_search) VALUES ('optimize')")
+            cursor.execute('SELECT COUNT(*) FROM apod_search')
+            return cursor.fetchone()[0]
+
+    def search(self, query, limit=20):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        # Every term must match; each is a prefix query
+        match = ' AND '.join(f'"{term}"*' for term in terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT a.id, a.title, a.date, '
+                '       snippet(apod_search, 1, %s, %s, \'…\', 24), '
+                '       bm25(apod_search, 5.0, 1.0) AS score '
+                'FROM apod_search JOIN apod_apodimage a ON a.id = apod_search.rowid '
+                'WHERE apod_search MATCH %s '
+                'ORDER BY score LIMIT %s',
+                [MARK_START, MARK_END, match, limit]
+            )
+            rows = cursor.fetchall()
+        return [
+            {'id': row[0], 'title': row[1], 'date': row[2], 'snippet': highlight(row[3]), 'score': -row[4]}
+            for row in rows
+        ]
+
+
+class PostgresSearchBackend(SearchBackend):
+    """tsvector with title weighted A and explanation B, ranked with ts_rank"""
+
+    DOCUMENT_SQL = (
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(explanation, '')), 'B')"
+    )
+
+    def index(self, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO apod_search (id, document) '
+                f'SELECT id, {self.DOCUMENT_SQL} FROM apod_apodimage WHERE id = ANY(%s) '
+                f'ON CONFLICT (id) DO UPDATE SET document = EXCLUDED.document',
+                [ids]
+            )
+
+    def remove(self, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM apod_search WHERE id = ANY(%s)', [ids])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute('TRUNCATE apod_search')
+            cursor.execute(
+                f'INSERT INTO apod_search (id, document) '
+                f'SELECT id, {self.DOCUMENT_SQL} FROM apod_apodimage'
+            )
+            cursor.execute('SELECT COUNT(*) FROM apod_search')
+            return cursor.fetchone()[0]
+
+    def search(self, query, limit=20):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT a.id, a.title, a.date, "
+                "       ts_headline('english', a.explanation, q, %s), "
+                "       ts_rank(s.document, q) AS score "
+                "FROM apod_search s "
+                "JOIN apod_apodimage a ON a.id = s.id, "
+                "     to_tsquery('english', %s) q "
+                "WHERE s.document @@ q "
+                "ORDER BY score DESC LIMIT %s",
+                [f'StartSel={MARK_START}, StopSel={MARK_END}, MaxWords=35, MinWords=15', tsquery, limit]
+            )
+            rows = cursor.fetchall()
+        return [
+            {'id': row[0], 'title': row[1], 'date': row[2], 'snippet': highlight(row[3]), 'score': row[4]}
+            for row in rows
+        ]
+
+
+def get_search_backend():
+    if connection.vendor == 'sqlite':
+        return SQLiteSearchBackend()
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return SearchBackend()
+
+
+def index_images(ids):
+    get_search_backend().index(ids)
+
+
+def index_dates(dates):
+    """Reindex the images on dates written by bulk upserts (no signals)"""
+    ids = APODImage.objects.filter(date__in=list(dates)).values_list('id', flat=True)
+    get_search_backend().index(ids)
+
+
+def remove_images(ids):
+    get_search_backend().remove(ids)
@@ -0,0 +1,78 @@
+# apod/signals.py
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .calendar_index import rebuild_year
+from .coordinate_index import invalidate_coordinate_indexes
+from .crosslinks import link_images
+from .models import APODImage, CelestialCoordinate, ImageMirror
+from .response_cache import invalidate_image, invalidate_status
+from .search import index_images, remove_images
+from .sky_clusters import refresh_points
+
+
+@receiver(post_save, sender=APODImage)
+@receiver(post_delete, sender=APODImage)
+def update_calendar_index(sender, instance, **kwargs):
+    """Keep the calendar index for the image's year in sync"""
+    rebuild_year(instance.date.year)
+
+
+@receiver(post_save, sender=APODImage)
+@receiver(post_delete, sender=APODImage)
+def invalidate_image_responses(sender, instance, **kwargs):
+    """Drop cached detail, date lookup and status responses for the image"""
+    invalidate_image(image_id=instance.id, date=instance.date)
+
+
+@receiver(post_save, sender=APODImage)
+def index_image_text(sender, instance, **kwargs):
+    index_images([instance.id])
+
+
+@receiver(post_save, sender=APODImage)
+def link_image_objects(sender, instance, **kwargs):
+    """Find the catalog objects named in the image's text"""
+    link_images([instance.id])
+
+
+@receiver(post_delete, sender=APODImage)
+def unindex_image_text(sender, instance, **kwargs):
+    remove_images([instance.id])
+
+
+@receiver(post_save, sender=CelestialCoordinate)
+@receiver(post_delete, sender=CelestialCoordinate)
+def invalidate_status_response(sender, instance, **kwargs):
+    invalidate_status()
+
+
+@receiver(post_save, sender=CelestialCoordinate)
+@receiver(post_delete, sender=CelestialCoordinate)
+def invalidate_coordinate_index(sender, instance, **kwargs):
+    """Make every worker rebuild its autocomplete and cone search indexes"""
+    invalidate_coordinate_indexes()
+
+
+@receiver(pre_save, sender=CelestialCoordinate)
+def remember_sky_position(sender, instance, **kwargs):
+    """Keep the old position so a moved object leaves its previous cells"""
+    previous = sender.objects.filter(pk=instance.pk).values_list('longitude', 'latitude').first() if instance.pk else None
+    instance._previous_sky_position = previous
+
+
+@receiver(post_save, sender=CelestialCoordinate)
+@receiver(post_delete, sender=CelestialCoordinate)
+def update_sky_clusters(sender, instance, **kwargs):
+    points = [(instance.longitude, instance.latitude)]
+    previous = getattr(instance, '_previous_sky_position', None)
+    if previous and previous != tuple(points[0]):
+        points.append(previous)
+    refresh_points(points)
+
+
+@receiver(post_save, sender=ImageMirror)
+@receiver(post_delete, sender=ImageMirror)
+def invalidate_mirror_responses(sender, instance, **kwargs):
+    """Cached detail responses carry the mirrored sources"""
+    invalidate_image(image_id=instance.image_id)
@@ -0,0 +1,159 @@
+# apod/sky_clusters.py
+"""
+Zoom-aware sky-map clusters for the sky objects of CelestialCoordinate
+(surface features are not on the sky map).
+
+Level z splits the sky into an equirectangular grid of (4 << z) RA columns by
+(2 << z) Dec rows. One SkyCell row per occupied cell holds its count and
+spherical centroid, plus the members themselves when there are at most
+SPARSE_LIMIT of them. A map request reads one level, so its cost depends on
+the grid size, not on the catalog size.
+"""
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+
+from .cone_search import unit_vectors
+from .models import CelestialCoordinate, SkyCell
+
+MAX_LEVEL = 6
+SPARSE_LIMIT = 3
+# Degrees the candidate query reaches past a cell, covering float rounding in cell_of
+EDGE_MARGIN = 1e-6
+MEMBER_FIELDS = ('id', 'name', 'type', 'longitude', 'latitude', 'body')
+
+
+def grid_shape(level):
+    """(columns, rows) of the grid at level"""
+    return 4 << level, 2 << level
+
+
+def cell_of(ra, dec, level):
+    """Row and column arrays of the cells holding RA/Dec arrays in degrees"""
+    cols, rows = grid_shape(level)
+    col = (np.mod(ra, 360.0) / 360.0 * cols).astype(np.int64)
+    row = ((np.clip(dec, -90.0, 90.0) + 90.0) / 180.0 * rows).astype(np.int64)
+    return np.minimum(row, rows - 1), np.minimum(col, cols - 1)
+
+
+def cell_bounds(level, row, col):
+    """(ra_min, ra_max, dec_min, dec_max) of one cell"""
+    cols, rows = grid_shape(level)
+    ra_step, dec_step = 360.0 / cols, 180.0 / rows
+    return col * ra_step, (col + 1) * ra_step, row * dec_step - 90.0, (row + 1) * dec_step - 90.0
+
+
+def sky_objects():
+    return CelestialCoordinate.objects.exclude(body__in=CelestialCoordinate.SURFACE_BODIES)
+
+
+def aggregate(members, level):
+    """{(row, col): SkyCell} for members given as MEMBER_FIELDS tuples"""
+    if not members:
+        return {}
+    ra = np.array([m[3] for m in members], dtype=np.float64)
+    dec = np.array([m[4] for m in members], dtype=np.float64)
+    row, col = cell_of(ra, dec, level)
+
+    cols, _ = grid_shape(level)
+    keys, inverse, counts = np.unique(row * cols + col, return_inverse=True, return_counts=True)
+    xyz = unit_vectors(ra, dec)
+    sums = np.column_stack([np.bincount(inverse, weights=xyz[:, axis], minlength=len(keys)) for axis in range(3)])
+    centroid_ra = np.mod(np.degrees(np.arctan2(sums[:, 1], sums[:, 0])), 360.0)
+    centroid_dec = np.degrees(np.arctan2(sums[:, 2], np.hypot(sums[:, 0], sums[:, 1])))
+
+    cells = {}
+    for i, key in enumerate(keys):
+        cell_row, cell_col = divmod(int(key), cols)
+        cells[(cell_row, cell_col)] = SkyCell(
+            level=level, row=cell_row, col=cell_col, count=int(counts[i]),
+            ra=float(centroid_ra[i]), dec=float(centroid_dec[i]), members=[]
+        )
+
+    for i in np.nonzero(counts[inverse] <= SPARSE_LIMIT)[0]:
+        object_id, name, object_type, _, _, body = members[i]
+        cells[(int(row[i]), int(col[i]))].members.append({
+            'id': object_id, 'name': name, 'type': object_type,
+            'ra': float(ra[i]), 'dec': float(dec[i]), 'body': body,
+        })
+    return cells
+
+
+def rebuild_all():
+    """Recompute every level from one scan of the catalog"""
+    members = list(sky_objects().values_list(*MEMBER_FIELDS))
+    cells = []
+    for level in range(MAX_LEVEL + 1):
+        cells.extend(aggregate(members, level).values())
+
+    with transaction.atomic():
+        SkyCell.objects.all().delete()
+        SkyCell.objects.bulk_create(cells, batch_size=2000)
+    return len(cells)
+
+
+def _cell_members(level, row, col):
+    """
+    Catalog rows in one cell. The query only narrows the candidates; cell_of
+    decides membership, exactly as in rebuild_all, so RA outside [0, 360)
+    and values on cell edges land in the same cell on both paths.
+    """
+    cols, rows = grid_shape(level)
+    ra_min, ra_max, dec_min, dec_max = cell_bounds(level, row, col)
+    # Unwrapped RA is rare, so every such row is a candidate
+    query = Q(longitude__gte=ra_min - EDGE_MARGIN, longitude__lt=ra_max + EDGE_MARGIN)
+    query |= Q(longitude__lt=0) | Q(longitude__gte=360)
+    if row > 0:
+        query &= Q(latitude__gte=dec_min - EDGE_MARGIN)
+    if row < rows - 1:
+        query &= Q(latitude__lt=dec_max + EDGE_MARGIN)
+    candidates = list(sky_objects().filter(query).values_list(*MEMBER_FIELDS))
+    if not candidates:
+        return []
+
+    ra = np.array([m[3] for m in candidates], dtype=np.float64)
+    dec = np.array([m[4] for m in candidates], dtype=np.float64)
+    member_rows, member_cols = cell_of(ra, dec, level)
+    keep = (member_rows == row) & (member_cols == col)
+    return [member for member, inside in zip(candidates, keep.tolist()) if inside]
+
+
+def refresh_points(points):
+    """Recompute the cells holding any of the (ra, dec) points at every level"""
+    points = [(ra, dec) for ra, dec in points if ra is not None and dec is not None]
+    if not points:
+        return
+    ra = np.array([p[0] for p in points], dtype=np.float64)
+    dec = np.array([p[1] for p in points], dtype=np.float64)
+
+    with transaction.atomic():
+        for level in range(MAX_LEVEL + 1):
+            rows, cols = cell_of(ra, dec, level)
+            for row, col in set(zip(rows.tolist(), cols.tolist())):
+                cell = aggregate(_cell_members(level, row, col), level).get((row, col))
+                if cell is None:
+                    SkyCell.objects.filter(level=level, row=row, col=col).delete()
+                    continue
+                SkyCell.objects.update_or_create(
+                    level=level, row=row, col=col,
+                    defaults={'count': cell.count, 'ra': cell.ra, 'dec': cell.dec, 'members': cell.members}
+                )
+
+
+def cells_in_view(level, ra_min=None, ra_max=None, dec_min=None, dec_max=None):
+    """SkyCells of level overlapping the view; ra_min > ra_max wraps through 0"""
+    level = min(max(level, 0), MAX_LEVEL)
+    cells = SkyCell.objects.filter(level=level)
+
+    if dec_min is not None and dec_max is not None:
+        (row_min, row_max), _ = cell_of(np.zeros(2), np.array([dec_min, dec_max]), level)
+        cells = cells.filter(row__gte=int(row_min), row__lte=int(row_max))
+
+    if ra_min is not None and ra_max is not None and ra_max - ra_min < 360:
+        _, (col_min, col_max) = cell_of(np.array([ra_min, ra_max]), np.zeros(2), level)
+        if ra_min % 360.0 <= ra_max % 360.0:
+            cells = cells.filter(col__gte=int(col_min), col__lte=int(col_max))
+        else:
+            cells = cells.filter(Q(col__gte=int(col_min)) | Q(col__lte=int(col_max)))
+
+    return cells
@@ -0,0 +1,186 @@
+# apod/sky_transforms.py
+"""
+Vectorised coordinate frames and visibility for CelestialCoordinate.
+
+Positions are handled as NumPy arrays in degrees: equatorial (J2000 RA/Dec),
+galactic (l/b) and horizontal (alt/az for an observer and instant). Rise,
+transit and set times come from the hour angle at the horizon, so a whole
+catalog is one set of array operations. Catalog-wide visibility is cached
+per observer grid cell and night, keyed by the coordinate index version.
+"""
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.core.cache import cache
+
+from .cone_search import unit_vectors
+from .coordinate_index import VersionedIndex
+from .models import CelestialCoordinate
+
+# ICRS/J2000 equatorial to galactic rotation
+GALACTIC_MATRIX = np.array([
+    [-0.0548755604162154, -0.8734370902348850, -0.4838350155487132],
+    [0.4941094278755837, -0.4448296299600112, 0.7469822444972189],
+    [-0.8676661490190047, -0.1980763734312015, 0.4559837761750669],
+])
+
+SIDEREAL_DEGREES_PER_SECOND = 360.98564736629 / 86400
+SIDEREAL_DAY_SECONDS = 360.0 / SIDEREAL_DEGREES_PER_SECOND
+# Apparent altitude of a point source at rise/set, refraction included
+HORIZON_ALTITUDE = -0.5667
+
+GRID_DEGREES = 1.0
+VISIBILITY_TIMEOUT = 60 * 60 * 12
+# Kept apart from the response cache so lookups do not count as API hits
+VISIBILITY_KEY_PREFIX = 'sky:visibility'
+
+
+def _angles(xyz):
+    """(longitude 0-360, latitude) in degrees from (n, 3) unit vectors"""
+    lon = np.mod(np.degrees(np.arctan2(xyz[:, 1], xyz[:, 0])), 360.0)
+    lat = np.degrees(np.arcsin(np.clip(xyz[:, 2], -1.0, 1.0)))
+    return lon, lat
+
+
+def equatorial_to_galactic(ra, dec):
+    return _angles(unit_vectors(ra, dec) @ GALACTIC_MATRIX.T)
+
+
+def galactic_to_equatorial(l, b):
+    return _angles(unit_vectors(l, b) @ GALACTIC_MATRIX)
+
+
+def julian_date(unix_seconds):
+    return np.asarray(unix_seconds, dtype=np.float64) / 86400.0 + 2440587.5
+
+
+def local_sidereal_degrees(unix_seconds, longitude):
+    """Local mean sidereal time in degrees for an east-positive longitude"""
+    gmst = 280.46061837 + 360.98564736629 * (julian_date(unix_seconds) - 2451545.0)
+    return np.mod(gmst + longitude, 360.0)
+
+
+def equatorial_to_altaz(ra, dec, latitude, longitude, unix_seconds):
+    """(altitude, azimuth from north through east) in degrees"""
+    hour_angle = np.radians(local_sidereal_degrees(unix_seconds, longitude) - np.asarray(ra))
+    dec = np.radians(dec)
+    lat = np.radians(latitude)
+    sin_alt = np.sin(dec) * np.sin(lat) + np.cos(dec) * np.cos(lat) * np.cos(hour_angle)
+    altitude = np.degrees(np.arcsin(np.clip(sin_alt, -1.0, 1.0)))
+    azimuth = np.degrees(np.arctan2(
+        -np.cos(dec) * np.sin(hour_angle),
+        np.sin(dec) * np.cos(lat) - np.cos(dec) * np.sin(lat) * np.cos(hour_angle)
+    ))
+    return altitude, np.mod(azimuth, 360.0)
+
+
+def local_midnight(night, longitude):
+    """Unix time of mean local midnight ending the evening of night"""
+    midnight_utc = datetime.combine(night + timedelta(days=1), dt_time(0), tzinfo=dt_timezone.utc)
+    return midnight_utc.timestamp() - longitude / 15.0 * 3600
+
+
+def rise_transit_set(ra, dec, latitude, longitude, night):
+    """
+    Rise, transit and set as unix seconds around local midnight of night.
+
+    Transit is the upper culmination nearest midnight. Rise and set are NaN
+    for objects that never set (circumpolar) or never rise. Returns a dict
+    of arrays plus the night window used for 'up'.
+    """
+    ra = np.asarray(ra, dtype=np.float64)
+    dec = np.asarray(dec, dtype=np.float64)
+    midnight = local_midnight(night, longitude)
+
+    hour_angle = np.mod(local_sidereal_degrees(midnight, longitude) - ra + 180.0, 360.0) - 180.0
+    transit = midnight - hour_angle / SIDEREAL_DEGREES_PER_SECOND
+
+    lat = np.radians(latitude)
+    dec_rad = np.radians(dec)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cos_h0 = (np.sin(np.radians(HORIZON_ALTITUDE)) - np.sin(lat) * np.sin(dec_rad)) / (np.cos(lat) * np.cos(dec_rad))
+    circumpolar = cos_h0 <= -1.0
+    never_rises = cos_h0 >= 1.0
+    half_arc = np.degrees(np.arccos(np.clip(cos_h0, -1.0, 1.0))) / SIDEREAL_DEGREES_PER_SECOND
+
+    rise = np.where(circumpolar | never_rises, np.nan, transit - half_arc)
+    set_ = np.where(circumpolar | never_rises, np.nan, transit + half_arc)
+
+    # Up at some point between 18:00 and 06:00 mean local time, on this pass or a neighbouring one
+    start, end = midnight - 6 * 3600, midnight + 6 * 3600
+    overlaps = np.zeros(ra.shape, dtype=bool)
+    for shift in (-SIDEREAL_DAY_SECONDS, 0.0, SIDEREAL_DAY_SECONDS):
+        overlaps |= (transit - half_arc + shift < end) & (transit + half_arc + shift > start)
+    up = circumpolar | (~never_rises & overlaps)
+
+    return {
+        'rise': rise,
+        'transit': transit,
+        'set': set_,
+        'max_altitude': 90.0 - np.abs(latitude - dec),
+        'circumpolar': circumpolar,
+        'up': up,
+        'window': (start, end),
+    }
+
+
+def load_catalog():
+    rows = list(
+        CelestialCoordinate.objects.exclude(body__in=CelestialCoordinate.SURFACE_BODIES)
+        .values_list('id', 'longitude', 'latitude')
+    )
+    ids, ra, dec = zip(*rows) if rows else ((), (), ())
+    return np.array(ids, dtype=np.int64), np.array(ra, dtype=np.float64), np.array(dec, dtype=np.float64)
+
+
+_catalog = VersionedIndex(load_catalog)
+
+
+def grid_cell(latitude, longitude):
+    """Snap an observer to the centre of its GRID_DEGREES cell"""
+    def snap(value):
+        return (np.floor(value / GRID_DEGREES) + 0.5) * GRID_DEGREES
+    return float(min(snap(latitude), 90.0)), float(np.mod(snap(longitude) + 180.0, 360.0) - 180.0)
+
+
+def _times(values):
+    return [None if np.isnan(value) else int(value) for value in values]
+
+
+def catalog_visibility(latitude, longitude, night):
+    """Column-oriented visibility of the whole catalog for an observer cell and night"""
+    ids, ra, dec = _catalog.get()
+    latitude, longitude = grid_cell(latitude, longitude)
+    key = f'{VISIBILITY_KEY_PREFIX}:{_catalog.version}:{latitude}:{longitude}:{night.isoformat()}'
+    data = cache.get(key)
+    if data is None:
+        result = rise_transit_set(ra, dec, latitude, longitude, night)
+        start, end = result['window']
+        data = {
+            'latitude': latitude,
+            'longitude': longitude,
+            'night': night.isoformat(),
+            'window': [int(start), int(end)],
+            'ids': ids.tolist(),
+            'rise': _times(result['rise']),
+            'transit': _times(result['transit']),
+            'set': _times(result['set']),
+            'max_altitude': np.round(result['max_altitude'], 2).tolist(),
+            'circumpolar': result['circumpolar'].tolist(),
+            'up': result['up'].tolist(),
+        }
+        cache.set(key, data, VISIBILITY_TIMEOUT)
+    return data
+
+
+def transform(ra, dec, frame, latitude=None, longitude=None, unix_seconds=None):
+    """Equatorial arrays into frame: 'equatorial', 'galactic' or 'altaz'"""
+    if frame == 'galactic':
+        l, b = equatorial_to_galactic(ra, dec)
+        return {'l': l, 'b': b}
+    if frame == 'altaz':
+        altitude, azimuth = equatorial_to_altaz(ra, dec, latitude, longitude, unix_seconds)
+        return {'alt': altitude, 'az': azimuth}
+    if frame == 'equatorial':
+        return {'ra': np.mod(ra, 360.0), 'dec': np.asarray(dec, dtype=np.float64)}
+    raise ValueError(f'Unknown frame: {frame}')
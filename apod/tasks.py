@@ -4,8 +4,15 @@ from django.utils import timezone
 from datetime import datetime, timedelta
 from .models import APODImage, SystemLog
 from .views import fetch_and_save_apod
-import requests
+from .backfill import backfill_apod_range
+from .jobs import run_job
+from .logsink import log_event
+from .mirror import mirror_apod_archive
+from .related import refresh_related
+from .image_mirror import mirror_new_images
+from .placeholders import compute_placeholders, queue_placeholders
 from django.conf import settings
+from emiigen.nasa_client import get_client
 
 @shared_task
 def fetch_latest_apod():
@@ -17,7 +24,7 @@ def fetch_latest_apod():
     
     existing = APODImage.objects.filter(date=today).first()
     if existing:
-        SystemLog.objects.create(
+        log_event(
             level='info',
             message=f'APOD for {today} already exists'
         )
@@ -26,12 +33,12 @@ def fetch_latest_apod():
     apod = fetch_and_save_apod(today)
     
     if apod:
-        SystemLog.objects.create(
+        log_event(
             level='success',
             message=f'Successfully fetched latest APOD: {apod.title}'
         )
     else:
-        SystemLog.objects.create(
+        log_event(
             level='error',
             message=f'Failed to fetch APOD for {today}'
         )
@@ -45,11 +52,10 @@ def check_nasa_api_update():
     try:
         url = settings.NASA_APOD_URL
         params = {
-            'api_key': settings.NASA_API_KEY,
             'thumbs': True
         }
         
-        response = requests.get(url, params=params, timeout=10)
+        response = get_client().get(url, params=params, timeout=10)
         response.raise_for_status()
         data = response.json()
         
@@ -68,46 +74,96 @@ def check_nasa_api_update():
                 copyright=data.get('copyright', ''),
                 thumbnail_url=data.get('thumbnail_url', '')
             )
+            queue_placeholders([apod.id])
             
-            SystemLog.objects.create(
+            log_event(
                 level='success',
                 message=f'New APOD detected and saved: {apod.title}'
             )
         elif existing.updated_at < timezone.now() - timedelta(hours=1):
+            url_changed = data.get('url', existing.url) != existing.url
             existing.title = data.get('title', existing.title)
             existing.explanation = data.get('explanation', existing.explanation)
             existing.url = data.get('url', existing.url)
             existing.hdurl = data.get('hdurl', existing.hdurl)
             existing.save()
+            if url_changed or not existing.blurhash:
+                queue_placeholders([existing.id])
             
-            SystemLog.objects.create(
+            log_event(
                 level='info',
                 message=f'Updated existing APOD: {existing.title}'
             )
             
     except Exception as e:
-        SystemLog.objects.create(
+        log_event(
             level='warning',
             message=f'APOD check failed: {str(e)}'
         )
 
 @shared_task
-def backfill_apod_archive(days=30):
+def backfill_apod_archive(days=30, start_date=None, end_date=None):
     """
-    Backfill APOD archive with historical images
+    Backfill APOD archive with historical images.
+    Either the last `days` days or an explicit YYYY-MM-DD start/end range,
+    requested in start_date/end_date windows and bulk upserted.
     """
-    today = timezone.now().date()
+    if start_date and end_date:
+        start = datetime.strptime(start_date, '%Y-%m-%d').date()
+        end = datetime.strptime(end_date, '%Y-%m-%d').date()
+    else:
+        end = timezone.now().date()
+        start = end - timedelta(days=days - 1)
     
-    for i in range(days):
-        date = today - timedelta(days=i)
-        
-        if not APODImage.objects.filter(date=date).exists():
-            fetch_and_save_apod(date)
+    summary = backfill_apod_range(start, end)
     
-    SystemLog.objects.create(
-        level='success',
-        message=f'Completed backfill of {days} days'
-    )
+    return {
+        'saved': len(summary['saved']),
+        'failed_windows': summary['failed_windows'],
+    }
+
+@shared_task
+def run_terminal_job(job_id):
+    """
+    Run a terminal fetch/backfill job queued by the web app, saving per-date results as it goes
+    """
+    run_job(job_id)
+
+@shared_task
+def compute_apod_placeholders(ids):
+    """
+    Compute BlurHash, palette and perceptual hashes for newly saved APODs
+    """
+    return compute_placeholders(ids)
+
+@shared_task
+def mirror_apod_archive_task(restart=False):
+    """
+    Mirror every missing APOD since 1995-06-16, resuming from the saved checkpoint
+    """
+    checkpoint = mirror_apod_archive(restart=restart)
+    
+    return {
+        'status': checkpoint.status,
+        'cursor': checkpoint.cursor.strftime('%Y-%m-%d') if checkpoint.cursor else None,
+        'dates_done': checkpoint.dates_done,
+    }
+
+@shared_task
+def refresh_related_apods():
+    """
+    Score related images for APODs that arrived since the last run
+    """
+    new, updated = refresh_related()
+    
+    return {'new': new, 'updated': updated}
+
+@shared_task
+def mirror_new_apod_images():
+    """
+    Download new APOD originals, build their resized variants and enforce the disk budget
+    """
+    return mirror_new_images()
 
 @shared_task
 def cleanup_old_logs():
@@ -117,7 +173,7 @@ def cleanup_old_logs():
     cutoff = timezone.now() - timedelta(days=7)
     deleted_count = SystemLog.objects.filter(timestamp__lt=cutoff).delete()[0]
     
-    SystemLog.objects.create(
+    log_event(
         level='info',
         message=f'Cleaned up {deleted_count} old log entries'
     )
@@ -144,6 +200,14 @@ app.conf.beat_schedule = {
         'task': 'apod.tasks.check_nasa_api_update',
         'schedule': crontab(minute='*/5'),  # Every 5 minutes
     },
+    'refresh-related-apods-hourly': {
+        'task': 'apod.tasks.refresh_related_apods',
+        'schedule': crontab(minute=20),  # Every hour, after the daily fetch has landed
+    },
+    'mirror-new-apod-images-hourly': {
+        'task': 'apod.tasks.mirror_new_apod_images',
+        'schedule': crontab(minute=25),  # Every hour, after the related images are scored
+    },
     'cleanup-old-logs-weekly': {
         'task': 'apod.tasks.cleanup_old_logs',
         'schedule': crontab(day_of_week=0, hour=2, minute=0),  # Sunday at 2 AM
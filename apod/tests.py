@@ -1,3 +1,705 @@
-from django.test import TestCase
+import base64
+import io
+import math
+from datetime import date, timedelta
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from .autocomplete import PrefixIndex
+from .backfill import iter_date_windows, save_apod_window
+from .calendar_index import get_year_index
+from .catalog_import import coordinate_from_row, import_catalog, iter_csv, parse_ra, parse_sexagesimal
+from .cone_search import ConeIndex, build_index
+from .crosslinks import AhoCorasick, ObjectMatcher
+from .duplicates import HammingIndex, popcount
+from .jobs import JOB_STALE_AFTER, SUBMIT_LOCK_KEY, expire_stale_jobs, job_events, submit_range
+from .logsink import SystemLogSink, sink
+from .models import APODImage, CalendarYearIndex, CelestialCoordinate, RelatedAPOD, SkyCell, SystemLog, TerminalJob
+from .placeholders import BASE83, blurhash
+from .related import rebuild_related, refresh_related
+from .response_cache import cache_stats, cached_payload, detail_key
+from .sky_clusters import SPARSE_LIMIT, cell_of, rebuild_all as rebuild_sky_cells
+from .sky_transforms import catalog_visibility
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'apod-tests'}}
+
+
+def tearDownModule():
+    # Write buffered log entries while the test database exists, not at exit
+    sink.flush()
+
+
+def apod_entry(day, **fields):
+    return {'date': day.isoformat(), 'title': f'APOD {day}', 'explanation': 'Stars.',
+            'url': f'https://apod.nasa.gov/apod/image/{day:%y%m%d}.jpg', 'media_type': 'image', **fields}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BackfillWindowTests(TestCase):
+
+    def test_windows_cover_the_range_newest_first(self):
+        windows = list(iter_date_windows(date(2024, 1, 1), date(2024, 1, 10), window_days=4))
+        self.assertEqual(windows, [
+            (date(2024, 1, 7), date(2024, 1, 10)),
+            (date(2024, 1, 3), date(2024, 1, 6)),
+            (date(2024, 1, 1), date(2024, 1, 2)),
+        ])
+
+    def test_window_upsert_inserts_and_updates_in_place(self):
+        save_apod_window([apod_entry(date(2024, 1, 1)), apod_entry(date(2024, 1, 2))])
+        first_id = APODImage.objects.get(date=date(2024, 1, 1)).id
+
+        save_apod_window([
+            apod_entry(date(2024, 1, 1), title='Corrected title'),
+            apod_entry(date(2024, 1, 3)),
+        ])
+
+        self.assertEqual(APODImage.objects.count(), 3)
+        updated = APODImage.objects.get(date=date(2024, 1, 1))
+        self.assertEqual(updated.id, first_id)
+        self.assertEqual(updated.title, 'Corrected title')
+
+    def test_entries_without_a_date_are_skipped(self):
+        self.assertEqual(save_apod_window([{'title': 'No date'}]), [])
+        self.assertFalse(APODImage.objects.exists())
+
+
+class SystemLogSinkTests(TestCase):
+
+    def test_entries_wait_for_a_flush(self):
+        log_sink = SystemLogSink(batch_size=100, flush_interval=3600)
+        for i in range(3):
+            log_sink.log('success', f'Entry {i}')
+        self.assertFalse(SystemLog.objects.exists())
+        log_sink.flush()
+        self.assertEqual(sorted(SystemLog.objects.values_list('message', flat=True)), ['Entry 0', 'Entry 1', 'Entry 2'])
+
+    def test_info_is_sampled_under_backpressure(self):
+        log_sink = SystemLogSink(batch_size=100, flush_interval=3600, high_water=10, max_buffer=20,
+                                 info_sample_rate=5)
+        for i in range(10):
+            log_sink.log('warning', f'Warning {i}')
+        for i in range(50):
+            log_sink.log('info', f'Info {i}')
+        log_sink.log('error', 'Always kept')
+        log_sink.flush()
+
+        levels = list(SystemLog.objects.values_list('level', flat=True))
+        self.assertEqual(levels.count('info'), 10)
+        self.assertEqual(levels.count('error'), 1)
+        self.assertTrue(SystemLog.objects.filter(message='Dropped 40 info log entries under backpressure').exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TerminalJobTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_same_range_shares_one_job(self):
+        first = submit_range('backfill', date(2024, 1, 1), date(2024, 1, 10))
+        second = submit_range('fetch', date(2024, 1, 1), date(2024, 1, 10))
+        self.assertEqual(first, second)
+        self.assertEqual(TerminalJob.objects.count(), 1)
+
+    def test_overlapping_range_only_queues_uncovered_dates(self):
+        [running] = submit_range('backfill', date(2024, 1, 5), date(2024, 1, 10))
+        job_ids = submit_range('backfill', date(2024, 1, 1), date(2024, 1, 15))
+        self.assertIn(running, job_ids)
+        ranges = sorted(TerminalJob.objects.exclude(id=running).values_list('start_date', 'end_date'))
+        self.assertEqual(ranges, [(date(2024, 1, 1), date(2024, 1, 4)), (date(2024, 1, 11), date(2024, 1, 15))])
+
+    def test_finished_jobs_are_not_shared(self):
+        [job_id] = submit_range('fetch', date(2024, 1, 1), date(2024, 1, 1))
+        TerminalJob.objects.filter(id=job_id).update(status='completed')
+        self.assertNotEqual(submit_range('fetch', date(2024, 1, 1), date(2024, 1, 1)), [job_id])
+
+    def test_submission_releases_its_lock(self):
+        submit_range('fetch', date(2024, 1, 1), date(2024, 1, 1))
+        self.assertIsNone(cache.get(SUBMIT_LOCK_KEY))
+
+    def test_expiry_follows_the_heartbeat(self):
+        old = timezone.now() - JOB_STALE_AFTER - timedelta(minutes=1)
+        queued = TerminalJob.objects.create(kind='fetch', start_date=date(2024, 1, 1), end_date=date(2024, 1, 1))
+        alive = TerminalJob.objects.create(kind='fetch', start_date=date(2024, 1, 2), end_date=date(2024, 1, 2),
+                                           status='running', heartbeat_at=timezone.now())
+        dead = TerminalJob.objects.create(kind='fetch', start_date=date(2024, 1, 3), end_date=date(2024, 1, 3),
+                                          status='running', heartbeat_at=old)
+        TerminalJob.objects.filter(id__in=[queued.id, alive.id, dead.id]).update(created_at=old)
+
+        expire_stale_jobs()
+
+        statuses = dict(TerminalJob.objects.values_list('id', 'status'))
+        self.assertEqual(statuses, {queued.id: 'pending', alive.id: 'running', dead.id: 'failed'})
+
+
+class TerminalJobStreamTests(TestCase):
+
+    def setUp(self):
+        self.job = TerminalJob.objects.create(
+            kind='backfill', start_date=date(2024, 1, 1), end_date=date(2024, 1, 3), status='running',
+            results=[{'success': True, 'date': '2024-01-03', 'title': 'A'},
+                     {'success': False, 'date': '2024-01-02', 'error': 'Failed to fetch'}],
+        )
+
+    def test_running_job_sends_results_and_no_done(self):
+        events = job_events(self.job.id, last_index=1)
+        self.assertTrue(events.startswith('retry: 1000'))
+        self.assertIn('id: 2\nevent: result', events)
+        self.assertNotIn('id: 1\n', events)
+        self.assertNotIn('event: done', events)
+
+    def test_finished_job_ends_with_done(self):
+        TerminalJob.objects.filter(id=self.job.id).update(status='completed')
+        events = job_events(self.job.id, last_index=2)
+        self.assertNotIn('event: result', events)
+        self.assertTrue(events.endswith('\n\n'))
+        self.assertIn('event: done', events)
+
+    def test_stream_response_ends_at_once_and_resumes_from_last_event_id(self):
+        response = self.client.get(reverse('apod:terminal_job_stream', args=[self.job.id]),
+                                   HTTP_LAST_EVENT_ID='1')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertFalse(response.streaming)
+        body = response.content.decode()
+        self.assertIn('2024-01-02', body)
+        self.assertNotIn('2024-01-03', body)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CalendarIndexTests(TestCase):
+
+    def test_year_index_marks_the_days_present(self):
+        save_apod_window([apod_entry(date(2024, 1, 1)), apod_entry(date(2024, 1, 10))])
+        response = self.client.get(reverse('apod:api_calendar_year', args=[2024]))
+        data = response.json()
+        self.assertEqual(data['count'], 2)
+        ids = list(APODImage.objects.order_by('date').values_list('id', flat=True))
+        self.assertEqual(data['ids'], ids)
+        bitmap = base64.b64decode(data['bitmap'])
+        self.assertEqual([day for day in range(366) if bitmap[day // 8] >> (day % 8) & 1], [0, 9])
+
+    def test_empty_years_are_not_stored(self):
+        response = self.client.get(reverse('apod:api_calendar_year', args=[2001]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 0)
+        self.assertIsNone(get_year_index(2001))
+        self.assertFalse(CalendarYearIndex.objects.exists())
+
+    def test_years_outside_the_archive_are_rejected(self):
+        for year in (1994, timezone.now().year + 1, 99999):
+            with self.subTest(year=year):
+                response = self.client.get(reverse('apod:api_calendar_year', args=[year]))
+                self.assertEqual(response.status_code, 404)
+        self.assertFalse(CalendarYearIndex.objects.exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ArchiveApiTests(TestCase):
+
+    def setUp(self):
+        save_apod_window([apod_entry(date(2024, 1, 1) + timedelta(days=i)) for i in range(5)])
+        self.url = reverse('apod:api_archive')
+
+    def test_keyset_pages_follow_next_cursor(self):
+        first = self.client.get(self.url, {'limit': 2}).json()
+        self.assertEqual([image['date'] for image in first['images']], ['Jan 05, 2024', 'Jan 04, 2024'])
+        self.assertEqual(first['next_cursor'], '2024-01-04')
+        last = self.client.get(self.url, {'limit': 2, 'cursor': '2024-01-02'}).json()
+        self.assertEqual([image['date'] for image in last['images']], ['Jan 01, 2024'])
+        self.assertFalse(last['has_next'])
+
+    def test_matching_etag_gets_304(self):
+        etag = self.client.get(self.url, {'limit': 2})['ETag']
+        response = self.client.get(self.url, {'limit': 2}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        # Another page is another representation
+        self.assertEqual(self.client.get(self.url, {'limit': 3}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_changes_when_rows_change(self):
+        etag = self.client.get(self.url)['ETag']
+        APODImage.objects.filter(date=date(2024, 1, 1)).delete()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        etag = self.client.get(self.url)['ETag']
+        image = APODImage.objects.get(date=date(2024, 1, 2))
+        image.title = 'Retitled'
+        image.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ResponseCacheTests(TestCase):
+
+    def setUp(self):
+        # Flush counts left in this process by other tests before starting from zero
+        cache_stats()
+        cache.clear()
+        save_apod_window([apod_entry(date(2024, 1, 1))])
+        self.image = APODImage.objects.get()
+        self.key = detail_key(self.image.id)
+
+    def test_hits_and_misses_are_counted(self):
+        builds = []
+        for _ in range(3):
+            cached_payload('apod:resp:test', lambda: builds.append(1) or ({'ok': True}, 200))
+        self.assertEqual(len(builds), 1)
+        stats = cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 1))
+
+    def test_save_invalidates_only_after_commit(self):
+        cache.set(self.key, ({'title': 'old'}, 200))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.image.title = 'New'
+            self.image.save()
+            # A reader inside the transaction window still gets the old payload
+            self.assertIsNotNone(cache.get(self.key))
+        self.assertIsNone(cache.get(self.key))
+
+    def test_detail_view_rebuilds_after_a_write(self):
+        url = reverse('apod:api_image_detail', args=[self.image.id])
+        self.assertEqual(self.client.get(url).json()['title'], self.image.title)
+        with self.captureOnCommitCallbacks(execute=True):
+            save_apod_window([apod_entry(date(2024, 1, 1), title='Bulk retitled')])
+        self.assertEqual(self.client.get(url).json()['title'], 'Bulk retitled')
+
+
+class AutocompleteTests(SimpleTestCase):
+
+    def setUp(self):
+        entries = [
+            ('Andromeda Galaxy', ['M31', 'NGC 224'], 90),
+            ('Andromeda I', [], 10),
+            ('Betelgeuse', ['Alpha Orionis'], 80),
+            ('Crab Nebula', ['M1'], 70),
+            ('Orion Nebula', ['M42'], 85),
+            ('Sirius', ['Dog Star'], 95),
+        ]
+        self.index = PrefixIndex([
+            {'name': name, 'aliases': aliases, 'popularity': popularity}
+            for name, aliases, popularity in entries
+        ])
+
+    def names(self, query, limit=10):
+        return [entry['name'] for entry in self.index.search(query, limit)]
+
+    def test_prefix_ranked_by_popularity(self):
+        self.assertEqual(self.names('andro'), ['Andromeda Galaxy', 'Andromeda I'])
+
+    def test_word_starts_and_aliases(self):
+        self.assertEqual(self.names('nebula'), ['Orion Nebula', 'Crab Nebula'])
+        self.assertEqual(self.names('m4'), ['Orion Nebula'])
+        self.assertEqual(self.names('dog'), ['Sirius'])
+
+    def test_typos_found_through_the_deletion_index(self):
+        self.assertEqual(self.names('sirus'), ['Sirius'])
+        self.assertEqual(self.names('betelguese'), ['Betelgeuse'])
+        self.assertEqual(self.names('abdromeda')[:1], ['Andromeda Galaxy'])
+
+    def test_exact_prefix_beats_typo(self):
+        names = self.names('orion')
+        self.assertEqual(names[0], 'Orion Nebula')
+
+    def test_short_queries_are_not_fuzzy(self):
+        self.assertEqual(self.names('zz'), [])
+
+
+def angular_separation(ra1, dec1, ra2, dec2):
+    """Haversine separation in degrees"""
+    ra1, dec1, ra2, dec2 = map(math.radians, (ra1, dec1, ra2, dec2))
+    h = math.sin((dec2 - dec1) / 2) ** 2 + math.cos(dec1) * math.cos(dec2) * math.sin((ra2 - ra1) / 2) ** 2
+    return math.degrees(2 * math.asin(min(1.0, math.sqrt(h))))
+
+
+class ConeSearchTests(SimpleTestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        n = 3000
+        self.ra = rng.uniform(0, 360, n)
+        # Uniform on the sphere, plus a few objects right at the poles
+        self.dec = np.degrees(np.arcsin(rng.uniform(-1, 1, n)))
+        self.dec[:3] = [90.0, -90.0, 89.999]
+        self.ids = np.arange(1, n + 1)
+        self.index = ConeIndex(self.ids, self.ra, self.dec)
+
+    def brute_force(self, ra, dec, radius):
+        return {
+            int(object_id)
+            for object_id, object_ra, object_dec in zip(self.ids, self.ra, self.dec)
+            if angular_separation(ra, dec, object_ra, object_dec) <= radius
+        }
+
+    def test_matches_brute_force(self):
+        centres = [(10, 20), (359.9, 0), (0.1, -45), (180, 89.5), (45, -89.9), (270, 0)]
+        for ra, dec in centres:
+            for radius in (0.5, 3, 12, 30):
+                with self.subTest(ra=ra, dec=dec, radius=radius):
+                    found = self.index.query(ra, dec, radius, limit=len(self.ids))
+                    expected = self.brute_force(ra, dec, radius)
+                    # Points within float rounding of the rim may fall either way
+                    rim = {object_id for object_id, separation in found if abs(separation - radius) < 1e-9}
+                    self.assertEqual({object_id for object_id, _ in found} - rim, expected - rim)
+
+    def test_nearest_first_with_accurate_separations(self):
+        found = self.index.query(123.0, -10.0, 15, limit=50)
+        separations = [separation for _, separation in found]
+        self.assertEqual(separations, sorted(separations))
+        positions = {int(object_id): i for i, object_id in enumerate(self.ids)}
+        for object_id, separation in found:
+            i = positions[object_id]
+            self.assertAlmostEqual(separation, angular_separation(123.0, -10.0, self.ra[i], self.dec[i]), places=6)
+
+    def test_wraps_through_ra_zero(self):
+        index = ConeIndex([1, 2, 3], [359.5, 0.5, 180.0], [0.0, 0.0, 0.0])
+        self.assertEqual({object_id for object_id, _ in index.query(0.0, 0.0, 1.0)}, {1, 2})
+
+
+class ConeIndexCatalogTests(TestCase):
+
+    def test_surface_features_are_not_sky_objects(self):
+        star = CelestialCoordinate.objects.create(name='Vega', type='star', longitude=279.2, latitude=38.8,
+                                                  body='Space')
+        CelestialCoordinate.objects.create(name='Tycho', type='crater', longitude=279.2, latitude=38.8,
+                                           body='Moon')
+        index = build_index()
+        self.assertEqual([object_id for object_id, _ in index.query(279.2, 38.8, 1.0)], [star.id])
+
+
+class SkyClusterTests(TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(13)
+        ra = rng.uniform(-5, 365, 200)
+        dec = np.degrees(np.arcsin(rng.uniform(-1, 1, 200)))
+        CelestialCoordinate.objects.bulk_create(
+            CelestialCoordinate(name=f'Object {i}', type='star', longitude=float(ra[i]), latitude=float(dec[i]),
+                                body='Space')
+            for i in range(200)
+        )
+        # Surface features share the lat/lon columns but are not on the sky
+        CelestialCoordinate.objects.bulk_create(
+            CelestialCoordinate(name=f'Crater {i}', type='crater', longitude=float(ra[i]), latitude=float(dec[i]),
+                                body='Moon')
+            for i in range(50)
+        )
+        self.ra, self.dec = ra, dec
+
+    def cells(self, level):
+        return {(cell.row, cell.col): cell for cell in SkyCell.objects.filter(level=level)}
+
+    def test_counts_match_a_direct_count(self):
+        rebuild_sky_cells()
+        for level in (0, 2, 5):
+            with self.subTest(level=level):
+                rows, cols = cell_of(self.ra, self.dec, level)
+                expected = {}
+                for key in zip(rows.tolist(), cols.tolist()):
+                    expected[key] = expected.get(key, 0) + 1
+                cells = self.cells(level)
+                self.assertEqual({key: cell.count for key, cell in cells.items()}, expected)
+                for cell in cells.values():
+                    self.assertEqual(len(cell.members), cell.count if cell.count <= SPARSE_LIMIT else 0)
+                    self.assertTrue(all(member['body'] == 'Space' for member in cell.members))
+
+    def test_incremental_updates_match_a_rebuild(self):
+        rebuild_sky_cells()
+        CelestialCoordinate.objects.create(name='Wrapped', type='star', longitude=-0.5, latitude=10.0, body='Space')
+        CelestialCoordinate.objects.create(name='Copernicus', type='crater', longitude=20.0, latitude=9.6,
+                                           body='Moon')
+        moved = CelestialCoordinate.objects.get(name='Object 0')
+        moved.body = 'Mars'
+        moved.save()
+
+        incremental = {level: {key: (cell.count, sorted(m['id'] for m in cell.members))
+                               for key, cell in self.cells(level).items()} for level in range(4)}
+        rebuild_sky_cells()
+        rebuilt = {level: {key: (cell.count, sorted(m['id'] for m in cell.members))
+                           for key, cell in self.cells(level).items()} for level in range(4)}
+        self.assertEqual(incremental, rebuilt)
+        self.assertEqual(sum(count for count, _ in rebuilt[0].values()), 200)
+
+
+class SexagesimalTests(SimpleTestCase):
+
+    def test_marked_units(self):
+        self.assertAlmostEqual(parse_sexagesimal('10h42m44s'), (10 + 42 / 60 + 44 / 3600) * 15)
+        self.assertAlmostEqual(parse_sexagesimal('+41°16′09″'), 41 + 16 / 60 + 9 / 3600)
+        self.assertAlmostEqual(parse_sexagesimal('41d16m9s', hours=True), 41 + 16 / 60 + 9 / 3600)
+        self.assertAlmostEqual(parse_sexagesimal('-05:23:28'), -(5 + 23 / 60 + 28 / 3600))
+
+    def test_decimals_follow_the_hours_flag(self):
+        self.assertEqual(parse_sexagesimal('83.82'), 83.82)
+        self.assertEqual(parse_sexagesimal('5.5', hours=True), 82.5)
+        self.assertEqual(parse_sexagesimal(12), 12.0)
+
+    def test_unmarked_ra_is_hours(self):
+        self.assertAlmostEqual(parse_ra('05:35:17.3'), (5 + 35 / 60 + 17.3 / 3600) * 15)
+        self.assertAlmostEqual(parse_ra('05 35 17.3'), (5 + 35 / 60 + 17.3 / 3600) * 15)
+        self.assertEqual(parse_ra('83.82'), 83.82)
+
+    def test_garbage_is_rejected(self):
+        with self.assertRaises(ValueError):
+            parse_sexagesimal('north')
+
+
+class CatalogImportTests(TestCase):
+
+    CSV = (
+        'proper,hip,ra,dec,mag,aliases\n'
+        'Polaris,11767,02h31m49s,+89°15′51″,2.0,North Star;1995\n'
+        ',32349,06:45:08.9,-16:42:58,-1.46,\n'
+        'No position,1,,,,\n'
+    )
+
+    def test_rows_map_onto_coordinates(self):
+        polaris = coordinate_from_row(next(iter_csv(io.StringIO(self.CSV))))
+        self.assertEqual(polaris.name, 'Polaris')
+        self.assertAlmostEqual(polaris.longitude, (2 + 31 / 60 + 49 / 3600) * 15)
+        self.assertAlmostEqual(polaris.latitude, 89 + 15 / 60 + 51 / 3600)
+        # Catalogue ids carry their prefix and bare numbers are dropped
+        self.assertEqual(polaris.aliases, ['North Star', 'HIP 11767'])
+        self.assertEqual(polaris.popularity, 180)
+
+    def test_reimport_updates_by_name_and_body(self):
+        stats = import_catalog(iter_csv(io.StringIO(self.CSV)))
+        self.assertEqual((stats['imported'], stats['skipped']), (2, 1))
+        self.assertEqual(CelestialCoordinate.objects.get(name='HIP 32349').type, 'star')
+
+        import_catalog(iter_csv(io.StringIO(self.CSV.replace('2.0,North Star', '1.9,Lodestar'))))
+        self.assertEqual(CelestialCoordinate.objects.count(), 2)
+        self.assertEqual(CelestialCoordinate.objects.get(name='Polaris').aliases, ['Lodestar', 'HIP 11767'])
+
+    def test_terminal_populate_updates_existing_names(self):
+        CelestialCoordinate.objects.create(name='Polaris', type='star', longitude=0, latitude=0, body='Space')
+        url = reverse('apod:terminal_populate_coordinates')
+        self.assertTrue(self.client.post(url).json()['success'])
+        count = CelestialCoordinate.objects.count()
+        self.client.post(url)
+
+        self.assertEqual(CelestialCoordinate.objects.count(), count)
+        polaris = CelestialCoordinate.objects.get(name='Polaris')
+        self.assertEqual((polaris.longitude, polaris.latitude, polaris.body), (37.95, 89.26, 'Deep Sky'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CatalogVisibilityTests(TestCase):
+
+    def setUp(self):
+        cache_stats()
+        cache.clear()
+        self.vega = CelestialCoordinate.objects.create(name='Vega', type='star', longitude=279.23, latitude=38.78,
+                                                       body='Space')
+        CelestialCoordinate.objects.create(name='Tycho', type='crater', longitude=348.68, latitude=-43.31,
+                                           body='Moon')
+
+    def test_cached_apart_from_the_api_counters(self):
+        first = catalog_visibility(51.5, -0.1, date(2024, 7, 1))
+        second = catalog_visibility(51.4, -0.2, date(2024, 7, 1))
+        self.assertEqual(first, second)
+        self.assertEqual(first['ids'], [self.vega.id])
+        # Vega never sets at London
+        self.assertEqual(first['circumpolar'], [True])
+        stats = cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (0, 0))
+
+
+class AhoCorasickTests(SimpleTestCase):
+
+    def test_finds_every_occurrence_like_brute_force(self):
+        patterns = ['he', 'she', 'his', 'hers', 'm3', 'm31', 'orion', 'orion nebula']
+        text = 'ushers saw m31 and m3 near the orion nebula; she said his hershey'
+        automaton = AhoCorasick(patterns)
+        expected = sorted(
+            (start, start + len(pattern), pattern_id)
+            for pattern_id, pattern in enumerate(patterns)
+            for start in range(len(text))
+            if text.startswith(pattern, start)
+        )
+        self.assertEqual(sorted(automaton.find(text)), expected)
+
+
+class ObjectMatcherTests(SimpleTestCase):
+
+    def setUp(self):
+        self.matcher = ObjectMatcher([
+            (1, 'Polaris', ['1995', 'North Star', 'HIP 11767']),
+            (2, 'Sirius', ['12', 'Dog Star']),
+            (3, 'Andromeda Galaxy', ['M31', 'NGC 224']),
+            (4, 'Crab Nebula', ['M1']),
+            (5, 'Io', []),
+        ])
+
+    def test_numbers_in_text_link_nothing(self):
+        self.assertEqual(self.matcher.mentions('In 1995 astronomers imaged 12 galaxies'), {})
+
+    def test_digit_only_aliases_are_not_patterns(self):
+        self.assertNotIn('1995', self.matcher.patterns)
+        self.assertNotIn('12', self.matcher.patterns)
+
+    def test_aliases_need_more_characters_than_names(self):
+        self.assertIn('io', self.matcher.patterns)
+        self.assertNotIn('m1', self.matcher.patterns)
+        self.assertEqual(self.matcher.mentions('M1 seen from Io'), {5: 1})
+
+    def test_names_and_aliases_link_on_word_boundaries(self):
+        mentions = self.matcher.mentions('M31, the Andromeda Galaxy, outshines the North Star and HIP 11767.')
+        self.assertEqual(mentions, {3: 2, 1: 2})
+        self.assertEqual(self.matcher.mentions('M310 and Siriusly'), {})
+
+    def test_longest_match_wins(self):
+        matcher = ObjectMatcher([(1, 'Orion', []), (2, 'Orion Nebula', [])])
+        self.assertEqual(matcher.mentions('The Orion Nebula lies below Orion'), {2: 1, 1: 1})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RelatedApodTests(TestCase):
+
+    TOPICS = [
+        'spiral galaxy arms dust lanes', 'spiral galaxy halo dust lanes', 'comet tail nucleus coma',
+        'comet tail ion stream coma', 'lunar eclipse shadow umbra', 'lunar eclipse copper umbra',
+        'aurora curtains magnetic storm', 'aurora curtains green oxygen', 'saturn rings cassini moons',
+        'saturn rings cassini division', 'volcano lava eruption night', 'solitary pulsar timing glitch',
+    ]
+
+    def setUp(self):
+        save_apod_window([
+            apod_entry(date(2024, 1, 1) + timedelta(days=i), title=f'Picture {i}', explanation=topic)
+            for i, topic in enumerate(self.TOPICS)
+        ])
+        self.ids = list(APODImage.objects.order_by('date').values_list('id', flat=True))
+
+    def neighbours(self):
+        return {
+            image_id: [link.related_id for link in RelatedAPOD.objects.filter(image_id=image_id).order_by('rank')]
+            for image_id in self.ids
+        }
+
+    def test_pairs_on_shared_terms(self):
+        rebuild_related()
+        neighbours = self.neighbours()
+        for i in range(0, 10, 2):
+            self.assertEqual(neighbours[self.ids[i]][:1], [self.ids[i + 1]])
+        self.assertEqual(neighbours[self.ids[11]], [])
+
+    def test_images_without_neighbours_are_not_rescored(self):
+        self.assertEqual(refresh_related()[0], len(self.ids))
+        self.assertFalse(APODImage.objects.filter(related_scored_at__isnull=True).exists())
+        self.assertEqual(refresh_related(), (0, 0))
+
+    def test_refresh_matches_a_rebuild(self):
+        refresh_related()
+        save_apod_window([apod_entry(date(2024, 2, 1), explanation='spiral galaxy arms halo')])
+        self.ids = list(APODImage.objects.order_by('date').values_list('id', flat=True))
+        new, _ = refresh_related()
+        self.assertEqual(new, 1)
+        incremental = self.neighbours()
+        rebuild_related()
+        self.assertEqual(incremental, self.neighbours())
+
+
+def reference_blurhash(image, x_components, y_components):
+    """Straight per-pixel transcription of the BlurHash encoder"""
+    def to_linear(value):
+        value /= 255.0
+        return value / 12.92 if value <= 0.04045 else ((value + 0.055) / 1.055) ** 2.4
+
+    def to_srgb(value):
+        value = min(max(value, 0.0), 1.0)
+        return int(value * 12.92 * 255 + 0.5) if value <= 0.0031308 else int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+    def base83(value, length):
+        return ''.join(BASE83[(value // 83 ** (length - i - 1)) % 83] for i in range(length))
+
+    pixels = image.convert('RGB').load()
+    width, height = image.size
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            normalisation = 1 if i == j == 0 else 2
+            total = [0.0, 0.0, 0.0]
+            for y in range(height):
+                for x in range(width):
+                    basis = normalisation * math.cos(math.pi * i * x / width) * math.cos(math.pi * j * y / height)
+                    for c in range(3):
+                        total[c] += basis * to_linear(pixels[x, y][c])
+            factors.append([value / (width * height) for value in total])
+
+    dc, ac = factors[0], factors[1:]
+    result = base83((x_components - 1) + (y_components - 1) * 9, 1)
+    if ac:
+        quantised_max = int(max(0, min(82, math.floor(max(abs(v) for f in ac for v in f) * 166 - 0.5))))
+        maximum = (quantised_max + 1) / 166
+    else:
+        quantised_max, maximum = 0, 1
+    result += base83(quantised_max, 1)
+    result += base83((to_srgb(dc[0]) << 16) + (to_srgb(dc[1]) << 8) + to_srgb(dc[2]), 4)
+    for factor in ac:
+        q = [
+            int(max(0, min(18, math.floor(math.copysign(math.sqrt(abs(v / maximum)), v) * 9 + 9.5))))
+            for v in factor
+        ]
+        result += base83(q[0] * 19 * 19 + q[1] * 19 + q[2], 2)
+    return result
+
+
+class BlurHashTests(SimpleTestCase):
+
+    def test_size_flag_and_average_colour(self):
+        encoded = blurhash(Image.new('RGB', (16, 12), (255, 128, 0)))
+        self.assertEqual(len(encoded), 6 + 2 * (4 * 3 - 1))
+        self.assertEqual(encoded[0], BASE83[3 + 2 * 9])
+        colour = sum(BASE83.index(ch) * 83 ** (3 - i) for i, ch in enumerate(encoded[2:6]))
+        self.assertEqual(colour, 0xFF8000)
+
+    def test_matches_reference_encoder(self):
+        rng = np.random.default_rng(3)
+        gradient = np.linspace(0, 255, 20)
+        pixels = np.stack([
+            np.tile(gradient, (15, 1)),
+            np.tile(gradient[::-1, None][:15], (1, 20)),
+            rng.integers(0, 256, (15, 20)),
+        ], axis=2).astype(np.uint8)
+        image = Image.fromarray(pixels)
+        for x_components, y_components in ((4, 3), (1, 1), (5, 5)):
+            with self.subTest(components=(x_components, y_components)):
+                self.assertEqual(blurhash(image, x_components, y_components),
+                                 reference_blurhash(image, x_components, y_components))
+
+
+class HammingIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        hashes = [int(value) for value in rng.integers(0, 2 ** 64, 2000, dtype=np.uint64)]
+        # Plant neighbours of the first hash at every distance up to 16
+        base = hashes[0]
+        for distance in range(17):
+            bits = rng.choice(64, distance, replace=False)
+            hashes.append(base ^ sum(1 << int(bit) for bit in bits))
+        self.hashes = hashes
+        self.index = HammingIndex([(i + 1, value, None) for i, value in enumerate(hashes)])
+
+    def brute_force(self, value, max_distance):
+        return sorted(
+            (bin(other ^ value).count('1'), row)
+            for row, other in enumerate(self.hashes)
+            if bin(other ^ value).count('1') <= max_distance
+        )
+
+    def test_matches_brute_force(self):
+        for query in (self.hashes[0], self.hashes[5], self.hashes[-1]):
+            for max_distance in (0, 3, 7, 10, 12):
+                with self.subTest(query=query, max_distance=max_distance):
+                    rows, distances = self.index.search(query, max_distance)
+                    self.assertEqual(list(zip(distances.tolist(), rows.tolist())),
+                                     self.brute_force(query, max_distance))
+
+    def test_popcount(self):
+        values = np.array([0, 1, 2 ** 64 - 1, 0xF0F0], dtype=np.uint64)
+        self.assertEqual(popcount(values).tolist(), [0, 1, 64, 8])
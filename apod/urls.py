@@ -11,16 +11,33 @@ urlpatterns = [
     path('coordinates/', views.coordinates_view, name='coordinates'),
     path('terminal/', views.terminal_view, name='terminal'),
     
+    # Resized images, e.g. /img/apod/<id>?w=480&fmt=webp
+    path('img/<str:kind>/<int:image_id>', views.image_proxy, name='image_proxy'),
+    
     # API endpoints for general data
     path('api/archive/', views.api_archive, name='api_archive'),
+    path('api/calendar/<int:year>/', views.api_calendar_year, name='api_calendar_year'),
+    path('api/calendar/<int:year>/<int:month>/', views.api_calendar_month, name='api_calendar_month'),
     path('api/image/<int:image_id>/', views.api_image_detail, name='api_image_detail'),
+    path('api/image/<int:image_id>/related/', views.api_image_related, name='api_image_related'),
+    path('api/image/<int:image_id>/objects/', views.api_image_objects, name='api_image_objects'),
+    path('api/image/<int:image_id>/duplicates/', views.api_image_duplicates, name='api_image_duplicates'),
     path('api/image-by-date/', views.api_image_by_date, name='api_image_by_date'),
+    path('api/search/', views.api_search, name='api_search'),
     path('api/coordinates/', views.api_coordinates, name='api_coordinates'),
+    path('api/coordinates/<int:coordinate_id>/images/', views.api_coordinate_images, name='api_coordinate_images'),
+    path('api/coordinates/cone/', views.api_coordinates_cone, name='api_coordinates_cone'),
+    path('api/sky/clusters/', views.api_sky_clusters, name='api_sky_clusters'),
+    path('api/sky/visibility/', views.api_sky_visibility, name='api_sky_visibility'),
+    path('api/sky/transform/', views.api_sky_transform, name='api_sky_transform'),
     path('api/logs/', views.api_logs, name='api_logs'),
+    path('api/cache/stats/', views.api_cache_stats, name='api_cache_stats'),
     
     # Terminal API endpoints
     path('api/terminal/fetch/', views.terminal_fetch, name='terminal_fetch'),
     path('api/terminal/backfill/', views.terminal_backfill, name='terminal_backfill'),
     path('api/terminal/populate-coordinates/', views.terminal_populate_coordinates, name='terminal_populate_coordinates'),
     path('api/terminal/status/', views.terminal_status, name='terminal_status'),
+    path('api/terminal/jobs/<int:job_id>/', views.terminal_job_status, name='terminal_job_status'),
+    path('api/terminal/jobs/<int:job_id>/stream/', views.terminal_job_stream, name='terminal_job_stream'),
 ]
\ No newline at end of file
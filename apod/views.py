@@ -1,15 +1,37 @@
 # apod/views.py
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
-from django.core.paginator import Paginator
+from django.http import HttpResponse, JsonResponse, FileResponse, HttpResponseNotModified
+from django.db import transaction
+from django.db.models import Count, Max
 from django.utils import timezone
-from django.views.decorators.http import require_http_methods
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_http_methods, condition
 from django.views.decorators.csrf import csrf_exempt
-from .models import APODImage, CelestialCoordinate, SystemLog
+from .models import APODImage, CelestialCoordinate, SystemLog, TerminalJob, CalendarYearIndex, APODObjectMention
+from .search import get_search_backend
+from .autocomplete import autocomplete
+from .cone_search import cone_search, MAX_RADIUS
+from .sky_clusters import cells_in_view, MAX_LEVEL, SPARSE_LIMIT
+from .catalog_import import refresh_coordinate_indexes
+from .sky_transforms import catalog_visibility, galactic_to_equatorial, transform
+from .calendar_index import get_year_index, year_index_payload
+from .backfill import APOD_FIRST_DATE
+from .related import related_images
+from .duplicates import near_duplicates, DEFAULT_DISTANCE, MAX_DISTANCE
+from .image_mirror import image_sources
+from .placeholders import queue_placeholders
+from .image_proxy import resolve, open_rendition, negotiate_format, proxy_url, CONTENT_TYPES, DEFAULT_WIDTH, FORMATS
+from .response_cache import (
+    cached_payload, cache_stats, detail_key, date_key, STATUS_KEY, STATUS_TIMEOUT
+)
+from .logsink import log_event
+from .jobs import submit_range, job_summary, job_events
+from emiigen.nasa_client import get_client
 import requests
 from django.conf import settings
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
 import json
+import time
 
 def home(request):
     """Display today's APOD with calendar data"""
@@ -51,16 +73,20 @@ def home(request):
         }
         return render(request, 'apod/error.html', context)
     
-    # Get all APOD images for the calendar
-    apod_images = APODImage.objects.all().order_by('-date')
+    related = related_images(apod.id)
+    # Only the picture on show counts as a view for the mirror's LRU eviction
+    sources = image_sources([apod.id], touch=True)
+    sources.update(image_sources([row['related_id'] for row in related]))
     
+    # The calendar loads its data lazily from api_calendar_year/api_calendar_month
     context = {
         'apod': apod,
-        'apod_images': apod_images,
+        'apod_sources': sources.get(apod.id),
+        'related': [_related_payload(row, sources.get(row['related_id'])) for row in related],
         'current_time': timezone.now().strftime('%H:%M:%S')
     }
     
-    SystemLog.objects.create(
+    log_event(
         level='info',
         message=f'APOD home page accessed - {apod.title} ({apod.date})'
     )
@@ -69,29 +95,28 @@ def home(request):
 
 def archive(request):
     """Display archive with calendar view"""
-    apod_images = APODImage.objects.all().order_by('-date')
-    
     # If no images, show setup message
-    if not apod_images.exists():
+    if not APODImage.objects.exists():
         context = {
             'error': 'No APOD archive available. Please fetch data using management commands or the terminal.',
             'current_time': timezone.now().strftime('%H:%M:%S')
         }
         return render(request, 'apod/error.html', context)
     
-    context = {
-        'apod_images': apod_images,
-        'has_more': APODImage.objects.count() > 30
-    }
-    
-    return render(request, 'apod/archive.html', context)
+    # The calendar loads its data lazily from api_calendar_year/api_calendar_month
+    return render(request, 'apod/archive.html', {})
+
+COORDINATE_CARD_LIMIT = 60
+
 
 def coordinates_view(request):
-    """Display celestial coordinates"""
-    coordinates = CelestialCoordinate.objects.all()
+    """Display celestial coordinates; the sky map loads its clusters from api_sky_clusters"""
+    coordinates = CelestialCoordinate.objects.order_by('-popularity', 'name')[:COORDINATE_CARD_LIMIT]
     
     context = {
-        'coordinates': coordinates
+        'coordinates': coordinates,
+        'total_coordinates': CelestialCoordinate.objects.count(),
+        'max_sky_level': MAX_LEVEL,
     }
     
     return render(request, 'apod/coordinates.html', context)
@@ -102,47 +127,284 @@ def terminal_view(request):
         'current_time': timezone.now().strftime('%H:%M:%S')
     })
 
+ARCHIVE_PAGE_SIZE = 30
+ARCHIVE_MAX_PAGE_SIZE = 100
+
+
+def _archive_params(request):
+    """Parse the keyset cursor (date of the last item already shown) and page size"""
+    from django.utils.dateparse import parse_date
+    try:
+        cursor = parse_date(request.GET.get('cursor', ''))
+    except ValueError:
+        cursor = None
+    try:
+        limit = min(max(int(request.GET.get('limit', ARCHIVE_PAGE_SIZE)), 1), ARCHIVE_MAX_PAGE_SIZE)
+    except ValueError:
+        limit = ARCHIVE_PAGE_SIZE
+    return cursor, limit
+
+
+def _archive_etag(request):
+    # The row count changes on delete, which leaves the newest updated_at alone
+    archive = APODImage.objects.aggregate(newest=Max('updated_at'), count=Count('id'))
+    cursor, limit = _archive_params(request)
+    stamp = archive['newest'].timestamp() if archive['newest'] else 0
+    return f'"archive-{stamp}-{archive["count"]}-{cursor}-{limit}"'
+
+
 @require_http_methods(["GET"])
+@condition(etag_func=_archive_etag)
 def api_archive(request):
-    """API endpoint for paginated archive"""
-    page = request.GET.get('page', 1)
-    images = APODImage.objects.all().order_by('-date')
+    """
+    API endpoint for the archive, keyset-paginated by date.
+    
+    Pass the previous response's next_cursor as ?cursor= to get the next
+    page. Every page costs one indexed range scan regardless of depth.
+    """
+    cursor, limit = _archive_params(request)
+    
+    images = APODImage.objects.order_by('-date')
+    if cursor:
+        images = images.filter(date__lt=cursor)
+    rows = list(images.values('id', 'title', 'date', 'url', 'blurhash', 'palette')[:limit + 1])
     
-    paginator = Paginator(images, 30)
-    page_obj = paginator.get_page(page)
+    has_next = len(rows) > limit
+    rows = rows[:limit]
     
     data = {
         'images': [
             {
-                'id': img.id,
-                'title': img.title,
-                'date': img.date.strftime('%b %d, %Y'),
-                'url': img.url,
+                'id': row['id'],
+                'title': row['title'],
+                'date': row['date'].strftime('%b %d, %Y'),
+                'url': row['url'],
+                'thumbnail': proxy_url('apod', row['id'], 480),
+                'blurhash': row['blurhash'] or None,
+                'color': row['palette'][0] if row['palette'] else None,
             }
-            for img in page_obj
+            for row in rows
         ],
-        'has_next': page_obj.has_next()
+        'has_next': has_next,
+        'next_cursor': rows[-1]['date'].strftime('%Y-%m-%d') if has_next else None
     }
     
-    return JsonResponse(data)
+    response = JsonResponse(data)
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+def _calendar_year_etag(request, year):
+    index = CalendarYearIndex.objects.filter(year=year).only('updated_at').first()
+    return f'"{year}-{index.updated_at.timestamp()}"' if index else None
+
+
+@require_http_methods(["GET"])
+@condition(etag_func=_calendar_year_etag)
+def api_calendar_year(request, year):
+    """API endpoint for the precomputed calendar index of one year"""
+    if not APOD_FIRST_DATE.year <= year <= timezone.now().year:
+        return JsonResponse({'error': f'Year must be between {APOD_FIRST_DATE.year} and {timezone.now().year}'},
+                            status=404)
+    index = get_year_index(year)
+    
+    response = JsonResponse(year_index_payload(year, index))
+    response['Cache-Control'] = 'public, max-age=300'
+    return response
+
+@require_http_methods(["GET"])
+def api_calendar_month(request, year, month):
+    """API endpoint for the calendar tooltips and thumbnails of one month"""
+    images = APODImage.objects.filter(
+        date__year=year, date__month=month
+    ).values('id', 'date', 'title', 'media_type', 'url', 'thumbnail_url', 'palette')
+    
+    data = {
+        'days': {
+            image['date'].day: {
+                'id': image['id'],
+                'title': image['title'],
+                'url': image['url'] if image['media_type'] == 'image' else image['thumbnail_url'],
+                'thumbnail': proxy_url('apod', image['id'], 160),
+                'color': image['palette'][0] if image['palette'] else None
+            }
+            for image in images
+        }
+    }
+    
+    response = JsonResponse(data)
+    response['Cache-Control'] = 'public, max-age=300'
+    return response
 
 @require_http_methods(["GET"])
 def api_image_detail(request, image_id):
     """API endpoint for single image detail"""
-    image = get_object_or_404(APODImage, id=image_id)
+    def build():
+        image = APODImage.objects.filter(id=image_id).first()
+        if not image:
+            return {'error': 'Image not found'}, 404
+        
+        return {
+            'id': image.id,
+            'title': image.title,
+            'date': image.date.strftime('%B %d, %Y'),
+            'explanation': image.explanation,
+            'url': image.url,
+            'hdurl': image.hdurl,
+            'copyright': image.copyright,
+            'media_type': image.media_type,
+            'sources': image_sources([image.id]).get(image.id),
+            'blurhash': image.blurhash or None,
+            'palette': image.palette
+        }, 200
     
-    data = {
-        'id': image.id,
-        'title': image.title,
-        'date': image.date.strftime('%B %d, %Y'),
-        'explanation': image.explanation,
-        'url': image.url,
-        'hdurl': image.hdurl,
-        'copyright': image.copyright,
-        'media_type': image.media_type
+    data, status = cached_payload(detail_key(image_id), build)
+    return JsonResponse(data, status=status)
+
+def _related_payload(row, sources=None):
+    return {
+        'id': row['related_id'],
+        'title': row['related__title'],
+        'date': row['related__date'].strftime('%Y-%m-%d'),
+        'url': row['related__url'] if row['related__media_type'] == 'image' else row['related__thumbnail_url'],
+        'score': round(row['score'], 4),
+        'sources': sources
     }
+
+@require_http_methods(["GET"])
+def api_image_related(request, image_id):
+    """API endpoint for the precomputed related pictures of one image"""
+    related = related_images(image_id)
+    sources = image_sources([row['related_id'] for row in related])
+    return JsonResponse({
+        'image_id': image_id,
+        'related': [_related_payload(row, sources.get(row['related_id'])) for row in related]
+    })
+
+@require_http_methods(["GET"])
+def api_image_duplicates(request, image_id):
+    """API endpoint for pictures whose perceptual hash is within ?distance= bits"""
+    try:
+        distance = int(request.GET.get('distance', DEFAULT_DISTANCE))
+    except ValueError:
+        return JsonResponse({'error': 'Distance must be an integer'}, status=400)
+    if not 0 <= distance <= MAX_DISTANCE:
+        return JsonResponse({'error': f'Distance must be between 0 and {MAX_DISTANCE}'}, status=400)
+    if not APODImage.objects.filter(id=image_id).exists():
+        return JsonResponse({'error': 'Image not found'}, status=404)
     
-    return JsonResponse(data)
+    matches = near_duplicates(image_id, distance)
+    images = APODImage.objects.in_bulk([match[0] for match in matches or []])
+    return JsonResponse({
+        'image_id': image_id,
+        'distance': distance,
+        'hashed': matches is not None,
+        'duplicates': [
+            {
+                'id': other_id,
+                'title': images[other_id].title,
+                'date': images[other_id].date.strftime('%Y-%m-%d'),
+                'url': images[other_id].url,
+                'distance': phash_distance,
+                'dhash_distance': dhash_distance
+            }
+            for other_id, phash_distance, dhash_distance in matches or []
+            if other_id in images
+        ]
+    })
+
+@require_http_methods(["GET"])
+def api_image_objects(request, image_id):
+    """API endpoint for the catalog objects named in one picture"""
+    mentions = APODObjectMention.objects.filter(image_id=image_id).select_related('coordinate').order_by(
+        '-in_title', '-count', 'coordinate__name'
+    )
+    
+    return JsonResponse({
+        'image_id': image_id,
+        'objects': [
+            {
+                'id': mention.coordinate.id,
+                'name': mention.coordinate.name,
+                'type': mention.coordinate.type,
+                'ra': mention.coordinate.longitude,
+                'dec': mention.coordinate.latitude,
+                'body': mention.coordinate.body,
+                'mentions': mention.count,
+                'in_title': mention.in_title
+            }
+            for mention in mentions
+        ]
+    })
+
+@require_http_methods(["GET"])
+def api_coordinate_images(request, coordinate_id):
+    """API endpoint for the pictures whose text names one catalog object"""
+    try:
+        limit = min(max(int(request.GET.get('limit', 50)), 1), 200)
+    except ValueError:
+        limit = 50
+    
+    images = APODObjectMention.objects.filter(coordinate_id=coordinate_id).order_by('-image__date').values(
+        'image_id', 'image__title', 'image__date', 'image__url', 'image__media_type', 'image__thumbnail_url', 'in_title'
+    )[:limit]
+    
+    return JsonResponse({
+        'coordinate_id': coordinate_id,
+        'images': [
+            {
+                'id': image['image_id'],
+                'title': image['image__title'],
+                'date': image['image__date'].strftime('%Y-%m-%d'),
+                'url': image['image__url'] if image['image__media_type'] == 'image' else image['image__thumbnail_url'],
+                'in_title': image['in_title']
+            }
+            for image in images
+        ]
+    })
+
+@require_http_methods(["GET", "HEAD"])
+def image_proxy(request, kind, image_id):
+    """
+    Image resized to ?w= (snapped to 32px steps) as ?fmt=webp|jpeg|png.
+    
+    Without fmt, WebP is served to browsers that accept it. Renditions are
+    cached on disk and a burst of identical requests is resized once.
+    """
+    try:
+        width = int(request.GET.get('w', DEFAULT_WIDTH))
+    except ValueError:
+        return JsonResponse({'error': 'Width must be an integer'}, status=400)
+    if width <= 0:
+        return JsonResponse({'error': 'Width must be positive'}, status=400)
+    
+    fmt = request.GET.get('fmt', '').lower()
+    if fmt and fmt not in FORMATS:
+        return JsonResponse({'error': f"Format must be one of {', '.join(FORMATS)}"}, status=400)
+    fmt, negotiated = negotiate_format(fmt, request.META.get('HTTP_ACCEPT'))
+    
+    rendition = resolve(kind, image_id, width, fmt)
+    if rendition is None:
+        return JsonResponse({'error': 'Image not found'}, status=404)
+    
+    if rendition['etag'] in request.META.get('HTTP_IF_NONE_MATCH', ''):
+        response = HttpResponseNotModified()
+    else:
+        try:
+            f, hit = open_rendition(rendition)
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching {kind} image {image_id}: {e}")
+            return JsonResponse({'error': 'Source image unavailable'}, status=502)
+        except (OSError, ValueError) as e:
+            print(f"Error resizing {kind} image {image_id}: {e}")
+            return JsonResponse({'error': 'Source is not a readable image'}, status=502)
+        response = FileResponse(f, content_type=CONTENT_TYPES[fmt])
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+    
+    response['ETag'] = rendition['etag']
+    response['Cache-Control'] = 'public, max-age=86400'
+    if negotiated:
+        patch_vary_headers(response, ['Accept'])
+    return response
 
 @require_http_methods(["GET"])
 def api_image_by_date(request):
@@ -154,19 +416,55 @@ def api_image_by_date(request):
     try:
         from django.utils.dateparse import parse_date
         date = parse_date(date_str)
-        image = APODImage.objects.filter(date=date).first()
+        if not date:
+            return JsonResponse({'error': 'Image not found'}, status=404)
         
-        if image:
-            return JsonResponse({
+        def build():
+            image = APODImage.objects.filter(date=date).first()
+            if not image:
+                return {'error': 'Image not found'}, 404
+            
+            return {
                 'id': image.id,
                 'title': image.title,
                 'date': image.date.strftime('%Y-%m-%d')
-            })
-        else:
-            return JsonResponse({'error': 'Image not found'}, status=404)
+            }, 200
+        
+        data, status = cached_payload(date_key(date.strftime('%Y-%m-%d')), build)
+        return JsonResponse(data, status=status)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
+@require_http_methods(["GET"])
+def api_search(request):
+    """API endpoint for ranked full-text search over titles and explanations"""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 100)
+    except ValueError:
+        limit = 20
+    
+    if len(query) < 2:
+        return JsonResponse({'query': query, 'results': []})
+    
+    started = time.perf_counter()
+    results = get_search_backend().search(query, limit=limit)
+    
+    return JsonResponse({
+        'query': query,
+        'results': [
+            {
+                'id': result['id'],
+                'title': result['title'],
+                'date': str(result['date']),
+                'snippet': result['snippet'],
+                'score': round(result['score'], 4)
+            }
+            for result in results
+        ],
+        'took_ms': round((time.perf_counter() - started) * 1000, 2)
+    })
+
 @require_http_methods(["GET"])
 def api_coordinates(request):
     """API endpoint for coordinate search - UPDATED for RA/Dec"""
@@ -175,27 +473,189 @@ def api_coordinates(request):
     if len(query) < 2:
         return JsonResponse({'results': []})
     
-    coordinates = CelestialCoordinate.objects.filter(
-        name__icontains=query
-    )[:10]
+    # Prefix matches first, then close typos, ranked by popularity
+    matches = autocomplete(query, 10)
     
     data = {
         'results': [
             {
-                'name': coord.name,
-                'type': coord.type,
-                'ra': coord.longitude,  # Using longitude as RA (0-360 degrees)
-                'dec': coord.latitude,  # Using latitude as Dec (-90 to +90 degrees)
-                'body': coord.body,
-                'description': coord.description
+                'name': match['name'],
+                'type': match['type'],
+                'ra': match['ra'],
+                'dec': match['dec'],
+                'body': match['body'],
+                'description': match['description']
             }
-            for coord in coordinates
+            for match in matches
         ]
     }
     
     return JsonResponse(data)
 
 
+@require_http_methods(["GET"])
+def api_coordinates_cone(request):
+    """API endpoint for objects within radius degrees of an RA/Dec position"""
+    try:
+        ra = float(request.GET['ra'])
+        dec = float(request.GET['dec'])
+        radius = float(request.GET.get('radius', 1.0))
+        limit = min(max(int(request.GET.get('limit', 100)), 1), 1000)
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'ra and dec are required and must be numbers'}, status=400)
+    
+    if not -90 <= dec <= 90 or not 0 < radius <= MAX_RADIUS:
+        return JsonResponse({'error': f'dec must be within ±90 and radius within (0, {MAX_RADIUS}]'}, status=400)
+    
+    started = time.perf_counter()
+    hits = cone_search(ra, dec, radius, limit)
+    coords = CelestialCoordinate.objects.in_bulk([coord_id for coord_id, _ in hits])
+    
+    return JsonResponse({
+        'ra': ra % 360,
+        'dec': dec,
+        'radius': radius,
+        'results': [
+            {
+                'id': coord_id,
+                'name': coords[coord_id].name,
+                'type': coords[coord_id].type,
+                'ra': coords[coord_id].longitude,
+                'dec': coords[coord_id].latitude,
+                'body': coords[coord_id].body,
+                'separation': round(separation, 6)
+            }
+            for coord_id, separation in hits
+            if coord_id in coords
+        ],
+        'took_ms': round((time.perf_counter() - started) * 1000, 2)
+    })
+
+
+@require_http_methods(["GET"])
+def api_sky_clusters(request):
+    """
+    API endpoint for the sky map at one zoom level.
+    
+    Crowded cells come back as clusters (count and centroid), sparse ones as
+    their individual objects. An optional ra_min/ra_max/dec_min/dec_max view
+    limits the cells; ra_min > ra_max wraps through RA 0.
+    """
+    try:
+        level = int(request.GET.get('zoom', 0))
+        view = [
+            float(request.GET[key]) if key in request.GET else None
+            for key in ('ra_min', 'ra_max', 'dec_min', 'dec_max')
+        ]
+    except ValueError:
+        return JsonResponse({'error': 'zoom must be an integer and the view bounds numbers'}, status=400)
+    
+    level = min(max(level, 0), MAX_LEVEL)
+    clusters = []
+    objects = []
+    for cell in cells_in_view(level, *view).values('count', 'ra', 'dec', 'members'):
+        if cell['count'] > SPARSE_LIMIT:
+            clusters.append({'ra': round(cell['ra'], 4), 'dec': round(cell['dec'], 4), 'count': cell['count']})
+        else:
+            objects.extend(cell['members'])
+    
+    response = JsonResponse({
+        'zoom': level,
+        'max_zoom': MAX_LEVEL,
+        'clusters': clusters,
+        'objects': objects,
+    })
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+SKY_TRANSFORM_MAX_POINTS = 10000
+
+
+def _observer(params):
+    """Observer latitude/longitude in degrees from request parameters"""
+    latitude = float(params['lat'])
+    longitude = float(params['lon'])
+    if not -90 <= latitude <= 90 or not -180 <= longitude <= 360:
+        raise ValueError('lat must be within ±90 and lon within -180..360')
+    return latitude, longitude
+
+
+@require_http_methods(["GET"])
+def api_sky_visibility(request):
+    """
+    API endpoint for rise/transit/set of the whole catalog for one observer and night.
+    
+    Columns are parallel arrays indexed like 'ids'; times are unix seconds
+    and null for objects that never rise or never set.
+    """
+    from django.utils.dateparse import parse_date
+    try:
+        latitude, longitude = _observer(request.GET)
+        night = parse_date(request.GET.get('date', '')) or timezone.localdate()
+    except (KeyError, ValueError) as e:
+        return JsonResponse({'error': f'lat and lon are required: {e}'}, status=400)
+    
+    response = JsonResponse(catalog_visibility(latitude, longitude, night))
+    response['Cache-Control'] = 'public, max-age=3600'
+    return response
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_sky_transform(request):
+    """
+    API endpoint converting a batch of positions between frames.
+    
+    Body: {"ids": [...]} or {"ra": [...], "dec": [...]} or {"l": [...], "b": [...]},
+    plus "frame" (equatorial, galactic or altaz). altaz also needs "lat",
+    "lon" and an ISO "time" (default now).
+    """
+    try:
+        data = json.loads(request.body)
+        frame = data.get('frame', 'galactic')
+        ids = None
+        if 'ids' in data:
+            ids = [int(coord_id) for coord_id in data['ids']][:SKY_TRANSFORM_MAX_POINTS]
+            rows = {
+                coord_id: (ra, dec)
+                for coord_id, ra, dec in CelestialCoordinate.objects.filter(
+                    id__in=ids
+                ).values_list('id', 'longitude', 'latitude')
+            }
+            ids = [coord_id for coord_id in ids if coord_id in rows]
+            ra = [rows[coord_id][0] for coord_id in ids]
+            dec = [rows[coord_id][1] for coord_id in ids]
+        elif 'l' in data:
+            ra, dec = galactic_to_equatorial(
+                [float(v) for v in data['l'][:SKY_TRANSFORM_MAX_POINTS]],
+                [float(v) for v in data['b'][:SKY_TRANSFORM_MAX_POINTS]]
+            )
+        else:
+            ra = [float(v) for v in data['ra'][:SKY_TRANSFORM_MAX_POINTS]]
+            dec = [float(v) for v in data['dec'][:SKY_TRANSFORM_MAX_POINTS]]
+        if len(ra) != len(dec):
+            raise ValueError('coordinate arrays differ in length')
+        
+        observer = {}
+        if frame == 'altaz':
+            latitude, longitude = _observer(data)
+            when = datetime.fromisoformat(data['time']) if data.get('time') else timezone.now()
+            if timezone.is_naive(when):
+                when = when.replace(tzinfo=dt_timezone.utc)
+            observer = {'latitude': latitude, 'longitude': longitude, 'unix_seconds': when.timestamp()}
+        
+        columns = transform(ra, dec, frame, **observer)
+    except (KeyError, TypeError, ValueError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    result = {'frame': frame, 'count': len(ra)}
+    if ids is not None:
+        result['ids'] = ids
+    result.update({name: [round(float(v), 6) for v in values] for name, values in columns.items()})
+    return JsonResponse(result)
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def terminal_populate_coordinates(request):
@@ -240,24 +700,41 @@ def terminal_populate_coordinates(request):
             {"name": "Mare Serenitatis", "type": "mare", "ra": 17.5, "dec": 28.0, "body": "Moon"},
         ]
         
-        created_count = 0
-        updated_count = 0
+        # Keyed on name as before, so objects stored under another body by
+        # populate_coordinates are updated rather than duplicated
+        bodies = {coord_data['name']: coord_data['body'] for coord_data in coordinates_data}
+        existing = {}
+        for coord in CelestialCoordinate.objects.filter(name__in=list(bodies)):
+            if coord.name not in existing or coord.body == bodies[coord.name]:
+                existing[coord.name] = coord
         
+        created, updated = [], []
         for coord_data in coordinates_data:
-            coord, created = CelestialCoordinate.objects.update_or_create(
-                name=coord_data['name'],
-                defaults={
-                    'type': coord_data['type'],
-                    'longitude': coord_data['ra'],      # Store RA in longitude field
-                    'latitude': coord_data['dec'],      # Store Dec in latitude field
-                    'body': coord_data['body'],
-                    'description': f"{coord_data['type'].title()} - RA: {coord_data['ra']}°, Dec: {coord_data['dec']}°"
-                }
+            fields = {
+                'type': coord_data['type'],
+                'longitude': coord_data['ra'],      # Store RA in longitude field
+                'latitude': coord_data['dec'],      # Store Dec in latitude field
+                'body': coord_data['body'],
+                'description': f"{coord_data['type'].title()} - RA: {coord_data['ra']}°, Dec: {coord_data['dec']}°"
+            }
+            coord = existing.get(coord_data['name'])
+            if coord is None:
+                created.append(CelestialCoordinate(name=coord_data['name'], **fields))
+                continue
+            for field, value in fields.items():
+                setattr(coord, field, value)
+            updated.append(coord)
+        
+        # Two batched writes instead of an update_or_create per object
+        with transaction.atomic():
+            CelestialCoordinate.objects.bulk_create(created)
+            CelestialCoordinate.objects.bulk_update(
+                updated, ['type', 'longitude', 'latitude', 'body', 'description']
             )
-            if created:
-                created_count += 1
-            else:
-                updated_count += 1
+        refresh_coordinate_indexes()
+        
+        created_count = len(created)
+        updated_count = len(updated)
         
         return JsonResponse({
             'success': True,
@@ -279,24 +756,33 @@ def terminal_populate_coordinates(request):
 def terminal_status(request):
     """Terminal API endpoint to get status - UPDATED"""
     try:
-        total_images = APODImage.objects.count()
-        latest = APODImage.objects.order_by('-date').first()
-        oldest = APODImage.objects.order_by('date').first()
+        def build():
+            total_images = APODImage.objects.count()
+            latest = APODImage.objects.order_by('-date').first()
+            oldest = APODImage.objects.order_by('date').first()
+            
+            return {
+                'success': True,
+                'total_images': total_images,
+                'latest_date': latest.date.strftime('%Y-%m-%d') if latest else None,
+                'oldest_date': oldest.date.strftime('%Y-%m-%d') if oldest else None,
+                'total_coordinates': CelestialCoordinate.objects.count(),
+                'total_logs': SystemLog.objects.count()
+            }, 200
         
-        return JsonResponse({
-            'success': True,
-            'total_images': total_images,
-            'latest_date': latest.date.strftime('%Y-%m-%d') if latest else None,
-            'oldest_date': oldest.date.strftime('%Y-%m-%d') if oldest else None,
-            'total_coordinates': CelestialCoordinate.objects.count(),
-            'total_logs': SystemLog.objects.count()
-        })
+        data, status = cached_payload(STATUS_KEY, build, timeout=STATUS_TIMEOUT)
+        return JsonResponse(data, status=status)
     except Exception as e:
         return JsonResponse({
             'success': False,
             'error': str(e)
         })
 
+@require_http_methods(["GET"])
+def api_cache_stats(request):
+    """API endpoint for response cache hit/miss counters"""
+    return JsonResponse(cache_stats())
+
 @require_http_methods(["GET"])
 def api_logs(request):
     """API endpoint for recent system logs"""
@@ -336,23 +822,15 @@ def terminal_fetch(request):
                     'error': 'Invalid date format. Use YYYY-MM-DD'
                 })
         
-        print(f"Fetching APOD for date: {date}")
-        apod = fetch_and_save_apod(date)
+        print(f"Queueing APOD fetch for date: {date}")
+        job_ids = submit_range('fetch', date, date)
         
-        if apod:
-            print(f"Successfully fetched: {apod.title}")
-            return JsonResponse({
-                'success': True,
-                'message': 'Successfully fetched APOD',
-                'title': apod.title,
-                'date': apod.date.strftime('%Y-%m-%d')
-            })
-        else:
-            print("Failed to fetch APOD")
-            return JsonResponse({
-                'success': False,
-                'error': 'Failed to fetch APOD. Date might be in the future or API error.'
-            })
+        return JsonResponse({
+            'success': True,
+            'message': 'Fetch queued',
+            'job_ids': job_ids,
+            'date': date.strftime('%Y-%m-%d')
+        })
     except Exception as e:
         print(f"Error in terminal_fetch: {str(e)}")
         import traceback
@@ -370,33 +848,16 @@ def terminal_backfill(request):
         data = json.loads(request.body)
         days = int(data.get('days', 7))
         
-        today = timezone.now().date()
-        results = []
-        success_count = 0
-        
-        for i in range(days):
-            date = today - timedelta(days=i+1)
-            apod = fetch_and_save_apod(date)
-            
-            if apod:
-                success_count += 1
-                results.append({
-                    'success': True,
-                    'date': date.strftime('%Y-%m-%d'),
-                    'title': apod.title
-                })
-            else:
-                results.append({
-                    'success': False,
-                    'date': date.strftime('%Y-%m-%d'),
-                    'error': 'Failed to fetch'
-                })
+        end_date = timezone.now().date() - timedelta(days=1)
+        start_date = end_date - timedelta(days=days - 1)
+        job_ids = submit_range('backfill', start_date, end_date)
         
         return JsonResponse({
             'success': True,
-            'count': success_count,
-            'total': days,
-            'results': results
+            'job_ids': job_ids,
+            'start_date': start_date.strftime('%Y-%m-%d'),
+            'end_date': end_date.strftime('%Y-%m-%d'),
+            'total': days
         })
     except Exception as e:
         return JsonResponse({
@@ -405,13 +866,37 @@ def terminal_backfill(request):
         })
 
 
+@require_http_methods(["GET"])
+def terminal_job_status(request, job_id):
+    """Terminal API endpoint for background job progress"""
+    job = get_object_or_404(TerminalJob, id=job_id)
+    
+    data = job_summary(job)
+    data['results'] = job.results
+    
+    return JsonResponse(data)
+
+
+@require_http_methods(["GET"])
+def terminal_job_stream(request, job_id):
+    """Server-Sent Events of per-date results for a background job since Last-Event-ID"""
+    try:
+        last_index = int(request.headers.get('Last-Event-ID', 0))
+    except ValueError:
+        last_index = 0
+    
+    response = HttpResponse(job_events(job_id, last_index), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 
 def fetch_and_save_apod(date):
     """Fetch APOD from NASA API and save to database"""
     try:
         url = settings.NASA_APOD_URL
         params = {
-            'api_key': settings.NASA_API_KEY,
             'date': date.strftime('%Y-%m-%d'),
             'thumbs': True
         }
@@ -419,12 +904,13 @@ def fetch_and_save_apod(date):
         print(f"Fetching APOD from: {url}")
         print(f"With params: {params}")
         
-        response = requests.get(url, params=params, timeout=10)
+        response = get_client().get(url, params=params, timeout=10)
         response.raise_for_status()
         data = response.json()
         
         print(f"API Response: {data.get('title', 'No title')}")
         
+        previous = APODImage.objects.filter(date=date).values('url', 'blurhash').first()
         apod, created = APODImage.objects.update_or_create(
             date=date,
             defaults={
@@ -438,7 +924,11 @@ def fetch_and_save_apod(date):
             }
         )
         
-        SystemLog.objects.create(
+        # Placeholders only change with the picture
+        if previous is None or not previous['blurhash'] or previous['url'] != apod.url:
+            queue_placeholders([apod.id])
+        
+        log_event(
             level='success',
             message=f'Successfully fetched APOD for {date}',
             details={'title': data.get('title')}
@@ -449,7 +939,7 @@ def fetch_and_save_apod(date):
         
     except requests.exceptions.RequestException as e:
         print(f"Request error: {str(e)}")
-        SystemLog.objects.create(
+        log_event(
             level='error',
             message=f'Failed to fetch APOD for {date}',
             details={'error': str(e)}
@@ -459,7 +949,7 @@ def fetch_and_save_apod(date):
         print(f"General error: {str(e)}")
         import traceback
         traceback.print_exc()
-        SystemLog.objects.create(
+        log_event(
             level='error',
             message=f'Error processing APOD data',
             details={'error': str(e)}
@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'emiigen.settings')
 
 application = get_asgi_application()
+
+# Build the coordinate indexes before the first request needs them
+from apod import autocomplete, cone_search  # noqa: E402
+
+autocomplete.warm_index()
+cone_search.warm_index()
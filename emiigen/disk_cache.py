@@ -0,0 +1,241 @@
+# emiigen/disk_cache.py
+"""
+Size-bounded, content-addressed file cache shared by every worker process.
+
+Entries live at <root>/<aa>/<sha256>.<ext>, named by a hash of everything
+that determines their bytes, so nothing is ever invalidated: changed inputs
+give a new name and the old file ages out. Files are written to a temporary
+name and renamed into place, so readers never see a partial file.
+
+fill() is single-flight. Within a process, followers wait on the leader's
+Event; across processes, on a lock held in the shared Django cache. A burst
+of identical misses therefore produces the file once. The total size is
+counted in the shared cache and, past max_bytes, the least recently used
+files (by mtime, refreshed on hits) are deleted down to LOW_WATER. With a
+max_age, files unused for that long are also swept, at most once per
+SWEEP_SECONDS.
+"""
+import hashlib
+import os
+import threading
+import time
+import uuid
+
+from django.core.cache import cache
+
+LOW_WATER = 0.9
+TOUCH_SECONDS = 600
+LOCK_TIMEOUT = 60
+POLL_SECONDS = 0.05
+EVICT_LOCK_TIMEOUT = 300
+SWEEP_SECONDS = 3600
+TEMP_SUFFIX = '.tmp'
+
+
+class _Flight:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+
+
+class DiskCache:
+
+    def __init__(self, name, root, max_bytes, max_age=None):
+        self.name = name
+        self.root = str(root)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.size_key = f'diskcache:{name}:bytes'
+        self.evict_key = f'diskcache:{name}:evicting'
+        self.sweep_key = f'diskcache:{name}:swept'
+        self.flights = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(*parts):
+        """Content address for the inputs that determine an entry"""
+        return hashlib.sha256('\x1f'.join(str(part) for part in parts).encode()).hexdigest()
+
+    def path(self, key, ext):
+        return os.path.join(self.root, key[:2], f'{key}.{ext}')
+
+    def get(self, key, ext):
+        """Path of a cached entry or None; hits refresh the entry's LRU time"""
+        path = self.path(key, ext)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+        if time.time() - mtime > TOUCH_SECONDS:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                return None
+        return path
+
+    def fill(self, key, ext, produce):
+        """
+        Return (path, hit), calling produce(temp_path) to write the entry on a miss.
+
+        Errors raised by produce reach the leader and every waiting follower.
+        """
+        path = self.get(key, ext)
+        if path:
+            return path, True
+
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait(LOCK_TIMEOUT)
+            if flight.error is not None:
+                raise flight.error
+            path = self.get(key, ext)
+            if path:
+                return path, True
+
+        try:
+            return self._fill_shared(key, ext, produce)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            if leader:
+                with self.lock:
+                    self.flights.pop(key, None)
+                flight.done.set()
+
+    def open(self, key, ext, produce):
+        """(file, hit) for an entry; the open handle survives a concurrent eviction"""
+        for _ in range(3):
+            path, hit = self.fill(key, ext, produce)
+            try:
+                return open(path, 'rb'), hit
+            except FileNotFoundError:
+                continue
+        raise FileNotFoundError(self.path(key, ext))
+
+    def discard(self, key, ext):
+        """Delete an entry that has moved elsewhere"""
+        path = self.path(key, ext)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        try:
+            cache.decr(self.size_key, size)
+        except ValueError:
+            pass
+
+    def _fill_shared(self, key, ext, produce):
+        """Produce the entry under a lock every worker process honours"""
+        lock_key = f'diskcache:{self.name}:lock:{key}'
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while True:
+            if cache.add(lock_key, 1, LOCK_TIMEOUT):
+                try:
+                    path = self.get(key, ext)
+                    if path:
+                        return path, True
+                    return self._write(key, ext, produce), False
+                finally:
+                    cache.delete(lock_key)
+
+            # Another process is producing it: wait for the file or for the lock to go
+            while time.monotonic() < deadline and cache.get(lock_key) is not None:
+                time.sleep(POLL_SECONDS)
+                path = self.get(key, ext)
+                if path:
+                    return path, True
+            if time.monotonic() >= deadline:
+                # A stuck or dead holder: produce it ourselves rather than fail the request
+                return self._write(key, ext, produce), False
+
+    def _write(self, key, ext, produce):
+        path = self.path(key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = f'{path}.{uuid.uuid4().hex}{TEMP_SUFFIX}'
+        try:
+            produce(temp)
+            size = os.path.getsize(temp)
+            os.replace(temp, path)
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+        self._account(size)
+        return path
+
+    def _account(self, size):
+        try:
+            total = cache.incr(self.size_key, size)
+        except ValueError:
+            # Unknown after a cache flush or first use: rescan
+            total = None
+        if total is None or total > self.max_bytes or self._sweep_due():
+            self.evict()
+
+    def _sweep_due(self):
+        return self.max_age is not None and cache.add(self.sweep_key, 1, SWEEP_SECONDS)
+
+    def evict(self):
+        """
+        Rescan the cache, delete files unused for max_age, then least recently
+        used files down to LOW_WATER; returns files deleted
+        """
+        if not cache.add(self.evict_key, 1, EVICT_LOCK_TIMEOUT):
+            return 0
+        try:
+            entries = []
+            now = time.time()
+            for directory, _, files in os.walk(self.root):
+                for name in files:
+                    path = os.path.join(directory, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    if name.endswith(TEMP_SUFFIX):
+                        # Left behind by a killed writer
+                        if now - stat.st_mtime > LOCK_TIMEOUT:
+                            os.remove(path)
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+            deleted = 0
+            if self.max_age is not None:
+                kept = []
+                for entry in entries:
+                    if now - entry[0] > self.max_age:
+                        try:
+                            os.remove(entry[2])
+                        except FileNotFoundError:
+                            pass
+                        deleted += 1
+                    else:
+                        kept.append(entry)
+                entries = kept
+
+            total = sum(entry[1] for entry in entries)
+            if total > self.max_bytes:
+                target = self.max_bytes * LOW_WATER
+                for _, size, path in sorted(entries):
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+                    deleted += 1
+            cache.set(self.size_key, total, None)
+            return deleted
+        finally:
+            cache.delete(self.evict_key)
+
+    def stats(self):
+        return {'bytes': cache.get(self.size_key), 'max_bytes': self.max_bytes}
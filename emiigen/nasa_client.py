@@ -0,0 +1,221 @@
+# emiigen/nasa_client.py
+"""
+Shared HTTP client for NASA APIs.
+
+Every call to api.nasa.gov goes through one pooled keep-alive session. Each
+API key gets a token bucket sized to its hourly quota which is re-synced from
+the X-RateLimit-Remaining / X-RateLimit-Limit response headers, so parallel
+fetches never run past the quota. Retries after a 5xx or connection error
+never wait for quota: one is only sent when the key has tokens to spare
+beyond RETRY_RESERVE of its capacity, which stays for first attempts.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+# Share of each key's hourly quota that retries may never dip into
+RETRY_RESERVE = 0.1
+
+
+class QuotaExhausted(requests.exceptions.RequestException):
+    """Raised when no API key has quota left within the allowed wait"""
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously over period seconds (an hour by default)"""
+
+    def __init__(self, capacity, period=3600.0):
+        self.capacity = capacity
+        self.period = period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / self.period)
+        self.updated = now
+
+    def try_acquire(self):
+        """Take a token if one is available, otherwise return seconds until the next one"""
+        with self.lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) * self.period / self.capacity
+
+    def try_acquire_spare(self, reserve):
+        """Take a token only if more than reserve tokens would remain; never waits"""
+        with self.lock:
+            self._refill()
+            if self.tokens - 1 >= reserve:
+                self.tokens -= 1
+                return True
+            return False
+
+    def available(self):
+        with self.lock:
+            self._refill()
+            return self.tokens
+
+    def sync(self, remaining, limit=None):
+        """Align the bucket with the quota reported by the server"""
+        with self.lock:
+            if limit:
+                self.capacity = limit
+            self._refill()
+            self.tokens = float(min(self.capacity, max(remaining, 0)))
+
+
+class NASAClient:
+    """Pooled, quota-aware client for NASA APIs"""
+
+    RETRY_STATUSES = (500, 502, 503, 504)
+
+    def __init__(self, api_keys=None, hourly_limit=1000, max_workers=4, retries=2, max_wait=30):
+        self.api_keys = [key for key in (api_keys or []) if key] or ['DEMO_KEY']
+        self.buckets = {key: TokenBucket(hourly_limit) for key in self.api_keys}
+        self.max_workers = max_workers
+        self.retries = retries
+        self.max_wait = max_wait
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers * 2)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.in_flight = threading.BoundedSemaphore(max_workers)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='nasa-fetch')
+
+    def acquire_key(self, exclude=()):
+        """Pick the key with the most quota left, waiting up to max_wait for a token"""
+        deadline = time.monotonic() + self.max_wait
+        keys = [key for key in self.api_keys if key not in exclude]
+
+        while keys:
+            waits = []
+            for key in sorted(keys, key=lambda k: self.buckets[k].available(), reverse=True):
+                wait = self.buckets[key].try_acquire()
+                if wait == 0:
+                    return key
+                waits.append(wait)
+
+            sleep_for = min(waits)
+            if time.monotonic() + sleep_for > deadline:
+                break
+            time.sleep(sleep_for)
+
+        raise QuotaExhausted('NASA API hourly quota exhausted for all configured keys')
+
+    def record_limits(self, key, response):
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        limit = response.headers.get('X-RateLimit-Limit')
+        try:
+            if remaining is not None:
+                self.buckets[key].sync(int(remaining), int(limit) if limit else None)
+        except ValueError:
+            pass
+
+    def can_retry(self, key, attempt):
+        """Whether another attempt is allowed, paying for it from spare quota"""
+        if attempt >= self.retries:
+            return False
+        if key is None:
+            return True
+        bucket = self.buckets[key]
+        return bucket.try_acquire_spare(bucket.capacity * RETRY_RESERVE)
+
+    def get(self, url, params=None, timeout=10, use_api_key=True):
+        """
+        GET through the shared session.
+
+        Requests with use_api_key wait for a token for their first attempt
+        and rotate to another key when one answers 429. Retries after a 5xx
+        or connection error are skipped, returning the failure, once the
+        key's quota is down to its reserve.
+        """
+        params = dict(params or {})
+        exhausted = set()
+        attempt = 0
+        key = None
+
+        while True:
+            if use_api_key and key is None:
+                key = self.acquire_key(exclude=exhausted)
+                params['api_key'] = key
+
+            try:
+                with self.in_flight:
+                    response = self.session.get(url, params=params, timeout=timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if not self.can_retry(key, attempt):
+                    raise
+                attempt += 1
+                time.sleep(2 ** attempt * 0.5)
+                continue
+
+            if key:
+                self.record_limits(key, response)
+
+            if response.status_code == 429 and key:
+                self.buckets[key].sync(0)
+                exhausted.add(key)
+                if len(exhausted) < len(self.api_keys):
+                    key = None
+                    continue
+                return response
+
+            if response.status_code in self.RETRY_STATUSES and self.can_retry(key, attempt):
+                attempt += 1
+                time.sleep(2 ** attempt * 0.5)
+                continue
+
+            return response
+
+    def map(self, fn, items):
+        """
+        Run fn over items on the bounded worker pool, preserving order.
+
+        Only a window of max_workers * 2 items is submitted ahead of the
+        result being consumed, so a caller that stops early and closes the
+        iterator cancels the calls not yet started instead of spending quota
+        on them.
+        """
+        items = iter(items)
+        pending = deque(self.executor.submit(fn, item) for item in islice(items, self.max_workers * 2))
+        try:
+            while pending:
+                result = pending.popleft().result()
+                for item in islice(items, 1):
+                    pending.append(self.executor.submit(fn, item))
+                yield result
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide NASA client, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = NASAClient(
+                    api_keys=getattr(settings, 'NASA_API_KEYS', None) or [settings.NASA_API_KEY],
+                    hourly_limit=getattr(settings, 'NASA_API_HOURLY_LIMIT', 1000),
+                    max_workers=getattr(settings, 'NASA_API_MAX_WORKERS', 4),
+                    retries=getattr(settings, 'NASA_API_RETRIES', 2),
+                    max_wait=getattr(settings, 'NASA_API_MAX_WAIT', 30),
+                )
+    return _client
@@ -125,6 +125,25 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Local APOD image mirror (apod/image_mirror.py)
+APOD_MIRROR_WIDTHS = (320, 640, 1024, 1600)
+APOD_MIRROR_FORMATS = ('webp', 'jpeg')
+APOD_MIRROR_MAX_BYTES = int(os.getenv('APOD_MIRROR_MAX_BYTES', 5 * 1024 ** 3))
+APOD_MIRROR_WORKERS = int(os.getenv('APOD_MIRROR_WORKERS', 2))
+
+# On-demand image resize proxy (apod/image_proxy.py)
+IMAGE_PROXY_ROOT = BASE_DIR / '.cache' / 'images'
+IMAGE_PROXY_MAX_BYTES = int(os.getenv('IMAGE_PROXY_MAX_BYTES', 1024 ** 3))
+
+# Caching GIBS tile proxy (gibs/tiles.py)
+GIBS_TILE_ROOT = BASE_DIR / '.cache' / 'gibs-tiles'
+GIBS_TILE_MAX_BYTES = int(os.getenv('GIBS_TILE_MAX_BYTES', 2 * 1024 ** 3))
+GIBS_TILE_MAX_AGE = int(os.getenv('GIBS_TILE_MAX_AGE', 30 * 86400))
+# 'packed' keeps tiles of settled dates in one SQLite file per layer and date; 'files' keeps every tile as a file
+GIBS_TILE_STORE = os.getenv('GIBS_TILE_STORE', 'packed')
+GIBS_TILE_PACK_ROOT = BASE_DIR / '.cache' / 'gibs-packs'
+GIBS_TILE_PACK_MAX_BYTES = int(os.getenv('GIBS_TILE_PACK_MAX_BYTES', 10 * 1024 ** 3))
+
 from dotenv import load_dotenv
 
 # Load .env file
@@ -134,6 +153,35 @@ load_dotenv()
 NASA_API_KEY = os.getenv('NASA_API_KEY')
 NASA_APOD_URL = 'https://api.nasa.gov/planetary/apod'
 
+# Shared NASA API client (emiigen/nasa_client.py)
+# NASA_API_KEYS is an optional comma separated pool of keys to rotate across
+NASA_API_KEYS = [key.strip() for key in os.getenv('NASA_API_KEYS', '').split(',') if key.strip()] or [NASA_API_KEY]
+NASA_API_HOURLY_LIMIT = int(os.getenv('NASA_API_HOURLY_LIMIT', 1000))
+NASA_API_MAX_WORKERS = int(os.getenv('NASA_API_MAX_WORKERS', 4))
+NASA_API_RETRIES = 2
+NASA_API_MAX_WAIT = 30  # seconds to wait for quota before giving up
+
+# Buffered SystemLog writer (apod/logsink.py)
+SYSTEM_LOG_BATCH_SIZE = 50
+SYSTEM_LOG_FLUSH_INTERVAL = 2.0  # seconds
+
+# Shared cache backend: Redis when REDIS_CACHE_URL is set, otherwise a
+# file-based cache that every worker process on this host shares
+if os.getenv('REDIS_CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_CACHE_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / '.cache' / 'django',
+        }
+    }
+
 # Celery Configuration for scheduled tasks
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
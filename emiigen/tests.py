@@ -0,0 +1,153 @@
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+
+import requests
+from django.test import SimpleTestCase, override_settings
+
+from .disk_cache import DiskCache
+from .nasa_client import RETRY_RESERVE, NASAClient, TokenBucket
+
+
+def response(status, remaining=None):
+    result = requests.Response()
+    result.status_code = status
+    if remaining is not None:
+        result.headers['X-RateLimit-Remaining'] = str(remaining)
+    return result
+
+
+@mock.patch('emiigen.nasa_client.time.sleep')
+class NASAClientRetryTests(SimpleTestCase):
+
+    def make_client(self, responses, hourly_limit=100, retries=2):
+        client = NASAClient(api_keys=['key'], hourly_limit=hourly_limit, retries=retries)
+        client.session.get = mock.Mock(side_effect=responses)
+        return client
+
+    def test_retries_server_errors_with_spare_quota(self, sleep):
+        client = self.make_client([response(503), response(503), response(200)])
+        self.assertEqual(client.get('https://api.nasa.gov/x').status_code, 200)
+        self.assertEqual(client.session.get.call_count, 3)
+
+    def test_retries_stop_at_the_reserve(self, sleep):
+        client = self.make_client([response(503), response(503), response(200)])
+        bucket = client.buckets['key']
+        # One token for the first attempt and nothing to spare beyond the reserve
+        bucket.sync(bucket.capacity * RETRY_RESERVE + 1)
+        self.assertEqual(client.get('https://api.nasa.gov/x').status_code, 503)
+        self.assertEqual(client.session.get.call_count, 1)
+
+    def test_reported_remaining_quota_limits_retries(self, sleep):
+        client = self.make_client([response(500, remaining=5), response(200)])
+        self.assertEqual(client.get('https://api.nasa.gov/x').status_code, 500)
+        self.assertEqual(client.session.get.call_count, 1)
+
+    def test_connection_errors_are_not_retried_on_the_reserve(self, sleep):
+        client = self.make_client([requests.exceptions.ConnectionError(), response(200)])
+        bucket = client.buckets['key']
+        bucket.sync(bucket.capacity * RETRY_RESERVE + 1)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            client.get('https://api.nasa.gov/x')
+
+    def test_retries_keep_the_key_and_rotate_on_429(self, sleep):
+        client = NASAClient(api_keys=['a', 'b'], hourly_limit=100)
+        responses = iter([response(429), response(503), response(200)])
+        keys = []
+
+        def get(url, params, timeout):
+            keys.append(params['api_key'])
+            return next(responses)
+
+        client.session.get = get
+        self.assertEqual(client.get('https://api.nasa.gov/x').status_code, 200)
+        self.assertEqual(keys, ['a', 'b', 'b'])
+
+
+class TokenBucketTests(SimpleTestCase):
+
+    def test_spare_tokens_leave_the_reserve(self):
+        bucket = TokenBucket(10)
+        bucket.sync(3)
+        self.assertTrue(bucket.try_acquire_spare(1))
+        self.assertTrue(bucket.try_acquire_spare(1))
+        self.assertFalse(bucket.try_acquire_spare(1))
+        self.assertEqual(bucket.try_acquire(), 0.0)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'emiigen-tests'}})
+class DiskCacheSingleFlightTests(SimpleTestCase):
+
+    THREADS = 8
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        self.disk_cache = DiskCache('tests', self.root.name, 1024 ** 2)
+
+    def fill_concurrently(self, produce):
+        key = DiskCache.key('single-flight')
+        barrier = threading.Barrier(self.THREADS)
+        results, errors = [], []
+
+        def worker():
+            barrier.wait()
+            try:
+                results.append(self.disk_cache.fill(key, 'bin', produce))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_concurrent_misses_produce_once(self):
+        calls = []
+
+        def produce(path):
+            calls.append(path)
+            time.sleep(0.3)
+            with open(path, 'wb') as f:
+                f.write(b'tile')
+
+        results, errors = self.fill_concurrently(produce)
+        self.assertEqual(errors, [])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len({path for path, _ in results}), 1)
+        self.assertEqual(sorted(hit for _, hit in results), [False] + [True] * (self.THREADS - 1))
+        with open(results[0][0], 'rb') as f:
+            self.assertEqual(f.read(), b'tile')
+
+    def test_errors_reach_every_caller(self):
+        calls = []
+
+        def produce(path):
+            calls.append(path)
+            time.sleep(0.3)
+            raise OSError('upstream failed')
+
+        results, errors = self.fill_concurrently(produce)
+        self.assertEqual(results, [])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(errors), self.THREADS)
+        self.assertTrue(all(str(e) == 'upstream failed' for e in errors))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        disk_cache = DiskCache('evict', self.root.name, 1000)
+        paths = []
+        for i in range(4):
+            def produce(path):
+                with open(path, 'wb') as f:
+                    f.write(bytes(300))
+            path, _ = disk_cache.fill(DiskCache.key('entry', i), 'bin', produce)
+            paths.append(path)
+            if i < 3:
+                os.utime(path, (1000 + i, 1000 + i))
+        self.assertEqual([os.path.exists(path) for path in paths], [False, True, True, True])
+        self.assertEqual(disk_cache.stats()['bytes'], 900)
@@ -7,4 +7,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('apod.urls')),
     path('', include('gibs.urls')),
-]
\ No newline at end of file
+]
+
+# Mirrored APOD images; served by the web server in production
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
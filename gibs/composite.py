@@ -0,0 +1,137 @@
+# gibs/composite.py
+"""
+Several GIBS layers blended into one tile on the server.
+
+A stack is the explorer's layer list, bottom first, with per-layer opacity
+in the shape UserLayerConfig stores it (active_layers / layer_opacity).
+Each layer's tile comes through the tile proxy, so it is cached and fetched
+once as usual. The tiles are blended with the Porter-Duff "over" operator
+on premultiplied float arrays and the result is cached under the names of
+its layer tiles and opacities, so a view with four layers costs the browser
+one request per grid cell instead of four.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from emiigen.disk_cache import DiskCache
+
+from .tiles import TileNotFound, layer_format, open_tile, resolve_tile, tile_cache
+
+MAX_LAYERS = 8
+SAVE_OPTIONS = {
+    'jpg': {'format': 'JPEG', 'quality': 85},
+    'png': {'format': 'PNG', 'compress_level': 6},
+}
+
+_fetch_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='composite')
+
+
+def layer_stack(active_layers, layer_opacity=None):
+    """
+    [(layer, opacity)] bottom first from a layer list and {layer: opacity}
+    mapping. Opacity defaults to 1; invisible and repeated layers are dropped.
+    """
+    layer_opacity = layer_opacity or {}
+    stack = []
+    seen = set()
+    for layer in active_layers:
+        if not layer or layer in seen:
+            continue
+        seen.add(layer)
+        try:
+            opacity = float(layer_opacity.get(layer, 1.0))
+        except (TypeError, ValueError):
+            raise ValueError(f'Opacity of {layer} must be a number')
+        opacity = round(min(max(opacity, 0.0), 1.0), 2)
+        if opacity > 0:
+            stack.append((layer, opacity))
+    if not stack:
+        raise ValueError('At least one visible layer is required')
+    if len(stack) > MAX_LAYERS:
+        raise ValueError(f'At most {MAX_LAYERS} layers can be composited')
+    return stack
+
+
+def parse_stack(layers_param, opacity_param):
+    """layer_stack() from ?layers=A,B,C and ?opacity=B:0.5,C:0.8"""
+    layer_opacity = {}
+    for pair in filter(None, (opacity_param or '').split(',')):
+        layer, _, opacity = pair.rpartition(':')
+        layer_opacity[layer] = opacity
+    return layer_stack((layers_param or '').split(','), layer_opacity)
+
+
+def resolve_composite(stack, date_str, matrix_set, z, y, x, fmt):
+    """
+    {'layers', 'key', 'etag', 'format', 'max_age'} for a composite tile.
+    Raises ValueError and TileNotFound like resolve_tile.
+    """
+    if fmt not in SAVE_OPTIONS:
+        raise ValueError(f"Format must be one of {', '.join(SAVE_OPTIONS)}")
+    layers = [(resolve_tile(layer, date_str, matrix_set, z, y, x, layer_format(layer)), opacity)
+              for layer, opacity in stack]
+    # Layer tile names already change with recent imagery, so the composite follows them
+    key = DiskCache.key('composite', fmt, *(f"{tile['key']}@{opacity}" for tile, opacity in layers))
+    return {
+        'layers': layers,
+        'key': key,
+        'etag': f'"{key[:32]}"',
+        'format': fmt,
+        'max_age': min(tile['max_age'] for tile, _ in layers),
+    }
+
+
+def _load(tile):
+    """RGBA float array of one layer tile, or None where GIBS has no tile"""
+    try:
+        f, _ = open_tile(tile)
+    except TileNotFound:
+        return None
+    with f, Image.open(f) as image:
+        return np.asarray(image.convert('RGBA'), dtype=np.float32) / 255.0
+
+
+def blend(layers):
+    """Premultiplied "over" of [(rgba array, opacity)], bottom first; returns (rgb, alpha)"""
+    height, width, _ = layers[0][0].shape
+    rgb = np.zeros((height, width, 3), dtype=np.float32)
+    alpha = np.zeros((height, width, 1), dtype=np.float32)
+    for pixels, opacity in layers:
+        if pixels.shape[:2] != (height, width):
+            pixels = np.asarray(
+                Image.fromarray((pixels * 255).astype(np.uint8)).resize((width, height), Image.BILINEAR),
+                dtype=np.float32,
+            ) / 255.0
+        source_alpha = pixels[..., 3:] * opacity
+        rgb = pixels[..., :3] * source_alpha + rgb * (1 - source_alpha)
+        alpha = source_alpha + alpha * (1 - source_alpha)
+    return rgb, alpha
+
+
+def render(layers, path, fmt):
+    """Blend the layer tiles and write the composite; TileNotFound if no layer has the tile"""
+    loaded = list(_fetch_pool.map(_load, [tile for tile, _ in layers]))
+    present = [(pixels, opacity) for pixels, (_, opacity) in zip(loaded, layers) if pixels is not None]
+    if not present:
+        raise TileNotFound('No layer has this tile')
+
+    rgb, alpha = blend(present)
+    if fmt == 'jpg':
+        # No alpha channel: the premultiplied colour is the stack over black
+        image = Image.fromarray(np.round(rgb * 255).astype(np.uint8))
+    else:
+        straight = np.divide(rgb, alpha, out=np.zeros_like(rgb), where=alpha > 0)
+        pixels = np.concatenate([straight, alpha], axis=2)
+        image = Image.fromarray(np.round(pixels * 255).astype(np.uint8))
+    with open(path, 'wb') as f:
+        image.save(f, **SAVE_OPTIONS[fmt])
+
+
+def open_composite(composite):
+    """(open file, hit); concurrent requests for one composite render it once"""
+    def produce(temp):
+        render(composite['layers'], temp, composite['format'])
+
+    return tile_cache.open(composite['key'], composite['format'], produce)
@@ -0,0 +1,125 @@
+import os
+import random
+import shutil
+import tempfile
+import time
+from itertools import islice
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from emiigen.disk_cache import DiskCache
+from gibs.tile_pack import TilePackStore
+
+TILE_LEVELS = 12
+
+
+def disk_usage(root):
+    """(files, bytes allocated on disk) under root"""
+    files = allocated = 0
+    for directory, _, names in os.walk(root):
+        for name in names:
+            files += 1
+            allocated += os.stat(os.path.join(directory, name)).st_blocks * 512
+    return files, allocated
+
+
+class Command(BaseCommand):
+    help = 'Compare the loose-file and packed GIBS tile layouts on synthetic tiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tiles',
+            type=int,
+            default=20000,
+            help='Tiles written to each layout (default: 20000)',
+        )
+        parser.add_argument(
+            '--dates',
+            type=int,
+            default=10,
+            help='Layer-dates the tiles are spread over, one pack each (default: 10)',
+        )
+        parser.add_argument(
+            '--reads',
+            type=int,
+            default=20000,
+            help='Random tile reads per layout (default: 20000)',
+        )
+        parser.add_argument(
+            '--dir',
+            type=str,
+            default=None,
+            help='Directory to benchmark in (default: a temporary directory)',
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        dates = [f'2020-01-{day:02d}' for day in range(1, max(options['dates'], 1) + 1)]
+        per_date = -(-options['tiles'] // len(dates))
+
+        # Tiles from level 0 down, 2-30 KB each
+        tiles = []
+        for date in dates:
+            grid = ((z, x, y) for z in range(TILE_LEVELS) for x in range(2 ** (z + 1)) for y in range(2 ** z))
+            for z, x, y in islice(grid, per_date):
+                tiles.append((date, z, x, y, rng.randbytes(rng.randint(2000, 30000))))
+        reads = [rng.choice(tiles)[:4] for _ in range(options['reads'])]
+
+        root = tempfile.mkdtemp(prefix='tile-bench-', dir=options['dir'])
+        files = None
+        try:
+            files = DiskCache('tile-benchmark', os.path.join(root, 'files'), 1024 ** 4)
+            packs = TilePackStore(os.path.join(root, 'packs'))
+            key = lambda date, z, x, y: DiskCache.key('bench', date, z, x, y)
+            pack = lambda date: packs.pack_name('Benchmark_Layer', date, '250m', 'jpg')
+
+            def write_files():
+                for date, z, x, y, data in tiles:
+                    files.fill(key(date, z, x, y), 'jpg', lambda temp: open(temp, 'wb').write(data))
+
+            def write_packs():
+                for date, z, x, y, data in tiles:
+                    packs.put(pack(date), z, x, y, data)
+                packs.sync()
+
+            def read_files():
+                for date, z, x, y in reads:
+                    with open(files.get(key(date, z, x, y), 'jpg'), 'rb') as f:
+                        f.read()
+
+            def read_packs():
+                for date, z, x, y in reads:
+                    packs.get(pack(date), z, x, y)
+
+            results = {}
+            for layout, write, read, store_root, scan in (
+                ('files', write_files, read_files, files.root, files.evict),
+                ('packed', write_packs, read_packs, packs.root, packs.packs),
+            ):
+                started = time.perf_counter()
+                write()
+                written = time.perf_counter() - started
+
+                started = time.perf_counter()
+                read()
+                read_time = time.perf_counter() - started
+
+                started = time.perf_counter()
+                scan()
+                scanned = time.perf_counter() - started
+
+                file_count, allocated = disk_usage(store_root)
+                results[layout] = (written, read_time, scanned, file_count, allocated)
+
+            self.stdout.write(f'{len(tiles)} tiles over {len(dates)} dates, {len(reads)} random reads\n')
+            self.stdout.write(f"{'':8}{'write/s':>12}{'read/s':>12}{'scan ms':>10}{'files':>8}{'MB on disk':>12}")
+            for layout, (written, read_time, scanned, file_count, allocated) in results.items():
+                self.stdout.write(
+                    f'{layout:8}{len(tiles) / written:>12.0f}{len(reads) / read_time:>12.0f}'
+                    f'{scanned * 1000:>10.1f}{file_count:>8}{allocated / 1024 ** 2:>12.1f}'
+                )
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+            if files is not None:
+                cache.delete(files.size_key)
@@ -0,0 +1,44 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand
+
+from gibs.tiles import tile_cache, tile_packs
+
+
+class Command(BaseCommand):
+    help = 'Evict stale GIBS tile packs and rewrite the rest in tile order'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--evict-only',
+            action='store_true',
+            help='Only delete packs past the age and size limits',
+        )
+
+    def handle(self, *args, **options):
+        tile_packs.flush()
+
+        deleted, remaining = tile_packs.evict()
+        self.stdout.write(f'Deleted {deleted} packs; {remaining / 1024 ** 2:.1f} MB remain')
+
+        loose = tile_cache.evict()
+        self.stdout.write(f'Deleted {loose} loose tile files')
+
+        if options['evict_only']:
+            return
+
+        packs = tile_packs.packs()
+        compacted = 0
+        for index, (_, _, name) in enumerate(packs, 1):
+            try:
+                if tile_packs.compact(name):
+                    compacted += 1
+            except sqlite3.Error as e:
+                self.stdout.write(self.style.WARNING(f'Could not compact {name}: {e}'))
+            if index % 100 == 0:
+                self.stdout.write(f'  {index}/{len(packs)} packs checked')
+
+        after = sum(pack[1] for pack in tile_packs.packs())
+        self.stdout.write(self.style.SUCCESS(
+            f'Compacted {compacted} of {len(packs)} packs; {after / 1024 ** 2:.1f} MB in packs'
+        ))
@@ -0,0 +1,194 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from emiigen.nasa_client import TokenBucket
+from gibs.models import WorldviewImageOfWeek
+from gibs.tiles import (
+    SETTLED_DAYS, TILE_MATRIX_SETS, TileNotFound, is_cached, is_settled, layer_format, open_tile, resolve_tile,
+    tile_packs, tiles_in_boxes
+)
+
+DEFAULT_LAYER = 'MODIS_Terra_CorrectedReflectance_TrueColor'
+PROGRESS_EVERY = 500
+
+
+class Command(BaseCommand):
+    help = 'Pre-warm the GIBS tile cache for layers, a region, zoom levels and dates'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--layers',
+            nargs='+',
+            help=f'Layer identifiers (default: the images\' layers with --image-of-week, else {DEFAULT_LAYER})',
+        )
+        parser.add_argument(
+            '--bbox',
+            nargs=4,
+            type=float,
+            metavar=('WEST', 'SOUTH', 'EAST', 'NORTH'),
+            help='Region in degrees; WEST > EAST crosses the antimeridian',
+        )
+        parser.add_argument(
+            '--image-of-week',
+            type=int,
+            metavar='N',
+            help='Seed around the coordinates of the N latest Worldview Images of the Week, on their capture dates',
+        )
+        parser.add_argument(
+            '--radius',
+            type=float,
+            default=5.0,
+            help='Degrees around each Image of the Week location (default: 5)',
+        )
+        parser.add_argument(
+            '--zoom',
+            nargs=2,
+            type=int,
+            default=[0, 6],
+            metavar=('MIN', 'MAX'),
+            help='Zoom levels to seed, inclusive (default: 0 6)',
+        )
+        parser.add_argument(
+            '--dates',
+            nargs=2,
+            metavar=('START', 'END'),
+            help=f'Date range in YYYY-MM-DD, inclusive (default: {SETTLED_DAYS} days ago, the newest settled UTC day)',
+        )
+        parser.add_argument(
+            '--matrix-set',
+            default='250m',
+            choices=list(TILE_MATRIX_SETS),
+            help='Tile matrix set (default: 250m)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Concurrent GIBS requests (default: 8)',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=20.0,
+            help='Maximum GIBS requests per second (default: 20)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the tiles that would be seeded',
+        )
+
+    def handle(self, *args, **options):
+        low, high = options['zoom']
+        if low < 0 or high < low:
+            raise CommandError('--zoom needs 0 <= MIN <= MAX')
+        if options['rate'] <= 0:
+            raise CommandError('--rate must be positive')
+        zooms = range(low, min(high, TILE_MATRIX_SETS[options['matrix_set']]) + 1)
+
+        jobs = self.jobs(options)
+        if not jobs:
+            raise CommandError('Nothing to seed: give --bbox or --image-of-week')
+
+        # (layer, date, z, x, y) for every tile, regions resolved to tiles with array maths
+        work = []
+        for layer, dates, boxes in jobs:
+            grid = tiles_in_boxes(boxes, zooms).tolist()
+            work.extend((layer, day, z, x, y) for day in dates for z, x, y in grid)
+        self.stdout.write(f'{len(work)} tiles over {len(jobs)} layer regions, zoom {low}-{zooms[-1]}')
+        recent = sorted({day for _, dates, _ in jobs for day in dates if not is_settled(date.fromisoformat(day))})
+        if recent:
+            self.stdout.write(self.style.WARNING(
+                f"{', '.join(recent)} not settled yet: their tiles are refetched after a few minutes, "
+                f"so seeding them only warms the cache briefly"
+            ))
+        if options['dry_run']:
+            return
+
+        # At least one whole token, or a rate below 1/s could never be met; slow rates stretch the period
+        capacity = max(options['rate'], 1.0)
+        bucket = TokenBucket(capacity, period=capacity / options['rate'])
+        counts = {'fetched': 0, 'cached': 0, 'missing': 0, 'failed': 0}
+        lock = threading.Lock()
+        started = time.monotonic()
+
+        def seed(item):
+            layer, day, z, x, y = item
+            try:
+                tile = resolve_tile(layer, day, options['matrix_set'], z, y, x, layer_format(layer))
+                if is_cached(tile):
+                    outcome = 'cached'
+                else:
+                    while (wait := bucket.try_acquire()) > 0:
+                        time.sleep(wait)
+                    f, _ = open_tile(tile)
+                    f.close()
+                    outcome = 'fetched'
+            except TileNotFound:
+                outcome = 'missing'
+            except (requests.exceptions.RequestException, OSError, ValueError) as e:
+                print(f"Error seeding {layer} {day} {z}/{y}/{x}: {e}")
+                outcome = 'failed'
+
+            with lock:
+                counts[outcome] += 1
+                done = sum(counts.values())
+            if done % PROGRESS_EVERY == 0:
+                elapsed = time.monotonic() - started
+                self.stdout.write(f'  {done}/{len(work)} tiles, {counts["fetched"] / elapsed:.1f} fetched/s')
+
+        # Only a few tiles per worker are queued at once, however large the pyramid
+        slots = threading.BoundedSemaphore(options['workers'] * 4)
+
+        def release(_):
+            slots.release()
+
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as pool:
+            for item in work:
+                slots.acquire()
+                pool.submit(seed, item).add_done_callback(release)
+        tile_packs.sync()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(work)} tiles in {elapsed:.1f}s ({len(work) / elapsed:.1f} tiles/s): "
+            f"{counts['fetched']} fetched ({counts['fetched'] / elapsed:.1f}/s), {counts['cached']} already cached, "
+            f"{counts['missing']} not on GIBS, {counts['failed']} failed"
+        ))
+
+    def jobs(self, options):
+        """[(layer, [dates], [boxes])] to seed"""
+        if options['image_of_week']:
+            radius = options['radius']
+            jobs = []
+            for image in WorldviewImageOfWeek.objects.exclude(coordinates=None)[:options['image_of_week']]:
+                try:
+                    lat, lon = float(image.coordinates['lat']), float(image.coordinates['lon'])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                box = (lon - radius if lon - radius >= -180 else lon - radius + 360, max(lat - radius, -90),
+                       lon + radius if lon + radius <= 180 else lon + radius - 360, min(lat + radius, 90))
+                day = (image.capture_date or image.published_date).isoformat()
+                for layer in options['layers'] or image.layers_used or [DEFAULT_LAYER]:
+                    jobs.append((layer, [day], [box]))
+            return jobs
+
+        if not options['bbox']:
+            return []
+        return [(layer, self.dates(options['dates']), [tuple(options['bbox'])])
+                for layer in options['layers'] or [DEFAULT_LAYER]]
+
+    def dates(self, bounds):
+        if not bounds:
+            # Recent imagery is cached under names that rotate, so seeding it would not last
+            return [(datetime.now(timezone.utc).date() - timedelta(days=SETTLED_DAYS)).isoformat()]
+        try:
+            start, end = (date.fromisoformat(bound) for bound in bounds)
+        except ValueError:
+            raise CommandError('--dates must be YYYY-MM-DD YYYY-MM-DD')
+        return [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
@@ -0,0 +1,121 @@
+# gibs/metatiles.py
+"""
+Blocks of adjacent tiles served as one stitched image.
+
+A metatile is the size x size block of tiles starting at column mx * size,
+row my * size of one level, so blocks are aligned and every viewport that
+touches a block shares its cache entry. Cells are ordinary proxy tiles (a
+single layer at full opacity) or composites (gibs/composite.py), filled
+concurrently from the tile cache, scaled to the requested cell size and
+pasted into place. The manifest gives each cell's pixel offset; its layout
+depends only on the request, so it is known before anything is rendered
+and is sent with 304 responses too.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from emiigen.disk_cache import DiskCache
+
+from .composite import SAVE_OPTIONS, open_composite, resolve_composite
+from .tiles import (
+    TILE_MATRIX_SETS, TileNotFound, layer_format, matrix_size, open_tile, resolve_tile, tile_cache
+)
+
+DEFAULT_SIZE = 4
+MAX_SIZE = 8
+CELL_SIZES = (128, 256, 512)
+DEFAULT_CELL_SIZE = 512
+
+_fill_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix='metatile')
+
+
+def resolve_metatile(stack, date_str, matrix_set, z, my, mx, size, fmt, cell_size=DEFAULT_CELL_SIZE):
+    """
+    {'cells', 'key', 'etag', 'format', 'max_age', 'manifest'} for a metatile.
+    Raises ValueError for malformed parameters and TileNotFound for blocks
+    outside the matrix.
+    """
+    if not 1 <= size <= MAX_SIZE:
+        raise ValueError(f'Size must be between 1 and {MAX_SIZE}')
+    if cell_size not in CELL_SIZES:
+        raise ValueError(f"Tile size must be one of {', '.join(map(str, CELL_SIZES))}")
+    if fmt not in SAVE_OPTIONS:
+        raise ValueError(f"Format must be one of {', '.join(SAVE_OPTIONS)}")
+    if matrix_set not in TILE_MATRIX_SETS:
+        raise ValueError(f"Tile matrix set must be one of {', '.join(TILE_MATRIX_SETS)}")
+    if z > TILE_MATRIX_SETS[matrix_set]:
+        raise TileNotFound(f'{matrix_set} has no level {z}')
+
+    columns, rows = matrix_size(z)
+    x0, y0 = mx * size, my * size
+    if x0 >= columns or y0 >= rows:
+        raise TileNotFound(f'{matrix_set}/{z} has no metatile {my}/{mx}')
+
+    # A lone opaque layer needs no blending: its tiles are used as fetched
+    layer, opacity = stack[0]
+    plain = len(stack) == 1 and opacity == 1.0
+    cells = []
+    for y in range(y0, min(y0 + size, rows)):
+        for x in range(x0, min(x0 + size, columns)):
+            if plain:
+                tile, opener = resolve_tile(layer, date_str, matrix_set, z, y, x, layer_format(layer)), open_tile
+            else:
+                tile, opener = resolve_composite(stack, date_str, matrix_set, z, y, x, 'png'), open_composite
+            cells.append({'x': x, 'y': y, 'left': (x - x0) * cell_size, 'top': (y - y0) * cell_size,
+                          'tile': tile, 'open': opener})
+
+    key = DiskCache.key('metatile', fmt, cell_size, *(cell['tile']['key'] for cell in cells))
+    manifest = {
+        'z': z,
+        'size': size,
+        'tile_size': cell_size,
+        'width': (min(x0 + size, columns) - x0) * cell_size,
+        'height': (min(y0 + size, rows) - y0) * cell_size,
+        'tiles': [{'x': cell['x'], 'y': cell['y'], 'left': cell['left'], 'top': cell['top']} for cell in cells],
+    }
+    return {
+        'cells': cells,
+        'key': key,
+        'etag': f'"{key[:32]}"',
+        'format': fmt,
+        'max_age': min(cell['tile']['max_age'] for cell in cells),
+        'manifest': manifest,
+    }
+
+
+def _load(cell, cell_size):
+    """One cell as RGBA at cell_size, or None where there is no tile"""
+    try:
+        f, _ = cell['open'](cell['tile'])
+    except TileNotFound:
+        return None
+    with f, Image.open(f) as image:
+        image = image.convert('RGBA')
+        if image.size != (cell_size, cell_size):
+            image = image.resize((cell_size, cell_size), Image.LANCZOS)
+        return image
+
+
+def render(metatile, path):
+    """Fill every cell concurrently and stitch them; TileNotFound if no cell has a tile"""
+    manifest = metatile['manifest']
+    cell_size = manifest['tile_size']
+    images = list(_fill_pool.map(lambda cell: _load(cell, cell_size), metatile['cells']))
+    if not any(image is not None for image in images):
+        raise TileNotFound('No tile in this metatile')
+
+    canvas = Image.new('RGBA', (manifest['width'], manifest['height']), (0, 0, 0, 0))
+    for cell, image in zip(metatile['cells'], images):
+        if image is not None:
+            canvas.paste(image, (cell['left'], cell['top']))
+    if metatile['format'] == 'jpg':
+        # Same as composites: transparent areas over black
+        canvas = Image.alpha_composite(Image.new('RGBA', canvas.size, (0, 0, 0, 255)), canvas).convert('RGB')
+    with open(path, 'wb') as f:
+        canvas.save(f, **SAVE_OPTIONS[metatile['format']])
+
+
+def open_metatile(metatile):
+    """(open file, hit); concurrent requests for one metatile stitch it once"""
+    return tile_cache.open(metatile['key'], metatile['format'], lambda temp: render(metatile, temp))
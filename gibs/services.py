@@ -2,6 +2,8 @@ import requests
 import xml.etree.ElementTree as ET
 from datetime import datetime, timedelta
 from django.conf import settings
+from django.urls import reverse
+from emiigen.nasa_client import get_client
 
 
 class GIBSService:
@@ -31,11 +33,16 @@ class GIBSService:
         
         return f'https://gibs.earthdata.nasa.gov/wmts/epsg4326/best/{layer_id}/default/{date}/{tilematrixset}/{z}/{y}/{x}.{format_type}'
     
+    @staticmethod
+    def get_proxy_tile_url(layer_id, date, z, x, y, tilematrixset='250m', format_type='jpg'):
+        """URL of the same tile through the app's caching tile proxy"""
+        return reverse('gibs:tile', args=[layer_id, date, tilematrixset, z, y, x, format_type])
+    
     @staticmethod
     def fetch_capabilities():
         """Fetch and parse WMTS capabilities document"""
         try:
-            response = requests.get(GIBSService.GIBS_CAPABILITIES_URL, timeout=30)
+            response = get_client().get(GIBSService.GIBS_CAPABILITIES_URL, timeout=30, use_api_key=False)
             response.raise_for_status()
             
             root = ET.fromstring(response.content)
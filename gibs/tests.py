@@ -1,3 +1,347 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .composite import MAX_LAYERS, blend, layer_stack, parse_stack, render
+from .metatiles import render as render_metatile
+from .metatiles import resolve_metatile
+from .tile_pack import TilePackStore
+from .tiles import (
+    LEVEL0_SPAN, RECENT_MAX_AGE, SETTLED_MAX_AGE, TileNotFound, matrix_size, resolve_tile, tiles_in_boxes,
+)
+
+LAYER = 'VIIRS_SNPP_CorrectedReflectance_TrueColor'
+
+
+class ResolveTileTests(SimpleTestCase):
+
+    def test_rejects_dot_layers(self):
+        for layer in ('.', '..', '.hidden', '-flag'):
+            with self.subTest(layer=layer):
+                with self.assertRaises(ValueError):
+                    resolve_tile(layer, '2024-08-01', '250m', 2, 1, 1, 'jpg')
+
+    def test_accepts_gibs_identifiers(self):
+        tile = resolve_tile(LAYER, '2024-08-01', '250m', 2, 1, 1, 'jpg')
+        self.assertIn(f'/{LAYER}/default/2024-08-01/250m/2/1/1.jpg', tile['url'])
+
+    def test_malformed_parameters(self):
+        for args in (('2024-13-01', '250m', 'jpg'), ('2024-08-01', '3km', 'jpg'), ('2024-08-01', '250m', 'gif')):
+            with self.subTest(args=args):
+                with self.assertRaises(ValueError):
+                    resolve_tile(LAYER, args[0], args[1], 0, 0, 0, args[2])
+
+    def test_tiles_outside_the_matrix_are_not_found(self):
+        columns, rows = matrix_size(2)
+        for z, y, x in ((9, 0, 0), (2, 0, columns), (2, rows, 0)):
+            with self.subTest(zyx=(z, y, x)):
+                with self.assertRaises(TileNotFound):
+                    resolve_tile(LAYER, '2024-08-01', '250m', z, y, x, 'jpg')
+
+    def test_settled_and_recent_dates(self):
+        settled = resolve_tile(LAYER, '2024-08-01', '250m', 2, 1, 1, 'jpg')
+        self.assertEqual(settled['max_age'], SETTLED_MAX_AGE)
+        today = datetime.now(timezone.utc).date().isoformat()
+        recent = resolve_tile(LAYER, today, '250m', 2, 1, 1, 'jpg')
+        self.assertEqual(recent['max_age'], RECENT_MAX_AGE)
+        self.assertIsNone(recent['pack'])
+        future = (datetime.now(timezone.utc).date() + timedelta(days=3)).isoformat()
+        with self.assertRaises(TileNotFound):
+            resolve_tile(LAYER, future, '250m', 2, 1, 1, 'jpg')
+
+
+class TilePackStoreTests(SimpleTestCase):
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.store = TilePackStore(root.name, max_age=3600)
+        self.pack = self.store.pack_name(LAYER, '2024-08-01', '250m', 'jpg')
+
+    def test_round_trip_through_the_buffer_and_the_pack(self):
+        stored = []
+        tiles = {(z, x, y): os.urandom(100 + z * 10 + x) for z in range(3) for x in range(2 ** z) for y in range(2)}
+        for (z, x, y), data in tiles.items():
+            self.store.put(self.pack, z, x, y, data, on_stored=lambda zxy=(z, x, y): stored.append(zxy))
+        # Buffered tiles are readable before they are written
+        self.assertEqual(self.store.get(self.pack, 1, 1, 0), tiles[(1, 1, 0)])
+        self.store.sync()
+
+        self.assertEqual(sorted(stored), sorted(tiles))
+        self.assertTrue(os.path.exists(self.store.path(self.pack)))
+        for (z, x, y), data in tiles.items():
+            self.assertEqual(self.store.get(self.pack, z, x, y), data)
+        self.assertTrue(self.store.has(self.pack, 2, 3, 1))
+        self.assertIsNone(self.store.get(self.pack, 5, 0, 0))
+        self.assertIsNone(self.store.get(self.store.pack_name(LAYER, '2024-08-02', '250m', 'jpg'), 0, 0, 0))
+
+    def test_compaction_keeps_every_tile(self):
+        for x in reversed(range(20)):
+            self.store.put(self.pack, 4, x, 0, bytes([x]) * 50)
+        self.store.sync()
+        self.assertTrue(self.store.compact(self.pack))
+        self.assertFalse(self.store.compact(self.pack))
+        self.assertEqual([self.store.get(self.pack, 4, x, 0) for x in range(20)],
+                         [bytes([x]) * 50 for x in range(20)])
+
+    def test_stale_packs_are_evicted(self):
+        stale = self.store.pack_name(LAYER, '2024-07-01', '250m', 'jpg')
+        self.store.put(self.pack, 0, 0, 0, b'fresh')
+        self.store.put(stale, 0, 0, 0, b'stale')
+        self.store.sync()
+        old = time.time() - 7200
+        os.utime(self.store.path(stale), (old, old))
+
+        deleted, _ = self.store.evict()
+        self.assertEqual(deleted, 1)
+        self.assertIsNone(self.store.get(stale, 0, 0, 0))
+        self.assertEqual(self.store.get(self.pack, 0, 0, 0), b'fresh')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'gibs-tests'}})
+class BenchmarkTileStoreTests(SimpleTestCase):
+
+    def test_reports_both_layouts(self):
+        out = io.StringIO()
+        call_command('benchmark_tile_store', tiles=60, dates=2, reads=30, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith('60 tiles over 2 dates'))
+        self.assertEqual([line.split()[0] for line in lines[-2:]], ['files', 'packed'])
+
+    def test_setup_errors_are_not_hidden(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, root)
+        with mock.patch('gibs.management.commands.benchmark_tile_store.DiskCache', side_effect=OSError('no space')):
+            with self.assertRaisesMessage(OSError, 'no space'):
+                call_command('benchmark_tile_store', tiles=10, dir=root, stdout=io.StringIO())
+        # The temporary directory is still removed
+        self.assertEqual(os.listdir(root), [])
+
+
+def brute_force_tiles(boxes, zooms):
+    """Every tile whose extent overlaps a box, checked tile by tile"""
+    found = set()
+    for z in zooms:
+        span = LEVEL0_SPAN / 2 ** z
+        columns, rows = matrix_size(z)
+        for west, south, east, north in boxes:
+            ranges = [(west, 180.0), (-180.0, east)] if west > east else [(west, east)]
+            for range_west, range_east in ranges:
+                for x in range(columns):
+                    for y in range(rows):
+                        tile_west, tile_north = -180 + x * span, 90 - y * span
+                        if (tile_west < range_east and tile_west + span > range_west
+                                and tile_north - span < north and tile_north > south):
+                            found.add((z, x, y))
+    return found
+
+
+class TilesInBoxesTests(SimpleTestCase):
+
+    def rows(self, boxes, zooms):
+        return {tuple(row) for row in tiles_in_boxes(boxes, zooms).tolist()}
+
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(5)
+        boxes = []
+        for _ in range(20):
+            west, east = sorted(rng.uniform(-180, 180, 2))
+            south, north = sorted(rng.uniform(-90, 90, 2))
+            boxes.append((west, south, east, north))
+        zooms = [0, 1, 2, 3, 4]
+        for box in boxes:
+            with self.subTest(box=box):
+                self.assertEqual(self.rows([box], zooms), brute_force_tiles([box], zooms))
+        self.assertEqual(self.rows(boxes, zooms), brute_force_tiles(boxes, zooms))
+
+    def test_antimeridian_box_is_the_union_of_its_halves(self):
+        zooms = [1, 3, 5]
+        box = (170.5, -12.3, -172.25, 8.7)
+        halves = [(170.5, -12.3, 180.0, 8.7), (-180.0, -12.3, -172.25, 8.7)]
+        self.assertEqual(self.rows([box], zooms), self.rows(halves, zooms))
+        self.assertEqual(self.rows([box], zooms), brute_force_tiles([box], zooms))
+        # Only the two edge columns of the grid, never the middle of the map
+        columns = {x for z, x, y in self.rows([box], [5])}
+        self.assertIn(0, columns)
+        self.assertNotIn(matrix_size(5)[0] // 2, columns)
+
+    def test_whole_world_covers_the_matrix(self):
+        for z in (0, 2, 4):
+            columns, rows = matrix_size(z)
+            self.assertEqual(len(self.rows([(-180, -90, 180, 90)], [z])), columns * rows)
+
+    def test_no_boxes(self):
+        self.assertEqual(tiles_in_boxes([], [0, 1]).shape, (0, 3))
+
+
+class SeedTilesCommandTests(SimpleTestCase):
+
+    def seed(self, **options):
+        out = io.StringIO()
+        call_command('seed_gibs_tiles', stdout=out, **options)
+        return out.getvalue()
+
+    def test_dry_run_counts_the_region(self):
+        box = [-125.0, 32.0, -114.0, 42.0]
+        output = self.seed(bbox=box, zoom=[0, 4], dates=['2024-08-01', '2024-08-02'], dry_run=True)
+        tiles = len(tiles_in_boxes([tuple(box)], range(5)))
+        self.assertTrue(output.startswith(f'{tiles * 2} tiles over 1 layer regions, zoom 0-4'))
+        self.assertNotIn('not settled', output)
+
+    def test_default_date_is_settled(self):
+        output = self.seed(bbox=[0, 0, 10, 10], zoom=[0, 0], dry_run=True)
+        self.assertNotIn('not settled', output)
+        today = datetime.now(timezone.utc).date().isoformat()
+        output = self.seed(bbox=[0, 0, 10, 10], zoom=[0, 0], dates=[today, today], dry_run=True)
+        self.assertIn(f'{today} not settled yet', output)
+
+    def test_rate_must_be_positive(self):
+        with self.assertRaisesMessage(CommandError, '--rate must be positive'):
+            self.seed(bbox=[0, 0, 10, 10], rate=0)
+
+
+def png_tile(rgba, size=(4, 4)):
+    f = io.BytesIO()
+    Image.new('RGBA', size, rgba).save(f, format='PNG')
+    f.seek(0)
+    return f
+
+
+class CompositeTests(SimpleTestCase):
+
+    def test_layer_stack(self):
+        stack = layer_stack(['A', 'B', 'A', '', 'C', 'D'], {'B': '0.5', 'C': 0, 'D': 1.7})
+        self.assertEqual(stack, [('A', 1.0), ('B', 0.5), ('D', 1.0)])
+        for layers, opacity in ((['A'], {'A': 0}), ([''], {}), (['A'], {'A': 'half'}),
+                                ([str(i) for i in range(MAX_LAYERS + 1)], {})):
+            with self.subTest(layers=layers, opacity=opacity):
+                with self.assertRaises(ValueError):
+                    layer_stack(layers, opacity)
+
+    def test_parse_stack(self):
+        self.assertEqual(parse_stack('A,B,C', 'B:0.25,C:0.8'), [('A', 1.0), ('B', 0.25), ('C', 0.8)])
+        with self.assertRaises(ValueError):
+            parse_stack('', None)
+
+    def test_blend_matches_over_per_pixel(self):
+        rng = np.random.default_rng(9)
+        layers = [(rng.uniform(0, 1, (3, 5, 4)).astype(np.float32), opacity) for opacity in (1.0, 0.6, 0.3)]
+        rgb, alpha = blend(layers)
+        for y in range(3):
+            for x in range(5):
+                colour, coverage = np.zeros(3), 0.0
+                for pixels, opacity in layers:
+                    a = pixels[y, x, 3] * opacity
+                    colour = pixels[y, x, :3] * a + colour * (1 - a)
+                    coverage = a + coverage * (1 - a)
+                np.testing.assert_allclose(rgb[y, x], colour, atol=1e-6)
+                self.assertAlmostEqual(float(alpha[y, x, 0]), coverage, places=6)
+
+    def test_opaque_top_layer_hides_the_rest(self):
+        bottom = np.tile(np.array([1, 0, 0, 1], dtype=np.float32), (2, 2, 1))
+        top = np.tile(np.array([0, 0, 1, 1], dtype=np.float32), (4, 4, 1))
+        rgb, alpha = blend([(bottom, 1.0), (top, 1.0)])
+        # The larger layer is resized to the bottom layer's tile
+        self.assertEqual(rgb.shape, (2, 2, 3))
+        np.testing.assert_allclose(rgb, np.tile([0, 0, 1], (2, 2, 1)))
+        np.testing.assert_allclose(alpha, 1.0)
+
+    def render_tiles(self, tiles, fmt):
+        def open_tile(tile):
+            if tile is None:
+                raise TileNotFound('missing')
+            return png_tile(tile), False
+
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        path = os.path.join(root.name, f'composite.{fmt}')
+        with mock.patch('gibs.composite.open_tile', side_effect=open_tile):
+            render(tiles, path, fmt)
+        with Image.open(path) as image:
+            return image.getpixel((0, 0))
+
+    def test_render_skips_missing_layers(self):
+        tiles = [((255, 0, 0, 255), 1.0), (None, 1.0), ((0, 0, 255, 255), 0.5)]
+        self.assertEqual(self.render_tiles(tiles, 'png'), (128, 0, 128, 255))
+
+    def test_render_png_keeps_straight_alpha(self):
+        self.assertEqual(self.render_tiles([((0, 255, 0, 255), 0.5)], 'png'), (0, 255, 0, 128))
+
+    def test_render_without_any_tile(self):
+        with self.assertRaises(TileNotFound):
+            self.render_tiles([(None, 1.0), (None, 0.5)], 'jpg')
+
+
+class MetatileTests(TestCase):
+
+    def test_manifest_offsets_of_an_edge_block(self):
+        columns, rows = matrix_size(2)
+        metatile = resolve_metatile([(LAYER, 1.0)], '2024-08-01', '250m', 2, 0, 1, 4, 'jpg', 256)
+        manifest = metatile['manifest']
+        # Only the columns and rows left in the matrix are part of the block
+        width, height = columns - 4, min(rows, 4)
+        self.assertEqual((manifest['width'], manifest['height']), (width * 256, height * 256))
+        self.assertEqual(
+            [(tile['x'], tile['y'], tile['left'], tile['top']) for tile in manifest['tiles']],
+            [(4 + i, j, i * 256, j * 256) for j in range(height) for i in range(width)],
+        )
+        with self.assertRaises(TileNotFound):
+            resolve_metatile([(LAYER, 1.0)], '2024-08-01', '250m', 2, 0, 2, 4, 'jpg', 256)
+
+    def test_lone_opaque_layer_uses_its_tiles(self):
+        plain = resolve_metatile([(LAYER, 1.0)], '2024-08-01', '250m', 3, 0, 0, 2, 'jpg', 128)
+        self.assertEqual(plain['cells'][0]['tile']['key'],
+                         resolve_tile(LAYER, '2024-08-01', '250m', 3, 0, 0, 'jpg')['key'])
+        faded = resolve_metatile([(LAYER, 0.5)], '2024-08-01', '250m', 3, 0, 0, 2, 'jpg', 128)
+        self.assertIn('layers', faded['cells'][0]['tile'])
+        self.assertNotEqual(plain['key'], faded['key'])
+
+    def test_render_pastes_cells_at_their_offsets(self):
+        metatile = resolve_metatile([(LAYER, 0.5)], '2024-08-01', '250m', 3, 0, 0, 2, 'png', 128)
+        colours = {}
+        for i, cell in enumerate(metatile['cells']):
+            colours[(cell['left'], cell['top'])] = (60 * i, 255 - 60 * i, 100, 255)
+
+            def open_cell(tile, colour=colours[(cell['left'], cell['top'])]):
+                # Cells at another size are scaled to the metatile's tile size
+                return png_tile(colour, (64, 64)), True
+
+            cell['open'] = open_cell
+        # The last cell has no tile and stays transparent
+        missing = metatile['cells'][-1]
+        missing['open'] = mock.Mock(side_effect=TileNotFound('missing'))
+
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        path = os.path.join(root.name, 'metatile.png')
+        render_metatile(metatile, path)
+        with Image.open(path) as image:
+            self.assertEqual(image.size, (256, 256))
+            for (left, top), colour in colours.items():
+                expected = (0, 0, 0, 0) if (left, top) == (missing['left'], missing['top']) else colour
+                self.assertEqual(image.getpixel((left + 64, top + 64)), expected)
+
+    def test_manifest_header_on_fresh_and_not_modified_responses(self):
+        url = reverse('gibs:metatile', args=[4, '2024-08-01', '250m', 2, 0, 1, 'png'])
+        params = {'layers': LAYER, 'tile': 256}
+        with mock.patch('gibs.views.open_metatile', return_value=(png_tile((0, 0, 0, 255)), False)):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        manifest = json.loads(response['X-Metatile-Manifest'])
+        self.assertEqual(manifest['tiles'][0], {'x': 4, 'y': 0, 'left': 0, 'top': 0})
+
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(json.loads(response['X-Metatile-Manifest']), manifest)
+        self.assertEqual(self.client.get(url, {**params, 'tile': 300}).status_code, 400)
@@ -0,0 +1,303 @@
+# gibs/tile_pack.py
+"""
+Packed tile containers: one MBTiles-style SQLite file per layer, date,
+tile matrix set and format.
+
+Millions of small tiles as loose files cost an inode each and make every
+eviction scan walk them all. A pack holds a whole layer-date in one file
+with a (zoom_level, tile_column, tile_row) index, so the cache is a few
+thousand files and evicting a stale date is one unlink. Reads go through
+per-thread read-only connections with SQLite's memory-mapped I/O, so a
+cached tile is copied once, from the page cache into the response.
+
+Writers never touch SQLite on the request path: put() buffers tiles in
+memory (where get() also finds them) and a background flush appends them
+in one transaction per pack once BATCH_TILES are waiting or BATCH_SECONDS
+have passed. Packs are WAL-mode, so readers in other processes are never
+blocked by an append. After a flush, at most once per SWEEP_SECONDS, packs
+past max_age or beyond max_bytes are deleted, least recently used first.
+compact() rewrites a pack in key order and vacuums it, which keeps
+neighbouring tiles adjacent in the file.
+"""
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+MMAP_SIZE = 256 * 1024 ** 2
+BATCH_TILES = 64
+BATCH_SECONDS = 2.0
+BUSY_TIMEOUT_MS = 5000
+OPEN_PACKS = 64
+# Readers reopen after this long, releasing packs deleted by another process
+READER_SECONDS = 300
+TOUCH_SECONDS = 600
+SWEEP_SECONDS = 3600
+LOW_WATER = 0.9
+SUFFIX = '.mbtiles'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB);
+CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles (zoom_level, tile_column, tile_row);
+"""
+
+
+class TilePackStore:
+
+    def __init__(self, root, max_bytes=None, max_age=None):
+        self.root = str(root)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.pending_count = 0
+        self.callbacks = {}
+        self.timer = None
+        self.touched = {}
+        self.swept = time.monotonic()
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='tile-pack')
+        atexit.register(self.flush)
+
+    def pack_name(self, layer, date, matrix_set, fmt):
+        """Pack path relative to root"""
+        return os.path.join(layer, f'{date}.{matrix_set}.{fmt}{SUFFIX}')
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    # Reads
+
+    def _reader(self, name):
+        """This thread's read-only connection to a pack, or None if the pack does not exist yet"""
+        readers = getattr(self.local, 'readers', None)
+        if readers is None:
+            readers = self.local.readers = OrderedDict()
+        now = time.monotonic()
+        entry = readers.get(name)
+        if entry is not None:
+            connection, opened = entry
+            if now - opened < READER_SECONDS:
+                readers.move_to_end(name)
+                return connection
+            del readers[name]
+            connection.close()
+
+        path = self.path(name)
+        if not os.path.exists(path):
+            return None
+        try:
+            connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+            connection.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+            connection.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+        except sqlite3.Error:
+            return None
+        readers[name] = (connection, now)
+        if len(readers) > OPEN_PACKS:
+            readers.popitem(last=False)[1][0].close()
+        return connection
+
+    def _forget_reader(self, name):
+        entry = getattr(self.local, 'readers', {}).pop(name, None)
+        if entry is not None:
+            entry[0].close()
+
+    def _select(self, name, column, z, x, y):
+        connection = self._reader(name)
+        if connection is None:
+            return None
+        try:
+            return connection.execute(
+                f'SELECT {column} FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?', (z, x, y)
+            ).fetchone()
+        except sqlite3.Error:
+            # Deleted or replaced by compaction or eviction under this connection
+            self._forget_reader(name)
+            return None
+
+    def get(self, name, z, x, y):
+        """Tile bytes, or None if the tile is not packed"""
+        with self.lock:
+            data = self.pending.get(name, {}).get((z, x, y))
+        if data is not None:
+            return data
+
+        row = self._select(name, 'tile_data', z, x, y)
+        if row is None:
+            return None
+        self._touch(name)
+        return row[0]
+
+    def has(self, name, z, x, y):
+        """Whether a tile is packed or waiting to be, without reading it"""
+        with self.lock:
+            if (z, x, y) in self.pending.get(name, {}):
+                return True
+        return self._select(name, '1', z, x, y) is not None
+
+    def _touch(self, name):
+        """Refresh the pack's mtime, which eviction uses as its last use"""
+        now = time.time()
+        if now - self.touched.get(name, 0) > TOUCH_SECONDS:
+            self.touched[name] = now
+            try:
+                os.utime(self.path(name))
+            except FileNotFoundError:
+                pass
+
+    # Writes
+
+    def put(self, name, z, x, y, data, on_stored=None):
+        """
+        Buffer a tile for the next batch append. on_stored() runs once the
+        tile is committed, e.g. to drop its loose-file copy.
+        """
+        with self.lock:
+            self.pending.setdefault(name, {})[(z, x, y)] = data
+            self.pending_count += 1
+            if on_stored is not None:
+                self.callbacks[(name, z, x, y)] = on_stored
+            if self.pending_count >= BATCH_TILES:
+                self._cancel_timer()
+                self.writer.submit(self.flush)
+            elif self.timer is None:
+                self.timer = threading.Timer(BATCH_SECONDS, lambda: self.writer.submit(self.flush))
+                self.timer.daemon = True
+                self.timer.start()
+
+    def _cancel_timer(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def flush(self):
+        """Append every buffered tile, one transaction per pack; returns tiles written"""
+        with self.lock:
+            self._cancel_timer()
+            batch, self.pending, self.pending_count = self.pending, {}, 0
+            callbacks, self.callbacks = self.callbacks, {}
+        written = 0
+        for name, tiles in batch.items():
+            try:
+                self._append(name, tiles)
+            except sqlite3.Error as e:
+                print(f"Error appending {len(tiles)} tiles to {name}: {e}")
+                continue
+            written += len(tiles)
+            for (z, x, y) in tiles:
+                callback = callbacks.get((name, z, x, y))
+                if callback is not None:
+                    callback()
+        if written and time.monotonic() - self.swept > SWEEP_SECONDS:
+            self.swept = time.monotonic()
+            self.evict()
+        return written
+
+    def sync(self):
+        """Flush, and wait for batches the background writer already took"""
+        self.flush()
+        self.writer.submit(int).result()
+
+    def _connect(self, name):
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000)
+        connection.execute('PRAGMA journal_mode = WAL')
+        connection.executescript(SCHEMA)
+        return connection
+
+    def _append(self, name, tiles):
+        connection = self._connect(name)
+        try:
+            with connection:
+                connection.executemany(
+                    'INSERT OR IGNORE INTO tiles (zoom_level, tile_column, tile_row, tile_data) VALUES (?, ?, ?, ?)',
+                    [(z, x, y, data) for (z, x, y), data in tiles.items()]
+                )
+        finally:
+            connection.close()
+
+    # Maintenance
+
+    def packs(self):
+        """[(mtime, bytes, name)] of every pack, WAL included"""
+        found = []
+        for directory, _, files in os.walk(self.root):
+            for file_name in files:
+                if not file_name.endswith(SUFFIX):
+                    continue
+                path = os.path.join(directory, file_name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                size = stat.st_size
+                for extra in ('-wal', '-shm'):
+                    try:
+                        size += os.path.getsize(path + extra)
+                    except FileNotFoundError:
+                        pass
+                found.append((stat.st_mtime, size, os.path.relpath(path, self.root)))
+        return found
+
+    def delete(self, name):
+        path = self.path(name)
+        self._forget_reader(name)
+        for extra in ('', '-wal', '-shm'):
+            try:
+                os.remove(path + extra)
+            except FileNotFoundError:
+                pass
+
+    def compact(self, name):
+        """
+        Rewrite a pack in (zoom, column, row) order and vacuum it if it had
+        appends since its last compaction; returns True if it was rewritten
+        """
+        connection = self._connect(name)
+        try:
+            count = connection.execute('SELECT COUNT(*) FROM tiles').fetchone()[0]
+            compacted = connection.execute("SELECT value FROM metadata WHERE name = 'compacted_count'").fetchone()
+            free_pages = connection.execute('PRAGMA freelist_count').fetchone()[0]
+            if compacted and int(compacted[0]) == count and not free_pages:
+                return False
+            with connection:
+                connection.execute('CREATE TABLE tiles_sorted AS SELECT * FROM tiles ORDER BY zoom_level, tile_column, tile_row')
+                connection.execute('DROP TABLE tiles')
+                connection.execute('ALTER TABLE tiles_sorted RENAME TO tiles')
+                connection.execute('CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)')
+                connection.execute("INSERT OR REPLACE INTO metadata (name, value) VALUES ('compacted_count', ?)", (str(count),))
+            connection.execute('VACUUM')
+            connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            return True
+        finally:
+            connection.close()
+
+    def evict(self):
+        """
+        Delete packs unused for max_age, then least recently used packs down
+        to LOW_WATER of max_bytes; returns (packs deleted, bytes remaining)
+        """
+        packs = self.packs()
+        now = time.time()
+        deleted = 0
+        if self.max_age is not None:
+            for mtime, _, name in packs:
+                if now - mtime > self.max_age:
+                    self.delete(name)
+                    deleted += 1
+            packs = [pack for pack in packs if now - pack[0] <= self.max_age]
+
+        total = sum(pack[1] for pack in packs)
+        if self.max_bytes is not None and total > self.max_bytes:
+            for _, size, name in sorted(packs):
+                if total <= self.max_bytes * LOW_WATER:
+                    break
+                self.delete(name)
+                total -= size
+                deleted += 1
+        return deleted, total
@@ -0,0 +1,228 @@
+# gibs/tiles.py
+"""
+GIBS WMTS tiles served through the app.
+
+Tiles are fetched from GIBS once and kept in a DiskCache bounded by
+GIBS_TILE_MAX_BYTES and GIBS_TILE_MAX_AGE, so every visitor after the first
+gets them from local disk, and concurrent misses for one tile share a single
+upstream request. Imagery for settled dates (SETTLED_DAYS or more before the
+current UTC day) no longer changes and is cached for a long time by the
+browser as well. Recent dates are still being filled in by GIBS, so their
+cache name changes every RECENT_MAX_AGE and they are refetched.
+
+With GIBS_TILE_STORE = 'packed', settled tiles then move from the file
+cache into per-layer-date TilePackStore containers (gibs/tile_pack.py):
+the file cache only stages downloads and recent imagery, and packed reads
+never touch it.
+"""
+import io
+import math
+import re
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from emiigen.disk_cache import DiskCache
+
+from .models import GIBSLayer
+from .services import GIBSService
+from .tile_pack import TilePackStore
+
+CONTENT_TYPES = {'jpg': 'image/jpeg', 'png': 'image/png'}
+# Deepest level GIBS publishes for each EPSG:4326 tile matrix set
+TILE_MATRIX_SETS = {
+    '2km': 5,
+    '1km': 6,
+    '500m': 7,
+    '250m': 8,
+    '31.25m': 11,
+    '15.625m': 12,
+}
+# Level 0 tiles span 288 degrees (512 px at 0.5625 deg/px) in every set, halving per level
+LEVEL0_SPAN = 288.0
+# GIBS identifiers start with a letter or digit, which also rules out '.' and '..'
+LAYER_PATTERN = re.compile(r'[A-Za-z0-9][A-Za-z0-9_.\-]*')
+SETTLED_DAYS = 2
+SETTLED_MAX_AGE = 30 * 86400
+RECENT_MAX_AGE = 600
+DOWNLOAD_TIMEOUT = 20
+MAX_TILE_BYTES = 4 * 1024 ** 2
+LAYER_FORMAT_MAX_AGE = 300
+
+tile_cache = DiskCache('gibs-tiles', settings.GIBS_TILE_ROOT, settings.GIBS_TILE_MAX_BYTES,
+                       max_age=settings.GIBS_TILE_MAX_AGE)
+tile_packs = TilePackStore(settings.GIBS_TILE_PACK_ROOT, settings.GIBS_TILE_PACK_MAX_BYTES,
+                           max_age=settings.GIBS_TILE_MAX_AGE)
+
+_session = None
+# layer -> (format, monotonic expiry) for layers found in the catalogue
+_layer_formats = {}
+
+
+class TileNotFound(Exception):
+    """GIBS has no such tile (outside the layer's dates, matrix or coverage)"""
+
+
+def get_session():
+    global _session
+    if _session is None:
+        session = requests.Session()
+        # Kept-alive connections to GIBS, shared by every request thread
+        session.mount('https://', HTTPAdapter(pool_connections=2, pool_maxsize=16))
+        session.headers['User-Agent'] = 'emiigen-gibs-tiles'
+        _session = session
+    return _session
+
+
+def matrix_size(z):
+    """(columns, rows) of level z, the grid anchored at 180W 90N"""
+    span = LEVEL0_SPAN / 2 ** z
+    return math.ceil(360 / span), math.ceil(180 / span)
+
+
+def tiles_in_boxes(boxes, zooms):
+    """
+    (z, x, y) rows of every tile touching any (west, south, east, north) box
+    at the given levels, as one int array. Boxes crossing the antimeridian
+    (west > east) are split; per-level ranges and the tile grid are computed
+    with array arithmetic rather than Python loops over tiles.
+    """
+    zooms = np.asarray(sorted(set(zooms)), dtype=np.int64)
+    spans = LEVEL0_SPAN / 2.0 ** zooms
+    columns = np.ceil(360 / spans).astype(np.int64)
+    rows = np.ceil(180 / spans).astype(np.int64)
+
+    split = []
+    for west, south, east, north in boxes:
+        if west > east:
+            split.extend([(west, south, 180.0, north), (-180.0, south, east, north)])
+        else:
+            split.append((west, south, east, north))
+
+    found = []
+    for west, south, east, north in split:
+        x0 = np.clip(np.floor((west + 180) / spans), 0, columns - 1).astype(np.int64)
+        x1 = np.maximum(x0, np.clip(np.ceil((east + 180) / spans) - 1, 0, columns - 1).astype(np.int64))
+        y0 = np.clip(np.floor((90 - north) / spans), 0, rows - 1).astype(np.int64)
+        y1 = np.maximum(y0, np.clip(np.ceil((90 - south) / spans) - 1, 0, rows - 1).astype(np.int64))
+
+        widths, heights = x1 - x0 + 1, y1 - y0 + 1
+        counts = widths * heights
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        found.append(np.column_stack((
+            np.repeat(zooms, counts),
+            np.repeat(x0, counts) + offsets // np.repeat(heights, counts),
+            np.repeat(y0, counts) + offsets % np.repeat(heights, counts),
+        )))
+    if not found:
+        return np.zeros((0, 3), dtype=np.int64)
+    return np.unique(np.concatenate(found), axis=0)
+
+
+def layer_format(layer):
+    """
+    Tile format GIBS serves a layer in, from the layer catalogue; JPEG if
+    unknown. Catalogue answers are kept for LAYER_FORMAT_MAX_AGE so a sync
+    that changes a format is picked up; unknown layers are not remembered,
+    so they resolve as soon as the sync adds them.
+    """
+    now = time.monotonic()
+    known = _layer_formats.get(layer)
+    if known is not None and known[1] > now:
+        return known[0]
+
+    format_type = GIBSLayer.objects.filter(layer_id=layer).values_list('format_type', flat=True).first()
+    if format_type is None:
+        return 'jpg'
+    fmt = 'png' if 'png' in format_type else 'jpg'
+    _layer_formats[layer] = (fmt, now + LAYER_FORMAT_MAX_AGE)
+    return fmt
+
+
+def is_settled(tile_date):
+    return tile_date <= datetime.now(timezone.utc).date() - timedelta(days=SETTLED_DAYS)
+
+
+def resolve_tile(layer, date_str, matrix_set, z, y, x, fmt):
+    """
+    {'url', 'key', 'etag', 'format', 'max_age', 'pack', 'zxy'} for a tile
+    request, 'pack' naming its container when it belongs in one. Raises
+    ValueError for malformed parameters and TileNotFound for tiles outside
+    the matrix set, without asking GIBS.
+    """
+    if not LAYER_PATTERN.fullmatch(layer):
+        raise ValueError('Invalid layer identifier')
+    try:
+        tile_date = date.fromisoformat(date_str)
+    except ValueError:
+        raise ValueError('Date must be YYYY-MM-DD')
+    if fmt not in CONTENT_TYPES:
+        raise ValueError(f"Format must be one of {', '.join(CONTENT_TYPES)}")
+    if matrix_set not in TILE_MATRIX_SETS:
+        raise ValueError(f"Tile matrix set must be one of {', '.join(TILE_MATRIX_SETS)}")
+    if z > TILE_MATRIX_SETS[matrix_set]:
+        raise TileNotFound(f'{matrix_set} has no level {z}')
+    columns, rows = matrix_size(z)
+    if x >= columns or y >= rows:
+        raise TileNotFound(f'{matrix_set}/{z}/{y}/{x}')
+    if tile_date > datetime.now(timezone.utc).date() + timedelta(days=1):
+        raise TileNotFound(f'{layer} has no imagery for {tile_date}')
+
+    url = GIBSService.GIBS_TILE_URL.format(layer=layer, date=tile_date.isoformat(), tilematrixset=matrix_set,
+                                           z=z, y=y, x=x, format=fmt)
+    pack = None
+    if is_settled(tile_date):
+        key, max_age = DiskCache.key('tile', url), SETTLED_MAX_AGE
+        if settings.GIBS_TILE_STORE == 'packed':
+            pack = tile_packs.pack_name(layer, tile_date.isoformat(), matrix_set, fmt)
+    else:
+        key, max_age = DiskCache.key('tile', url, int(time.time() // RECENT_MAX_AGE)), RECENT_MAX_AGE
+    return {'url': url, 'key': key, 'etag': f'"{key[:32]}"', 'format': fmt, 'max_age': max_age,
+            'pack': pack, 'zxy': (z, x, y)}
+
+
+def fetch_tile(url, path):
+    """Stream one tile from GIBS into path"""
+    with get_session().get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+        if response.status_code in (400, 404):
+            # GIBS answers tiles outside a layer's coverage with a WMTS exception
+            raise TileNotFound(url)
+        response.raise_for_status()
+        content_type = response.headers.get('Content-Type', '')
+        if content_type and not content_type.startswith('image/'):
+            raise ValueError(f'Not an image: {content_type}')
+        size = 0
+        with open(path, 'wb') as f:
+            for chunk in response.iter_content(64 * 1024):
+                size += len(chunk)
+                if size > MAX_TILE_BYTES:
+                    raise ValueError(f'Tile larger than {MAX_TILE_BYTES} bytes')
+                f.write(chunk)
+
+
+def is_cached(tile):
+    """Whether a resolved tile can be served without asking GIBS"""
+    if tile['pack'] and tile_packs.has(tile['pack'], *tile['zxy']):
+        return True
+    return tile_cache.get(tile['key'], tile['format']) is not None
+
+
+def open_tile(tile):
+    """(open file, hit); upstream errors propagate to every coalesced request"""
+    if tile['pack']:
+        data = tile_packs.get(tile['pack'], *tile['zxy'])
+        if data is not None:
+            return io.BytesIO(data), True
+
+    f, hit = tile_cache.open(tile['key'], tile['format'], lambda temp: fetch_tile(tile['url'], temp))
+    if not tile['pack']:
+        return f, hit
+    with f:
+        data = f.read()
+    tile_packs.put(tile['pack'], *tile['zxy'], data,
+                   on_stored=lambda: tile_cache.discard(tile['key'], tile['format']))
+    return io.BytesIO(data), hit
@@ -10,6 +10,14 @@ urlpatterns = [
     path('image/<int:pk>/', views.image_detail_view, name='image_detail'),
     path('layers/', views.layers_catalog_view, name='layers_catalog'),
     
+    # Caching tile proxy; composites and metatiles first so neither is read as a layer
+    path('gibs/tiles/metatile/<int:size>/<str:date>/<str:matrix_set>/<int:z>/<int:y>/<int:x>.<str:fmt>',
+         views.metatile_proxy, name='metatile'),
+    path('gibs/tiles/composite/<str:date>/<str:matrix_set>/<int:z>/<int:y>/<int:x>.<str:fmt>',
+         views.composite_tile_proxy, name='composite_tile'),
+    path('gibs/tiles/<str:layer>/<str:date>/<str:matrix_set>/<int:z>/<int:y>/<int:x>.<str:fmt>',
+         views.tile_proxy, name='tile'),
+    
     # API endpoints
     path('api/search/', views.api_search_layers, name='api_search_layers'),
     path('api/layer/<str:layer_id>/', views.api_get_layer_info, name='api_layer_info'),
@@ -1,14 +1,18 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.http import JsonResponse, FileResponse, HttpResponseNotModified
 from django.views.decorators.http import require_http_methods
 from django.core.paginator import Paginator
 from django.utils import timezone
 from django.db import models
 from datetime import datetime, timedelta
 import json
+import requests
 
 from .models import GIBSLayer, WorldviewImageOfWeek, UserLayerConfig
 from .services import GIBSService
+from .tiles import resolve_tile, open_tile, TileNotFound, CONTENT_TYPES
+from .composite import parse_stack, resolve_composite, open_composite
+from .metatiles import resolve_metatile, open_metatile, DEFAULT_CELL_SIZE
 
 
 def explorer_view(request):
@@ -106,6 +110,83 @@ def layers_catalog_view(request):
     return render(request, 'gibs/layers_catalog.html', context)
 
 
+def _tile_response(request, resolved, opener):
+    """Serve a resolved tile or composite with its validators and cache headers"""
+    if resolved['etag'] in request.META.get('HTTP_IF_NONE_MATCH', ''):
+        response = HttpResponseNotModified()
+    else:
+        try:
+            f, hit = opener(resolved)
+        except TileNotFound:
+            return JsonResponse({'error': 'Tile not found'}, status=404)
+        except (requests.exceptions.RequestException, OSError, ValueError) as e:
+            print(f"Error fetching GIBS tile {request.path}: {e}")
+            return JsonResponse({'error': 'GIBS tile unavailable'}, status=502)
+        response = FileResponse(f, content_type=CONTENT_TYPES[resolved['format']])
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+    
+    response['ETag'] = resolved['etag']
+    response['Cache-Control'] = f"public, max-age={resolved['max_age']}"
+    return response
+
+
+@require_http_methods(["GET"])
+def tile_proxy(request, layer, date, matrix_set, z, y, x, fmt):
+    """
+    GIBS WMTS tile served from the local tile cache.
+    
+    Misses are fetched from GIBS once, however many requests arrive for the
+    tile at the same time. Settled dates are cached by browsers for a month.
+    """
+    try:
+        tile = resolve_tile(layer, date, matrix_set, z, y, x, fmt)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except TileNotFound:
+        return JsonResponse({'error': 'Tile not found'}, status=404)
+    return _tile_response(request, tile, open_tile)
+
+
+@require_http_methods(["GET"])
+def composite_tile_proxy(request, date, matrix_set, z, y, x, fmt):
+    """
+    One tile blending ?layers=A,B,C (bottom first) at ?opacity=B:0.5,C:0.8.
+    
+    Layers without imagery for the tile are left out; 404 if none has any.
+    """
+    try:
+        stack = parse_stack(request.GET.get('layers'), request.GET.get('opacity'))
+        composite = resolve_composite(stack, date, matrix_set, z, y, x, fmt)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except TileNotFound:
+        return JsonResponse({'error': 'Tile not found'}, status=404)
+    return _tile_response(request, composite, open_composite)
+
+
+@require_http_methods(["GET"])
+def metatile_proxy(request, size, date, matrix_set, z, y, x, fmt):
+    """
+    The size x size block of tiles at metatile row y, column x, stitched
+    into one image. ?layers= and ?opacity= work as for composites and
+    ?tile= scales each cell (128, 256 or 512 px). The X-Metatile-Manifest
+    header gives each tile's offset in the image.
+    """
+    try:
+        cell_size = int(request.GET.get('tile', DEFAULT_CELL_SIZE))
+        stack = parse_stack(request.GET.get('layers'), request.GET.get('opacity'))
+        metatile = resolve_metatile(stack, date, matrix_set, z, y, x, size, fmt, cell_size)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except TileNotFound:
+        return JsonResponse({'error': 'Tile not found'}, status=404)
+    
+    response = _tile_response(request, metatile, open_metatile)
+    if response.status_code in (200, 304):
+        response['X-Metatile-Manifest'] = json.dumps(metatile['manifest'], separators=(',', ':'))
+    return response
+
+
 @require_http_methods(["GET"])
 def api_get_layer_info(request, layer_id):
     """API endpoint to get layer information"""
@@ -218,9 +218,200 @@ window.addEventListener('offline', function() {
     window.dispatchEvent(event);
 });
 
+// Background Job Streaming
+// Follows terminal fetch/backfill jobs over Server-Sent Events. Jobs shared
+// with other requests may cover extra dates, so results are filtered to
+// [startDate, endDate] and de-duplicated. Resolves with the number of dates seen.
+function streamTerminalJobs(jobIds, startDate, endDate, onResult) {
+    const seen = new Set();
+    let open = jobIds.length;
+    
+    return new Promise(resolve => {
+        if (open === 0) {
+            resolve(seen.size);
+            return;
+        }
+        jobIds.forEach(jobId => {
+            const source = new EventSource(`/api/terminal/jobs/${jobId}/stream/`);
+            
+            source.addEventListener('result', event => {
+                const result = JSON.parse(event.data);
+                if (result.date < startDate || result.date > endDate || seen.has(result.date)) {
+                    return;
+                }
+                seen.add(result.date);
+                onResult(result);
+            });
+            
+            const finish = () => {
+                source.close();
+                open -= 1;
+                if (open === 0) {
+                    resolve(seen.size);
+                }
+            };
+            source.addEventListener('done', finish);
+            source.addEventListener('error', event => {
+                // Plain network errors reconnect on their own; server errors carry data
+                if (event.data) {
+                    finish();
+                }
+            });
+        });
+    });
+}
+
+// Calendar Index
+// Year availability comes from a packed bitmap (one bit per day of year) plus
+// the ids of the set bits; titles and thumbnails are loaded one month at a time.
+// Both helpers resolve to objects keyed by 'YYYY-MM-DD' and are cached per page.
+const calendarYearCache = {};
+const calendarMonthCache = {};
+
+function calendarDateKey(year, month, day) {
+    return `${year}-${String(month).padStart(2, '0')}-${String(day).padStart(2, '0')}`;
+}
+
+function loadCalendarYear(year) {
+    if (!calendarYearCache[year]) {
+        calendarYearCache[year] = fetch(`/api/calendar/${year}/`)
+            .then(response => response.json())
+            .then(data => {
+                const bits = atob(data.bitmap);
+                const days = {};
+                let n = 0;
+                for (let day = 0; day < 366; day++) {
+                    if (bits.charCodeAt(day >> 3) & (1 << (day & 7))) {
+                        const date = new Date(Date.UTC(year, 0, 1 + day));
+                        days[date.toISOString().slice(0, 10)] = { id: data.ids[n++] };
+                    }
+                }
+                return days;
+            })
+            .catch(() => {
+                delete calendarYearCache[year];
+                return {};
+            });
+    }
+    return calendarYearCache[year];
+}
+
+function loadCalendarMonth(year, month) {
+    const key = calendarDateKey(year, month, 1);
+    if (!calendarMonthCache[key]) {
+        calendarMonthCache[key] = fetch(`/api/calendar/${year}/${month}/`)
+            .then(response => response.json())
+            .then(data => {
+                const days = {};
+                Object.entries(data.days).forEach(([day, info]) => {
+                    days[calendarDateKey(year, month, day)] = info;
+                });
+                return days;
+            })
+            .catch(() => {
+                delete calendarMonthCache[key];
+                return {};
+            });
+    }
+    return calendarMonthCache[key];
+}
+
+// BlurHash Placeholders
+// Decodes the BlurHash stored with each APOD into a tiny data URL that sits
+// under the real image, so cards and the hero paint before the image loads.
+const BLURHASH_CHARS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~';
+const blurhashCache = {};
+
+function decode83(text) {
+    let value = 0;
+    for (const ch of text) {
+        value = value * 83 + BLURHASH_CHARS.indexOf(ch);
+    }
+    return value;
+}
+
+function srgbToLinear(value) {
+    const v = value / 255;
+    return v <= 0.04045 ? v / 12.92 : Math.pow((v + 0.055) / 1.055, 2.4);
+}
+
+function linearToSrgb(value) {
+    const v = Math.max(0, Math.min(1, value));
+    return v <= 0.0031308 ? Math.round(v * 12.92 * 255) : Math.round((1.055 * Math.pow(v, 1 / 2.4) - 0.055) * 255);
+}
+
+function blurhashDataUrl(hash, width = 32, height = 32) {
+    const cacheKey = `${hash}:${width}x${height}`;
+    if (!hash || hash.length < 6) return null;
+    if (blurhashCache[cacheKey]) return blurhashCache[cacheKey];
+
+    const sizeFlag = decode83(hash[0]);
+    const numX = (sizeFlag % 9) + 1;
+    const numY = Math.floor(sizeFlag / 9) + 1;
+    const maximum = (decode83(hash[1]) + 1) / 166;
+
+    const dc = decode83(hash.substring(2, 6));
+    const colors = [[srgbToLinear(dc >> 16), srgbToLinear((dc >> 8) & 255), srgbToLinear(dc & 255)]];
+    for (let i = 1; i < numX * numY; i++) {
+        const value = decode83(hash.substring(4 + i * 2, 6 + i * 2));
+        colors.push([Math.floor(value / 361), Math.floor(value / 19) % 19, value % 19].map(q => {
+            const v = (q - 9) / 9;
+            return Math.sign(v) * v * v * maximum;
+        }));
+    }
+
+    const canvas = document.createElement('canvas');
+    canvas.width = width;
+    canvas.height = height;
+    const context = canvas.getContext('2d');
+    const pixels = context.createImageData(width, height);
+    for (let y = 0; y < height; y++) {
+        for (let x = 0; x < width; x++) {
+            let r = 0, g = 0, b = 0;
+            for (let j = 0; j < numY; j++) {
+                for (let i = 0; i < numX; i++) {
+                    const basis = Math.cos(Math.PI * x * i / width) * Math.cos(Math.PI * y * j / height);
+                    const color = colors[i + j * numX];
+                    r += color[0] * basis;
+                    g += color[1] * basis;
+                    b += color[2] * basis;
+                }
+            }
+            const offset = 4 * (x + y * width);
+            pixels.data[offset] = linearToSrgb(r);
+            pixels.data[offset + 1] = linearToSrgb(g);
+            pixels.data[offset + 2] = linearToSrgb(b);
+            pixels.data[offset + 3] = 255;
+        }
+    }
+    context.putImageData(pixels, 0, 0);
+    blurhashCache[cacheKey] = canvas.toDataURL();
+    return blurhashCache[cacheKey];
+}
+
+// Layer the decoded placeholder under an element's background image
+function paintPlaceholder(element, hash, imageUrl) {
+    const placeholder = blurhashDataUrl(hash);
+    const layers = [];
+    if (imageUrl) layers.push(`url('${imageUrl}')`);
+    if (placeholder) layers.push(`url('${placeholder}')`);
+    if (layers.length) element.style.backgroundImage = layers.join(', ');
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    document.querySelectorAll('[data-blurhash]').forEach(element => {
+        paintPlaceholder(element, element.dataset.blurhash, element.dataset.src);
+    });
+});
+
 // Export utilities
 window.APODUtils = {
     TileImageLoader,
     loadImageWithProgress,
-    imageObserver
+    imageObserver,
+    streamTerminalJobs,
+    loadCalendarYear,
+    loadCalendarMonth,
+    blurhashDataUrl,
+    paintPlaceholder
 };
\ No newline at end of file